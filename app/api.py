@@ -0,0 +1,152 @@
+"""
+Headless HTTP API for the assistant.
+
+Serves the same pipeline as the Streamlit app without importing Streamlit, so it can
+run as several workers behind a load balancer:
+
+    cd app
+    API_WORKERS=4 python api.py            # or: uvicorn api:app --workers 4
+"""
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+import pipeline
+from helper_functions import tracing
+from helper_functions.conversation import ConversationMemory
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+
+# Conversation memories kept per worker, least recently used dropped first. With
+# several workers, route a session to the same worker (sticky sessions) to keep
+# its follow-ups in context.
+API_MAX_SESSIONS = int(os.getenv("API_MAX_SESSIONS", "10000"))
+
+logger = logging.getLogger(__name__)
+
+sessions = OrderedDict()
+
+# Set when pipeline.warm_up() raised; the worker then never becomes ready
+warm_up_error = None
+
+
+def _warmed_up(task):
+    # Surface a failed warm-up at once rather than when the task is awaited at shutdown
+    global warm_up_error
+    if not task.cancelled() and task.exception() is not None:
+        warm_up_error = task.exception()
+        logger.error("warm-up failed; this worker will not become ready", exc_info=warm_up_error)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm models and indexes in the background; /ready reports 503 until done, so
+    # the worker is live at once and only taken into rotation when warm
+    warming = asyncio.create_task(asyncio.to_thread(pipeline.warm_up))
+    warming.add_done_callback(_warmed_up)
+    yield
+    # A failure was already logged by _warmed_up()
+    await asyncio.gather(warming, return_exceptions=True)
+
+
+app = FastAPI(title="Myntra Shoe Assistant", lifespan=lifespan)
+
+
+class AskRequest(BaseModel):
+    query: str
+    session_id: Optional[str] = None
+
+
+class AskResponse(BaseModel):
+    answer: str
+
+
+def get_memory(session_id):
+    """Return the conversation memory for `session_id`, or None for one-off questions."""
+    if session_id is None:
+        return None
+    memory = sessions.pop(session_id, None) or ConversationMemory()
+    sessions[session_id] = memory
+    while len(sessions) > API_MAX_SESSIONS:
+        sessions.popitem(last=False)
+    return memory
+
+
+def start_trace(http_request):
+    """Trace for one turn, continuing the caller's trace when it sends a W3C traceparent."""
+    trace_id, parent_id = tracing.parse_traceparent(http_request.headers.get("traceparent"))
+    return tracing.Trace("ask", trace_id, parent_id)
+
+
+@app.get("/health")
+async def health():
+    # Liveness: the process is serving, whether or not it has finished warming up.
+    # A failed warm-up cannot recover in this process, so it fails liveness too
+    # and the supervisor restarts the worker.
+    if warm_up_error is not None:
+        raise HTTPException(status_code=500, detail=f"warm-up failed: {warm_up_error!r}")
+    return {"status": "ok" if pipeline.ready.is_set() else "warming up"}
+
+
+@app.get("/ready")
+async def ready():
+    # Readiness: route traffic here only once warm_up() has finished
+    if warm_up_error is not None:
+        raise HTTPException(status_code=503, detail=f"warm-up failed: {warm_up_error!r}")
+    if not pipeline.ready.is_set():
+        raise HTTPException(status_code=503, detail="warming up")
+    return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text format; each worker reports its own turns
+    return PlainTextResponse(tracing.metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    trace = tracing.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="trace not found on this worker")
+    return trace
+
+
+@app.post("/ask", response_model=AskResponse)
+async def ask(request: AskRequest, http_request: Request):
+    trace = start_trace(http_request)
+    response = await pipeline.ask_async(request.query, memory=get_memory(request.session_id), trace=trace)
+    return AskResponse(answer=response)
+
+
+@app.post("/ask/stream")
+async def ask_stream(request: AskRequest, http_request: Request):
+    trace = start_trace(http_request)
+    response = await pipeline.ask_async(
+        request.query, stream=True, memory=get_memory(request.session_id), trace=trace
+    )
+
+    async def body():
+        # Cached answers and product tables come back whole; send them as one chunk
+        if isinstance(response, str):
+            yield response
+            return
+        async for delta in response:
+            yield delta
+
+    return StreamingResponse(body(), media_type="text/plain; charset=utf-8")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("api:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
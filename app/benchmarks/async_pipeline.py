@@ -0,0 +1,87 @@
+"""
+End-to-end latency of the sequential ask() against the async pipeline.
+
+A local fake LLM server injects a fixed latency per completion, so the numbers show
+how much of a turn is spent waiting in sequence. Run from the `app` directory:
+
+    python -m benchmarks.async_pipeline [--latency 0.5] [--sessions 4] [--rounds 3]
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_llm import FakeLLMServer
+
+QUERIES = [
+    "How do I track my order?",
+    "What is your return policy?",
+    "Show me 3 highest rated women's Nike shoes under ₹8,000",
+    "What is the price of the most expensive shoes that you have on sale?",
+    "How are you?",
+    "Do you accept EMI payments through credit card?",
+]
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples), samples[max(0, int(len(samples) * 0.95) - 1)]
+
+
+def sequential_ask(query):
+    # The pre-async flow: encode, route, then the blocking chain
+    from helper_functions.model_registry import encode
+    from helper_functions.router import get_router
+    from faq_route import faq_chain
+    from sql_route import sql_chain
+    from small_talk_route import small_talk_chain
+
+    query_embedding = encode([query])[0]
+    route = get_router()(vector=query_embedding).name
+    if route == "faq":
+        return faq_chain(query, query_embedding)
+    if route == "sql":
+        return sql_chain(query)
+    return small_talk_chain(query)
+
+
+def measure(ask, sessions, rounds):
+    def session(_):
+        timings = []
+        for _ in range(rounds):
+            for query in QUERIES:
+                start = time.perf_counter()
+                ask(query)
+                timings.append(time.perf_counter() - start)
+        return timings
+
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        return [t for timings in pool.map(session, range(sessions)) for t in timings]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with FakeLLMServer(latency_s=args.latency) as server:
+        os.environ.update({
+            "GROQ_BASE_URL": server.base_url,
+            "GROQ_API_KEY": "fake",
+            "GROQ_MODEL": "fake-model",
+            "ANSWER_CACHE_ENABLED": "0",
+        })
+        import faq_route
+        import pipeline
+
+        # Warm models and indexes so neither run pays the cold start
+        faq_route.ingest_faq_data(faq_route.faqs_path)
+        sequential_ask(QUERIES[0])
+        pipeline.ask(QUERIES[0])
+
+        for label, ask in (("sequential", sequential_ask), ("async pipeline", pipeline.ask)):
+            p50, p95 = percentiles(measure(ask, args.sessions, args.rounds))
+            print(f"{label:>15}: p50={p50 * 1000:.0f}ms p95={p95 * 1000:.0f}ms")
@@ -0,0 +1,68 @@
+"""
+Checks that ConversationMemory keeps prompt history flat as a conversation grows,
+and shows how product follow-ups are resolved without the LLM.
+
+Plays a scripted conversation (with long product-table answers) for many turns and
+prints the history size sent with each prompt. Exits with status 1 if any turn
+goes over the token budget. Run from the `app` directory:
+
+    python -m benchmarks.conversation_memory [--turns 200]
+"""
+import argparse
+import sys
+
+from helper_functions import catalog
+from helper_functions.conversation import MEMORY_TOKEN_BUDGET, ConversationMemory
+from helper_functions.llm_client import estimate_tokens
+from helper_functions.query_parser import build_product_sql, parse_follow_up, parse_product_query
+
+SCRIPT = [
+    ("sql", "Show me Nike running shoes for men under Rs. 8000"),
+    ("sql", "what about for women?"),
+    ("sql", "cheaper ones"),
+    ("faq", "What is your return policy for shoes bought on sale?"),
+    ("small_talk", "Thanks, that was helpful!"),
+    ("sql", "Show me the top 5 highest rated Puma shoes with at least 30% discount"),
+]
+
+TABLE_ANSWER = "| Brand | Title | Price | Rating |\n" + "| Nike | Nike Pegasus 41 Running Shoes | Rs. 7999 | 4.5 |\n" * 20
+
+
+def history_tokens(memory):
+    return sum(estimate_tokens(message["content"]) for message in memory.history_messages())
+
+
+def play(memory, turns):
+    sizes = []
+    for turn in range(turns):
+        route, question = SCRIPT[turn % len(SCRIPT)]
+        memory.add_turn(route, f"{question} (turn {turn})", TABLE_ANSWER if route == "sql" else "Sure! " * 40)
+        sizes.append(history_tokens(memory))
+    return sizes
+
+
+def show_follow_ups():
+    brands = [row[0] for row in catalog.execute("SELECT DISTINCT brand FROM product").rows]
+    previous = parse_product_query(SCRIPT[0][1], brands)
+    print(f"\n{SCRIPT[0][1]!r}\n    -> {build_product_sql(previous, brands)}")
+    for _, question in SCRIPT[1:3]:
+        # 5999 stands in for the median price of the products shown last
+        previous = parse_follow_up(question, previous, brands, reference_price=5999)
+        print(f"{question!r}\n    -> {build_product_sql(previous, brands)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    sizes = play(ConversationMemory(), args.turns)
+    for turn in (1, 5, 10, 50, 100, args.turns):
+        if turn <= len(sizes):
+            print(f"turn {turn:>4}: history={sizes[turn - 1]} tokens")
+    print(f"max over {args.turns} turns: {max(sizes)} tokens (budget {MEMORY_TOKEN_BUDGET})")
+
+    show_follow_ups()
+
+    if max(sizes) > MEMORY_TOKEN_BUDGET:
+        sys.exit(1)
@@ -0,0 +1,53 @@
+"""
+Compare resident memory and cold-start time of the embedding model configurations.
+
+Each configuration is loaded in a fresh subprocess so the numbers are not skewed by
+models that are already in memory. Run from the `app` directory:
+
+    python -m benchmarks.embedding_models
+"""
+import json
+import subprocess
+import sys
+
+CONFIGURATIONS = {
+    # Before: the router and the FAQ retriever each loaded their own model
+    "separate (mpnet router + MiniLM FAQ)": [
+        "sentence-transformers/all-mpnet-base-v2",
+        "sentence-transformers/all-MiniLM-L12-v2",
+    ],
+    # After: one model from helper_functions.model_registry serves both
+    "shared (MiniLM)": [
+        "sentence-transformers/all-MiniLM-L12-v2",
+    ],
+}
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+from sentence_transformers import SentenceTransformer
+models = [SentenceTransformer(name, device='cpu') for name in sys.argv[1:]]
+loaded = time.perf_counter()
+for m in models:
+    m.encode(["How do I track my order?"])
+first_query = time.perf_counter()
+print(json.dumps({
+    "cold_start_s": round(loaded - start, 3),
+    "first_query_s": round(first_query - loaded, 3),
+    "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    "encoder_passes_per_faq_turn": len(models),
+}))
+"""
+
+
+def measure(model_names):
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, *model_names],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    for label, model_names in CONFIGURATIONS.items():
+        print(f"{label}: {measure(model_names)}")
@@ -0,0 +1,71 @@
+"""
+Load test for the batching encoder: throughput against p99 latency.
+
+Simulates concurrent users, each encoding one sentence at a time, with batching
+off and at several batch size / wait settings. Run from the `app` directory:
+
+    python -m benchmarks.encoder_load [--users 16] [--seconds 10]
+"""
+import argparse
+import itertools
+import statistics
+import threading
+import time
+
+from helper_functions.batch_encoder import BatchingEncoder
+from helper_functions.model_registry import encode_direct
+from helper_functions.router import faq, small_talk, sql
+
+SETTINGS = [
+    # (max_batch_size, max_wait_ms); None means no batching
+    None,
+    (8, 1),
+    (16, 2),
+    (32, 2),
+    (32, 5),
+    (64, 10),
+]
+
+
+def run_load(encode_one, users, seconds):
+    sentences = itertools.cycle(faq.utterances + sql.utterances + small_talk.utterances)
+    sentences_lock = threading.Lock()
+    latencies = []
+    stop_at = time.perf_counter() + seconds
+
+    def user():
+        local = []
+        while time.perf_counter() < stop_at:
+            with sentences_lock:
+                sentence = next(sentences)
+            start = time.perf_counter()
+            encode_one(sentence)
+            local.append(time.perf_counter() - start)
+        latencies.extend(local)
+
+    threads = [threading.Thread(target=user) for _ in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    return len(latencies) / seconds, statistics.median(latencies), p99
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    encode_direct(["warm up"])
+    for setting in SETTINGS:
+        if setting is None:
+            label, encode_one = "no batching", lambda sentence: encode_direct([sentence])
+        else:
+            batcher = BatchingEncoder(encode_direct, max_batch_size=setting[0], max_wait_ms=setting[1])
+            label, encode_one = f"batch={setting[0]} wait={setting[1]}ms", lambda sentence, b=batcher: b.encode([sentence])
+        throughput, p50, p99 = run_load(encode_one, args.users, args.seconds)
+        print(f"{label:>22}: {throughput:7.1f} req/s  p50={p50 * 1000:6.1f}ms  p99={p99 * 1000:6.1f}ms")
@@ -0,0 +1,88 @@
+"""
+Local stand-in for the Groq chat completions API with configurable latency.
+
+Point the Groq SDK at it by setting GROQ_BASE_URL to `server.base_url` before the
+route modules are imported. Replies are deterministic: SQL generation requests get
+a fixed query, everything else a short sentence. Streaming requests are answered as
+server-sent events, one word per chunk, with the usage on a last chunk as Groq does.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_SQL = "<SQL>SELECT * FROM product ORDER BY star_rating DESC LIMIT 3</SQL>"
+DEFAULT_ANSWER = "Here is a short answer from the fake model."
+
+
+class FakeLLMServer:
+    def __init__(self, latency_s=0.5, replies=None, port=0):
+        """
+        Args:
+            latency_s (float): Delay before each response (and before the first chunk)
+            replies (dict, optional): Exact user message -> reply text, for replaying recordings
+            port (int): Port to bind on localhost; 0 picks a free one
+        """
+        self.latency_s = latency_s
+        self.replies = replies or {}
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.requests += 1
+                time.sleep(server.latency_s)
+                text = server.reply_for(body["messages"])
+                usage = {"prompt_tokens": sum(len(m["content"].split()) for m in body["messages"]),
+                         "completion_tokens": len(text.split())}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+                if body.get("stream"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    for word in text.split(" "):
+                        chunk = {"id": "fake", "object": "chat.completion.chunk", "created": 0,
+                                 "model": body["model"],
+                                 "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    # Like Groq, report the usage of a stream on a final chunk
+                    last = {"id": "fake", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                            "choices": [], "x_groq": {"id": "fake", "usage": usage}}
+                    self.wfile.write(f"data: {json.dumps(last)}\n\n".encode())
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    return
+
+                payload = json.dumps({
+                    "id": "fake", "object": "chat.completion", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                                 "finish_reason": "stop"}],
+                    "usage": usage,
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def reply_for(self, messages):
+        user_message = messages[-1]["content"]
+        if user_message in self.replies:
+            return self.replies[user_message]
+        if "SQL query generator" in messages[0]["content"]:
+            return DEFAULT_SQL
+        return DEFAULT_ANSWER
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
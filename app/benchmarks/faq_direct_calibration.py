@@ -0,0 +1,71 @@
+"""
+Calibrate the direct FAQ answer gate (FAQ_DIRECT_MAX_DISTANCE, FAQ_DIRECT_MIN_MARGIN).
+
+For every (distance, margin) pair on a fixed grid, runs the hybrid retriever over
+the labelled paraphrases in benchmarks/data/faq_paraphrases.csv and reports:
+
+    answered   share of queries that would skip the LLM (LLM-call savings)
+    precision  share of those direct answers that are the right FAQ entry
+
+The last line recommends the pair with the most savings at the target precision.
+Deterministic for a given model, so results are reproducible. Run from the `app`
+directory:
+
+    python -m benchmarks.faq_direct_calibration [--target-precision 0.95]
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.faq_retrieval import load_faq_rows, load_paraphrases, vector_search
+from helper_functions.faq_retrieval import HybridFAQRetriever, is_confident
+from helper_functions.model_registry import encode
+
+DISTANCES = [round(0.10 + 0.05 * i, 2) for i in range(13)]
+MARGINS = [0.0, 0.02, 0.05, 0.10, 0.15, 0.20]
+
+
+def calibrate(hits_per_query, expected, distances=DISTANCES, margins=MARGINS):
+    """Return rows of (max_distance, min_margin, answered share, precision)."""
+    table = []
+    for max_distance in distances:
+        for min_margin in margins:
+            answered = correct = 0
+            for hits, question in zip(hits_per_query, expected):
+                if is_confident(hits, max_distance, min_margin):
+                    answered += 1
+                    correct += hits[0].question.strip() == question
+            table.append((max_distance, min_margin, answered / len(expected), correct / answered if answered else 1.0))
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target-precision", type=float, default=0.95)
+    args = parser.parse_args()
+
+    rows = load_faq_rows()
+    ids = list(rows)
+    labelled = load_paraphrases()
+    matrix = np.asarray(encode([question for question, _ in rows.values()]), dtype=np.float32)
+    query_vectors = np.asarray(encode([query for query, _ in labelled]), dtype=np.float32)
+
+    retriever = HybridFAQRetriever(rows)
+    hits_per_query = [
+        retriever.search(query, *vector_search(matrix, ids, vector))
+        for (query, _), vector in zip(labelled, query_vectors)
+    ]
+    table = calibrate(hits_per_query, [question for _, question in labelled])
+
+    print(f"{'distance':>8} {'margin':>6} {'answered':>9} {'precision':>9}")
+    for max_distance, min_margin, answered, precision in table:
+        print(f"{max_distance:>8.2f} {min_margin:>6.2f} {answered:>9.1%} {precision:>9.1%}")
+
+    eligible = [row for row in table if row[3] >= args.target_precision and row[2] > 0]
+    if eligible:
+        max_distance, min_margin, answered, precision = max(eligible, key=lambda row: (row[2], -row[1]))
+        print(f"\nRecommended at precision >= {args.target_precision:.0%}: "
+              f"FAQ_DIRECT_MAX_DISTANCE={max_distance:.2f} FAQ_DIRECT_MIN_MARGIN={min_margin:.2f} "
+              f"({answered:.1%} of FAQ turns skip the LLM, precision {precision:.1%})")
+    else:
+        print(f"\nNo setting reaches precision {args.target_precision:.0%}; keep direct answers off")
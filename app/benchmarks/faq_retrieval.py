@@ -0,0 +1,93 @@
+"""
+Retrieval quality and latency of FAQ lookup: vectors only, BM25 only, hybrid
+(reciprocal rank fusion) and hybrid + cross-encoder rerank.
+
+Queries are held-out paraphrases of FAQ questions from
+benchmarks/data/faq_paraphrases.csv, each labelled with the FAQ question it
+should retrieve. The vector side is an exact cosine search over the same question
+embeddings the Chroma collection stores, so no collection or API key is needed.
+Latency excludes query encoding; the hybrid variants are timed on top of an
+already computed vector ranking, i.e. what fusion and reranking add.
+Run from the `app` directory:
+
+    python -m benchmarks.faq_retrieval [--reranker cross-encoder/ms-marco-MiniLM-L-6-v2]
+"""
+import argparse
+import csv
+import os
+import statistics
+import time
+
+import numpy as np
+
+from helper_functions.faq_retrieval import FAQ_CANDIDATES, HybridFAQRetriever, get_reranker
+from helper_functions.model_registry import encode
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+faqs_path = os.path.join(base_dir, "resources", "Myntra_FAQ.csv")
+paraphrases_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "faq_paraphrases.csv")
+
+
+def load_faq_rows():
+    with open(faqs_path, encoding="utf-8") as f:
+        return {str(i): (row["QUESTION"], row["ANSWER"]) for i, row in enumerate(csv.DictReader(f))}
+
+
+def load_paraphrases():
+    with open(paraphrases_path, encoding="utf-8") as f:
+        return [(row["query"], row["question"]) for row in csv.DictReader(f)]
+
+
+def vector_search(matrix, ids, query_vector, top_k=FAQ_CANDIDATES):
+    """Nearest questions by squared L2 distance, as Chroma reports it for unit vectors."""
+    distances = 2 - 2 * (matrix @ query_vector)
+    order = np.argsort(distances)[:top_k]
+    return [ids[i] for i in order], [float(distances[i]) for i in order]
+
+
+def evaluate(rank, labelled, rows):
+    """hit@1, hit@3, MRR and per-query latency percentiles for a ranking function."""
+    reciprocal_ranks, timings = [], []
+    for position, (query, expected) in enumerate(labelled):
+        start = time.perf_counter()
+        ranked = rank(position, query)
+        timings.append((time.perf_counter() - start) * 1000)
+        questions = [rows[row_id][0].strip() for row_id in ranked]
+        reciprocal_ranks.append(1 / (questions.index(expected) + 1) if expected in questions else 0.0)
+    timings.sort()
+    return {
+        "hit@1": sum(rr == 1 for rr in reciprocal_ranks) / len(labelled),
+        "hit@3": sum(rr >= 1 / 3 for rr in reciprocal_ranks) / len(labelled),
+        "mrr": statistics.mean(reciprocal_ranks),
+        "p50_ms": statistics.median(timings),
+        "p99_ms": timings[int(len(timings) * 0.99) - 1],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reranker", default="", help="Cross-encoder model id for the rerank variant")
+    args = parser.parse_args()
+
+    rows = load_faq_rows()
+    ids = list(rows)
+    labelled = load_paraphrases()
+    matrix = np.asarray(encode([question for question, _ in rows.values()]), dtype=np.float32)
+    query_vectors = np.asarray(encode([query for query, _ in labelled]), dtype=np.float32)
+    vector_results = [vector_search(matrix, ids, vector) for vector in query_vectors]
+
+    hybrid = HybridFAQRetriever(rows)
+    candidates = {
+        "vector": lambda i, query: vector_search(matrix, ids, query_vectors[i])[0],
+        "bm25": lambda i, query: hybrid.keyword_ranking(query),
+        "hybrid (rrf)": lambda i, query: [hit.id for hit in hybrid.search(query, *vector_results[i])],
+    }
+    if args.reranker:
+        reranked = HybridFAQRetriever(rows, reranker=get_reranker(args.reranker))
+        candidates["hybrid + rerank"] = lambda i, query: [hit.id for hit in reranked.search(query, *vector_results[i])]
+
+    print(f"{len(labelled)} held-out paraphrases over {len(rows)} FAQ entries")
+    for label, rank in candidates.items():
+        result = evaluate(rank, labelled, rows)
+        print(f"{label:>16}: hit@1={result['hit@1']:.1%} hit@3={result['hit@3']:.1%} "
+              f"mrr={result['mrr']:.3f} p50={result['p50_ms']:.3f}ms p99={result['p99_ms']:.3f}ms")
@@ -0,0 +1,71 @@
+"""
+Parity check and latency benchmark for the embedding backends.
+
+Encodes the FAQ questions and router utterances with every backend, reports cosine
+agreement against the torch embeddings, then single-query latency and batch
+throughput. Run from the `app` directory:
+
+    python -m benchmarks.onnx_parity [--threads 4] [--model sentence-transformers/all-MiniLM-L12-v2]
+"""
+import argparse
+import os
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+from helper_functions import model_registry
+from helper_functions.model_registry import DEFAULT_EMBEDDING_MODEL, EMBEDDING_BACKENDS, load_embedding_model
+from helper_functions.router import faq, small_talk, sql
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+faqs_path = os.path.join(base_dir, "resources", "Myntra_FAQ.csv")
+
+PARITY_THRESHOLD = 0.99
+
+
+def load_sentences():
+    questions = pd.read_csv(faqs_path)['QUESTION'].tolist()
+    utterances = faq.utterances + sql.utterances + small_talk.utterances
+    return questions + utterances
+
+
+def latency_ms(model, sentences, repeats=3):
+    timings = []
+    for _ in range(repeats):
+        for sentence in sentences:
+            start = time.perf_counter()
+            model.encode([sentence], normalize_embeddings=True)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def throughput(model, sentences, batch_size=32):
+    start = time.perf_counter()
+    model.encode(sentences, batch_size=batch_size, normalize_embeddings=True)
+    return len(sentences) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+    model_registry.ONNX_NUM_THREADS = args.threads
+
+    sentences = load_sentences()
+    reference = None
+    for backend in EMBEDDING_BACKENDS:
+        model = load_embedding_model(args.model, backend)
+        embeddings = np.asarray(model.encode(sentences, normalize_embeddings=True))
+        if reference is None:
+            reference = embeddings
+        cosines = (embeddings * reference).sum(axis=1)
+        p50, p95 = latency_ms(model, sentences[:50])
+        status = "OK" if cosines.min() >= PARITY_THRESHOLD else "FAIL"
+        print(
+            f"{backend:>10}: cosine min={cosines.min():.4f} mean={cosines.mean():.4f} [{status}] | "
+            f"latency p50={p50:.2f}ms p95={p95:.2f}ms | throughput={throughput(model, sentences):.0f} sent/s"
+        )
@@ -0,0 +1,71 @@
+"""
+Accuracy and latency of the LocalRouter variants against the original SemanticRouter,
+plus coverage and precision of the keyword tier that runs before them.
+
+Uses the labelled set in benchmarks/data/labelled_queries.csv. Latency is measured
+after the embedding step (classification from a precomputed vector), which is the
+part the routers differ in. Run from the `app` directory:
+
+    python -m benchmarks.router_accuracy
+"""
+import csv
+import os
+import statistics
+import time
+from collections import Counter
+
+from helper_functions.model_registry import encode
+from helper_functions.router import KeywordRouter, LocalRouter, build_semantic_router, catalog_brands, routes
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+labelled_path = os.path.join(data_dir, "labelled_queries.csv")
+
+
+def load_labelled():
+    with open(labelled_path, encoding="utf-8") as f:
+        return [(row["query"], row["route"]) for row in csv.DictReader(f)]
+
+
+def evaluate(router, labelled, vectors, repeats=20):
+    predictions = [router(vector=vector).name for vector in vectors]
+    misroutes = Counter(
+        (expected, predicted) for (_, expected), predicted in zip(labelled, predictions) if predicted != expected
+    )
+    correct = sum(1 for (_, expected), predicted in zip(labelled, predictions) if predicted == expected)
+
+    timings = []
+    for _ in range(repeats):
+        for vector in vectors:
+            start = time.perf_counter()
+            router(vector=vector)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return correct / len(labelled), statistics.median(timings), timings[int(len(timings) * 0.99) - 1], misroutes
+
+
+def evaluate_keywords(keyword_router, labelled):
+    """Share of queries the keyword tier decides on its own, and how often it is right."""
+    decided = [(expected, keyword_router(query)) for query, expected in labelled]
+    decided = [(expected, choice.name) for expected, choice in decided if choice is not None]
+    correct = sum(1 for expected, predicted in decided if predicted == expected)
+    return len(decided) / len(labelled), correct / len(decided) if decided else 0.0
+
+
+if __name__ == "__main__":
+    labelled = load_labelled()
+    coverage, precision = evaluate_keywords(KeywordRouter(catalog_brands()), labelled)
+    print(f"{'keyword tier':>28}: coverage={coverage:.1%} precision={precision:.1%} (encoder skipped for routing)")
+    vectors = encode([query for query, _ in labelled])
+
+    candidates = {
+        "semantic-router (baseline)": build_semantic_router(),
+        "local knn": LocalRouter(routes, augment=False, method="knn"),
+        "local centroid": LocalRouter(routes, augment=False, method="centroid"),
+        "local knn + augmented": LocalRouter(routes, augment=True, method="knn"),
+        "local centroid + augmented": LocalRouter(routes, augment=True, method="centroid"),
+    }
+    for label, router in candidates.items():
+        accuracy, p50, p99, misroutes = evaluate(router, labelled, vectors)
+        print(f"{label:>28}: accuracy={accuracy:.1%} p50={p50:.3f}ms p99={p99:.3f}ms")
+        for (expected, predicted), count in misroutes.most_common():
+            print(f"{'':>30}{expected} -> {predicted}: {count}")
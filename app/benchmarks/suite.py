@@ -0,0 +1,306 @@
+"""
+Offline benchmark and regression suite for the whole assistant.
+
+Runs with no network. Groq is replaced by benchmarks.fake_llm.FakeLLMServer, which
+replays the recorded SQL and answers in benchmarks/data/llm_recordings.json with a
+fixed latency; embedding models must already be in the local Hugging Face cache.
+Measures:
+
+    routing      accuracy of the tiered router on benchmarks/data/labelled_queries.csv
+                 (README examples, FAQ and small-talk phrasings, product searches)
+    faq          hit@1 of hybrid retrieval on benchmarks/data/faq_paraphrases.csv
+    filters      exact-match accuracy and fast-path share of the rule-based parser
+                 on benchmarks/data/product_filters.csv
+    stages       p50 and p95 of every traced stage, over the labelled set end to end
+    throughput   turns per second and p95 turn time with --sessions concurrent
+                 conversations
+    memory       peak resident memory of this process after the run
+    cold start   wall time to start an interpreter and import what frontend.py imports,
+                 and the import time `python -X importtime` attributes to those modules,
+                 with the slowest top-level packages listed
+
+Every metric is written to --output as JSON and compared with --baseline. Any metric
+worse than its tolerance is listed and the suite exits with status 1, so a CI job
+running it fails on performance regressions. Run from the `app` directory:
+
+    python -m benchmarks.suite [--sessions 8] [--rounds 2] [--output suite_results.json]
+    python -m benchmarks.suite --save-baseline      # accept the current numbers
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_llm import FakeLLMServer
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+labelled_path = os.path.join(data_dir, "labelled_queries.csv")
+filters_path = os.path.join(data_dir, "product_filters.csv")
+recordings_path = os.path.join(data_dir, "llm_recordings.json")
+baseline_path = os.path.join(data_dir, "suite_baseline.json")
+
+FILTER_FIELDS = ["brand", "gender", "category", "price_min", "price_max", "rating_min", "discount_min", "sort", "limit"]
+
+# Modules frontend.py imports at startup in in-process mode
+FRONTEND_IMPORTS = "import streamlit, pipeline, helper_functions.conversation, helper_functions.tracing"
+
+# How far a metric may move in the bad direction before the suite fails:
+# kind -> (better direction, relative tolerance, absolute floor below which changes are noise)
+TOLERANCES = {
+    "accuracy": ("higher", 0.0, 0.02),
+    "throughput": ("higher", 0.20, 0.0),
+    "latency_ms": ("lower", 0.25, 5.0),
+    "memory_mb": ("lower", 0.15, 25.0),
+    "seconds": ("lower", 0.25, 0.2),
+}
+
+
+def percentile(samples, share):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, max(0, round(share * len(samples)) - 1))]
+
+
+def load_labelled():
+    with open(labelled_path, encoding="utf-8") as f:
+        return [(row["query"], row["route"]) for row in csv.DictReader(f)]
+
+
+def load_filters():
+    with open(filters_path, encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def measure_cold_start(runs):
+    """Median wall time of a fresh interpreter importing the frontend's modules."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", FRONTEND_IMPORTS], check=True, env=os.environ.copy())
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def measure_import_time(top=10):
+    """
+    Seconds `-X importtime` reports for the frontend's imports, printing the slowest packages.
+
+    Each stderr line is "import time: self | cumulative | name", in microseconds; the
+    cumulative time of the unindented lines adds up to the whole import.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", FRONTEND_IMPORTS],
+        check=True, env=os.environ.copy(), capture_output=True, text=True,
+    )
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            packages[name.strip()] = int(cumulative) / 1e6
+    for name, seconds in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"{'import ' + name:>40}: {seconds:.3f}s")
+    return sum(packages.values())
+
+
+def measure_routing(labelled):
+    from helper_functions.model_registry import encode
+    from helper_functions.router import get_router
+
+    vectors = encode([query for query, _ in labelled])
+    correct = sum(get_router()(text=query, vector=vector).name == route for (query, route), vector in zip(labelled, vectors))
+    return correct / len(labelled)
+
+
+def measure_faq():
+    import numpy as np
+
+    from benchmarks.faq_retrieval import load_faq_rows, load_paraphrases, vector_search
+    from helper_functions.faq_retrieval import HybridFAQRetriever
+    from helper_functions.model_registry import encode
+
+    rows = load_faq_rows()
+    ids = list(rows)
+    labelled = load_paraphrases()
+    matrix = np.asarray(encode([question for question, _ in rows.values()]), dtype=np.float32)
+    query_vectors = np.asarray(encode([query for query, _ in labelled]), dtype=np.float32)
+    retriever = HybridFAQRetriever(rows)
+    correct = 0
+    for (query, expected), vector in zip(labelled, query_vectors):
+        hits = retriever.search(query, *vector_search(matrix, ids, vector))
+        correct += bool(hits) and hits[0].question.strip() == expected
+    return correct / len(labelled)
+
+
+def _filter_value(product_filter, name):
+    value = getattr(product_filter, name)
+    # Bounds are (operator, number); the label only fixes the number
+    value = value[1] if isinstance(value, tuple) else value
+    return str(value).lower() if isinstance(value, str) else value
+
+
+def _expected_value(row, name):
+    if not row[name]:
+        return None
+    if name in ("brand", "gender", "category", "sort"):
+        return row[name].lower()
+    return float(row[name])
+
+
+def measure_filters(rows):
+    """Share of questions parsed exactly as labelled, and share confident enough for the fast path."""
+    import sql_route
+    from helper_functions.query_parser import parse_product_query
+
+    exact = fast = 0
+    for row in rows:
+        product_filter = parse_product_query(row["query"], sql_route.load_brands())
+        if product_filter is None:
+            continue
+        exact += all(_filter_value(product_filter, name) == _expected_value(row, name) for name in FILTER_FIELDS)
+        fast += product_filter.confidence >= sql_route.FAST_PATH_MIN_CONFIDENCE and product_filter.has_constraints()
+    return exact / len(rows), fast / len(rows)
+
+
+def measure_stages(queries):
+    """p50/p95 in ms of every traced stage, answering each query once without memory."""
+    import pipeline
+    from helper_functions import tracing
+
+    durations = {}
+    for query in queries:
+        trace = tracing.Trace("ask")
+        pipeline.ask(query, trace=trace)
+        for span in trace.spans:
+            durations.setdefault(span.name, []).append(span.duration_ms)
+    return {name: (statistics.median(samples), percentile(samples, 0.95)) for name, samples in durations.items()}
+
+
+def measure_throughput(queries, sessions, rounds):
+    """Turns per second and p95 turn time with `sessions` concurrent conversations."""
+    import pipeline
+    from helper_functions.conversation import ConversationMemory
+
+    def session(offset):
+        memory = ConversationMemory()
+        timings = []
+        for turn in range(rounds * len(queries)):
+            start = time.perf_counter()
+            pipeline.ask(queries[(offset + turn) % len(queries)], memory=memory)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        timings = [t for session_timings in pool.map(session, range(sessions)) for t in session_timings]
+    return len(timings) / (time.perf_counter() - start), percentile(timings, 0.95)
+
+
+def compare(metrics, baseline):
+    """Return a line for every metric that regressed past its tolerance."""
+    regressions = []
+    for name, metric in metrics.items():
+        if name not in baseline:
+            continue
+        direction, relative, floor = TOLERANCES[metric["kind"]]
+        before, after = baseline[name]["value"], metric["value"]
+        worse = before - after if direction == "higher" else after - before
+        if worse > max(relative * abs(before), floor):
+            regressions.append(f"{name}: {before:.4g} -> {after:.4g} ({metric['kind']}, {direction} is better)")
+    return regressions
+
+
+def run(args):
+    metrics = {}
+
+    def record(name, value, kind):
+        metrics[name] = {"value": round(float(value), 4), "kind": kind}
+        print(f"{name:>40}: {value:.4g}")
+
+    labelled = load_labelled()
+    queries = [query for query, _ in labelled]
+    # One log line per routing decision would bury the results
+    logging.getLogger("helper_functions.router").setLevel(logging.WARNING)
+
+    record("cold_start.frontend_imports_s", measure_cold_start(args.cold_runs), "seconds")
+    record("cold_start.importtime_s", measure_import_time(), "seconds")
+
+    import pipeline
+
+    pipeline.warm_up()
+    record("routing.accuracy", measure_routing(labelled), "accuracy")
+    record("faq.hit_at_1", measure_faq(), "accuracy")
+    exact, fast = measure_filters(load_filters())
+    record("filters.exact_match", exact, "accuracy")
+    record("filters.fast_path_share", fast, "accuracy")
+
+    for stage, (p50, p95) in sorted(measure_stages(queries).items()):
+        record(f"stage.{stage}.p50_ms", p50, "latency_ms")
+        record(f"stage.{stage}.p95_ms", p95, "latency_ms")
+
+    turns_per_second, p95 = measure_throughput(queries, args.sessions, args.rounds)
+    record(f"throughput.sessions_{args.sessions}.turns_per_s", turns_per_second, "throughput")
+    record(f"throughput.sessions_{args.sessions}.p95_ms", p95, "latency_ms")
+
+    # ru_maxrss is in KiB on Linux
+    record("memory.peak_rss_mb", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "memory_mb")
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM latency per completion, seconds")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--cold-runs", type=int, default=3)
+    parser.add_argument("--output", default="suite_results.json")
+    parser.add_argument("--baseline", default=baseline_path)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args()
+
+    with open(recordings_path, encoding="utf-8") as f:
+        recordings = json.load(f)
+
+    with FakeLLMServer(latency_s=args.latency, replies=recordings) as server, tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({
+            "GROQ_BASE_URL": server.base_url,
+            "GROQ_API_KEY": "fake",
+            "GROQ_MODEL": "fake-model",
+            # Every run starts from the same state: no answer cache, an empty plan cache
+            "ANSWER_CACHE_ENABLED": "0",
+            "SQL_PLAN_CACHE_PATH": os.path.join(tmp, "sql_plan_cache.sqlite"),
+            "HF_HUB_OFFLINE": "1",
+            "TRANSFORMERS_OFFLINE": "1",
+        })
+        results = {
+            "config": {"latency_s": args.latency, "sessions": args.sessions, "rounds": args.rounds},
+            "metrics": run(args),
+        }
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        sys.exit(0)
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results["metrics"], baseline["metrics"])
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    sys.exit(1 if regressions else 0)
@@ -1,14 +1,15 @@
+import hashlib
 import logging
 import os
-import pandas as pd
-import chromadb
-from sentence_transformers import SentenceTransformer
-from helper_functions.embedding_function import CPUEmbeddingFunction  # Import the CPU embedding class
-from groq import Groq
-from dotenv import load_dotenv
-import streamlit as st
-
-load_dotenv()
+import threading
+import numpy as np
+from helper_functions import tracing, warm_start
+from helper_functions.faq_retrieval import (
+    FAQ_CANDIDATES, HybridFAQRetriever, direct_answer, get_reranker, select_context
+)
+from helper_functions.model_registry import DEFAULT_EMBEDDING_MODEL, encode, get_embedding_model
+from helper_functions.config import GROQ_API_KEY, GROQ_MODEL
+from helper_functions.llm_client import complete, get_groq_client
 
 # Disable all ChromaDB logs
 logging.getLogger("chromadb").setLevel(logging.CRITICAL)
@@ -17,80 +18,221 @@ logging.getLogger("chromadb").setLevel(logging.CRITICAL)
 base_dir = os.path.dirname(os.path.abspath(__file__))
 faqs_path = os.path.join(base_dir, "resources", "Myntra_FAQ.csv")
 
-# Load environment variable securely
-GROQ_API_KEY = os.getenv('GROQ_API_KEY') or st.secrets.get("GROQ_API_KEY")
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY not set in environment variables or Streamlit secrets.")
-groq_client = Groq(api_key=GROQ_API_KEY)
-
-GROQ_MODEL = os.getenv("GROQ_MODEL") or st.secrets.get("GROQ_MODEL")
-if not GROQ_MODEL:
-    raise ValueError("GROQ_MODEL not set in environment variables or Streamlit secrets.")
+# Groq settings come from the environment (or Streamlit secrets when run under Streamlit)
+groq_client = get_groq_client(GROQ_API_KEY)
 
-# Load model on CPU
-model = SentenceTransformer('all-MiniLM-L12-v2', device='cpu')
+# Shared CPU model, also used by the intent router; loaded on first encode
+EMBEDDING_MODEL_NAME = DEFAULT_EMBEDDING_MODEL
 
-chromadb_client = chromadb.Client()
+# Persist the FAQ index on disk so Streamlit reruns and restarts reuse it
+chroma_path = os.path.join(base_dir, "resources", "chroma_db")
 collection_name_faq = 'faqs'
+_chromadb_client = None
+_chromadb_lock = threading.Lock()
+
+# Keyword side of hybrid retrieval, rebuilt when the CSV changes, and the CSV
+# last ingested, which it is built from
+_retriever = None
+_retriever_path = faqs_path
+_retriever_lock = threading.Lock()
+
+# ((path, mtime), SHA-256) of the FAQ CSV, so answer-cache lookups do not rehash it
+_faq_version = (None, None)
+
+
+def get_chromadb_client():
+    """Return the persistent Chroma client, importing chromadb on first use."""
+    global _chromadb_client
+    with _chromadb_lock:
+        if _chromadb_client is None:
+            import chromadb
+            _chromadb_client = chromadb.PersistentClient(path=chroma_path)
+        return _chromadb_client
+
+
+def _file_hash(path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _row_id(question, answer):
+    """Content-addressed id so an unchanged FAQ row keeps its stored embedding."""
+    return hashlib.sha256(f"{question}\x1f{answer}".encode('utf-8')).hexdigest()[:32]
+
+
+def _load_rows(path):
+    """Read the FAQ CSV into {row id: (question, answer)}."""
+    import pandas as pd
+    df = pd.read_csv(path)
+    rows = {}
+    for question, answer in zip(df['QUESTION'].tolist(), df['ANSWER'].tolist()):
+        rows[_row_id(question, answer)] = (question, answer)
+    return rows
+
+
+def get_faq_retriever():
+    """Return the hybrid retriever over the last ingested CSV, building its BM25 index on first use."""
+    global _retriever
+    with _retriever_lock:
+        if _retriever is None:
+            _retriever = HybridFAQRetriever(_load_rows(_retriever_path), reranker=get_reranker())
+        return _retriever
+
+
+def faq_version():
+    """Hash of the FAQ CSV answers come from, rehashed only when the file changes; keys cached FAQ answers."""
+    global _faq_version
+    path = _retriever_path
+    stamp = (path, os.stat(path).st_mtime_ns)
+    if _faq_version[0] != stamp:
+        _faq_version = (stamp, _file_hash(path))
+    return _faq_version[1]
+
+
+def faq_vectors_key(rows):
+    """Warm-start key of the FAQ question vectors: the model and the row ids, in order."""
+    return warm_start.content_key(EMBEDDING_MODEL_NAME, list(rows))
+
+
+def warm_start_vectors():
+    """
+    FAQ question vectors from the warm-start artifact, when built for the current CSV and model.
+
+    Returns:
+        tuple[np.ndarray, list[str]] | None: Memory-mapped matrix and the row id of each line
+    """
+    artifact = warm_start.get_artifact()
+    if artifact is None:
+        return None
+    rows = get_faq_retriever().rows
+    matrix = artifact.vectors("faq", faq_vectors_key(rows))
+    return (matrix, list(rows)) if matrix is not None else None
 
 
 def ingest_faq_data(path):
-    # Delete existing collection if exists to ensure fresh ingestion on deploy
-    if collection_name_faq in [c.name for c in chromadb_client.list_collections()]:
-        chromadb_client.delete_collection(collection_name_faq)
-        print(f"Deleted existing collection: {collection_name_faq}")
+    """
+    Sync the persistent FAQ collection with the CSV at `path`.
+
+    The collection metadata records the embedding model and a hash of the CSV. When
+    both match, nothing is read or embedded. Otherwise only rows that were added or
+    changed are embedded, and rows no longer present in the CSV are removed. A model
+    change forces a full rebuild, since old and new vectors are not comparable.
 
-    print("Ingesting FAQ data into ChromaDB...")
+    Args:
+        path (str): Path to the FAQ CSV with QUESTION and ANSWER columns
 
-    # Use CPU embedding function
-    embedding_function = CPUEmbeddingFunction(model)
+    Returns:
+        chromadb.Collection: The up-to-date FAQ collection
+    """
+    from helper_functions.embedding_function import CPUEmbeddingFunction
+
+    global _retriever, _retriever_path
+    with _retriever_lock:
+        if _retriever_path != path:
+            _retriever = None
+            _retriever_path = path
+
+    chromadb_client = get_chromadb_client()
+    embedding_function = CPUEmbeddingFunction(get_embedding_model(EMBEDDING_MODEL_NAME))
+    csv_hash = _file_hash(path)
 
     collection = chromadb_client.get_or_create_collection(
         name=collection_name_faq,
         embedding_function=embedding_function
     )
+    index_metadata = collection.metadata or {}
 
-    df = pd.read_csv(path)
-    docs = df['QUESTION'].tolist()
-    metadata = [{'answer': ans} for ans in df['ANSWER'].tolist()]
-    ids = [f"id_{i}" for i in range(len(docs))]
-
-    collection.add(
-        documents=docs,
-        metadatas=metadata,
-        ids=ids
-    )
+    if index_metadata.get('model') != EMBEDDING_MODEL_NAME:
+        if collection.count() > 0:
+            # Vectors from another model live in a different space; start over
+            chromadb_client.delete_collection(collection_name_faq)
+            print(f"Embedding model changed, rebuilding collection: {collection_name_faq}")
+            collection = chromadb_client.create_collection(
+                name=collection_name_faq,
+                embedding_function=embedding_function
+            )
+    elif index_metadata.get('csv_hash') == csv_hash:
+        return collection
 
-    print(f"FAQ data successfully ingested into ChromaDB collection: {collection_name_faq}")
+    print("Syncing FAQ data into ChromaDB...")
 
+    rows = _load_rows(path)
 
-def get_relevant_qa(query):
-    collection = chromadb_client.get_collection(name=collection_name_faq)
+    existing_ids = set(collection.get(include=[])['ids'])
 
-    # Compute embeddings for query
-    embedding_function = CPUEmbeddingFunction(model)
-    query_embedding = embedding_function([query])
+    stale_ids = list(existing_ids - rows.keys())
+    if stale_ids:
+        collection.delete(ids=stale_ids)
 
-    result = collection.query(
-        query_embeddings=query_embedding,
-        n_results=2
-    )
-    return result
+    new_ids = [row_id for row_id in rows if row_id not in existing_ids]
+    if new_ids:
+        collection.add(
+            documents=[rows[row_id][0] for row_id in new_ids],
+            metadatas=[{'answer': rows[row_id][1]} for row_id in new_ids],
+            ids=new_ids
+        )
 
+    collection.modify(metadata={'model': EMBEDDING_MODEL_NAME, 'csv_hash': csv_hash})
 
-def faq_chain(query):
-    result = get_relevant_qa(query)
+    with _retriever_lock:
+        _retriever = None
 
-    # Defensive check for empty or unexpected structure
-    context = ""
-    if 'metadatas' in result and result['metadatas']:
-        first_metadata = result['metadatas'][0]
-        if isinstance(first_metadata, dict):
-            context = first_metadata.get('answer', '')
-        elif isinstance(first_metadata, list) and len(first_metadata) > 0:
-            # fallback in case it's a list of dicts
-            context = first_metadata[0].get('answer', '')
+    print(f"FAQ collection {collection_name_faq} synced: "
+          f"{len(new_ids)} added, {len(stale_ids)} removed, {len(rows) - len(new_ids)} reused")
+    return collection
 
+
+def get_relevant_qa(query, query_embedding=None):
+    """
+    Retrieve FAQ entries for a query with BM25 and vector search fused by rank.
+
+    The vector side is an exact search over the warm-start artifact when it is
+    current, and a Chroma query otherwise.
+
+    Args:
+        query (str): User question
+        query_embedding (list[float] | None): Precomputed L2-normalized embedding
+
+    Returns:
+        list[FAQHit]: FAQ entries, best first
+    """
+    with tracing.span("faq.retrieve") as span:
+        # Reuse the routing embedding when the caller has one; otherwise encode here
+        # through the shared batching encoder
+        if query_embedding is None:
+            query_embedding = encode([query], EMBEDDING_MODEL_NAME)[0]
+
+        vectors = warm_start_vectors()
+        if vectors is not None:
+            # Squared L2 distance between unit vectors, as Chroma reports it
+            matrix, ids = vectors
+            distances = 2 - 2 * (matrix @ np.asarray(query_embedding, dtype=np.float32))
+            order = np.argsort(distances)[:FAQ_CANDIDATES]
+            candidate_ids, candidate_distances = [ids[i] for i in order], [float(distances[i]) for i in order]
+        else:
+            collection = get_chromadb_client().get_collection(name=collection_name_faq)
+            result = collection.query(
+                query_embeddings=[list(query_embedding)],
+                n_results=FAQ_CANDIDATES,
+                include=['distances']
+            )
+            candidate_ids, candidate_distances = result['ids'][0], result['distances'][0]
+        hits = get_faq_retriever().search(query, candidate_ids, candidate_distances)
+        span.set(rows=len(hits))
+        return hits
+
+
+def faq_context(hits):
+    """Join the best answers that fit the context token budget, or "" if there are none."""
+    return "\n\n".join(hit.answer for hit in select_context(hits))
+
+
+def faq_request(query, context):
+    """Build the chat completion arguments for answering `query` from `context`."""
     prompt = f"""
     You are a question-answering assistant. Answer the QUESTION using ONLY the information provided in the CONTEXT below.
 
@@ -108,8 +250,8 @@ def faq_chain(query):
 
     """
 
-    chat_completion = groq_client.chat.completions.create(
-        messages=[
+    return {
+        "messages": [
             {
                 "role": "system",
                 "content": "You are a helpful assistant."
@@ -119,10 +261,20 @@ def faq_chain(query):
                 "content": prompt,
             }
         ],
-        model=GROQ_MODEL,
-    )
+    }
+
+
+def faq_chain(query, query_embedding=None, stream=False):
+    result = get_relevant_qa(query, query_embedding)
+
+    # A clear match is answered with the stored FAQ text; the LLM only handles ambiguous ones
+    answer = direct_answer(query, result)
+    if answer is not None:
+        return answer
+    context = faq_context(result)
 
-    return chat_completion.choices[0].message.content
+    # Streaming returns a generator of text deltas for st.write_stream
+    return complete(groq_client, faq_request(query, context), GROQ_MODEL, stream, "llm.faq")
 
 
 if __name__ == "__main__":
@@ -1,108 +1,38 @@
 import os
+import threading
+import uuid
 import streamlit as st
-from helper_functions.router import router
-from faq_route import ingest_faq_data, faq_chain
-from sql_route import sql_chain
-from small_talk_route import small_talk_chain
-import re
-from datetime import datetime
-
-# Resolve faqs_path relative to this file
+from helper_functions.api_client import ASSISTANT_API_URL
+from helper_functions.tracing import Trace, format_waterfall
+
+# With ASSISTANT_API_URL set, this app is a thin client of api.py workers;
+# otherwise it runs the pipeline in-process
+if ASSISTANT_API_URL:
+    from helper_functions.api_client import ask
+else:
+    from pipeline import ask, ready, warm_up
+    from helper_functions.conversation import ConversationMemory
+
+# Resolve asset paths relative to this file
 base_dir = os.path.dirname(os.path.abspath(__file__))
-faqs_path = os.path.join(base_dir, "resources", "Myntra_FAQ.csv")
-
 img_path = os.path.join(base_dir, "assets", "thumbnail_image.jpeg")
 
+# Sidebar panel with the stage waterfall of the last turn
+DEBUG_PANEL = os.getenv("ASSISTANT_DEBUG_PANEL", "1") == "1"
+
 # Display the image in the Streamlit app
 st.image(img_path)
 
-ingest_faq_data(faqs_path)
-
-
-def format_sql_response(response):
-    lines = response.strip().split('\n')
-    if not lines:
-        return response
-
-    table_header = "| Product | Price | Discount | Rating | Scraped Date |\n"
-    table_separator = "|---------|-------|----------|--------|-------------|\n"
-    table_rows = ""
-    links_list = []
-
-    for idx, line in enumerate(lines, 1):
-        if not line.strip():
-            continue
-
-        parts = line.split(': Rs. ')
-        if len(parts) < 2:
-            continue
-
-        product_name = parts[0].strip()
-        product_name_clean = re.sub(r'\s*\((Men|Women|Unisex|Kids)\)', '', product_name).strip()
-
-        remaining = parts[1]
-
-        price_match = re.match(r'(\d+)', remaining)
-        price = f"Rs. {price_match.group(1)}" if price_match else "NA"
-
-        discount_match = re.search(r'(\d+)\s*percent off', remaining)
-        discount = f"{discount_match.group(1)}%" if discount_match else "0%"
-
-        rating_match = re.search(r'Rating:\s*([^\s,]+)', remaining)
-        rating = rating_match.group(1) if rating_match else "NA"
-
-        url_patterns = [
-            r'\[(https?://[^\]]+)\]',
-            r'https?://[^\s,\]]+',
-            r'\[([^\]]*myntra[^\]]*)\]'
-        ]
-
-        url = ""
-        for pattern in url_patterns:
-            url_match = re.search(pattern, line)
-            if url_match:
-                url = url_match.group(1) if url_match.lastindex else url_match.group(0)
-                url = url.strip('[]')
-                break
 
-        if url:
-            links_list.append(url)
-
-        date_match = re.search(r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})', remaining)
-        if date_match:
-            try:
-                dt = datetime.fromisoformat(date_match.group(1))
-                scraped_date = dt.strftime("%b %d, %Y %I:%M %p")
-            except:
-                scraped_date = "NA"
-        else:
-            scraped_date = "NA"
-
-        table_rows += f"| {product_name_clean} | {price} | {discount} | {rating} | {scraped_date} |\n"
-
-    result = table_header + table_separator + table_rows
-
-    if links_list:
-        result += "\n**Product Links:**\n\n"
-        for idx, link in enumerate(links_list, 1):
-            result += f"{idx}. {link}\n"
-    else:
-        result += "\n**Product Links:**\n\nNo links found in response.\n"
-
-    return result
+@st.cache_resource(show_spinner=False)
+def load_assistant():
+    # Runs once per process, in the background so the page renders at once; the FAQ
+    # index itself is persisted and content-hashed
+    threading.Thread(target=warm_up, name="assistant-warm-up", daemon=True).start()
 
 
-def ask(query):
-    route = router(query).name
-    if route == "faq":
-        return faq_chain(query)
-    elif route == "sql":
-        raw_response = sql_chain(query)
-        return format_sql_response(raw_response)
-    elif route == "small_talk":
-        return small_talk_chain(query)
-    else:
-        return f"Route {route} not implemented yet"
+if not ASSISTANT_API_URL:
+    load_assistant()
 
 
 st.set_page_config(page_title="Myntra Shoe Assistant", page_icon="👟", layout="wide")
@@ -188,6 +118,21 @@ st.markdown("""
 if 'messages' not in st.session_state:
     st.session_state['messages'] = []
 
+# Follow-ups ("cheaper ones") need the conversation: kept in the session here, or
+# on the API server under a session id in thin-client mode
+if 'conversation' not in st.session_state:
+    if ASSISTANT_API_URL:
+        st.session_state['conversation'] = {"session_id": uuid.uuid4().hex}
+    else:
+        st.session_state['conversation'] = {"memory": ConversationMemory()}
+
+if DEBUG_PANEL:
+    with st.sidebar.expander("Debug: last turn", expanded=False):
+        if 'last_trace' in st.session_state:
+            st.code(format_waterfall(st.session_state['last_trace']), language=None)
+        else:
+            st.caption("Ask something to see where the time goes.")
+
 for message in st.session_state['messages']:
     with st.chat_message(message['role']):
         st.markdown(message['content'])
@@ -199,11 +144,23 @@ if query:
         st.markdown(query)
     st.session_state['messages'].append({"role": "user", "content": query})
 
-    response = ask(query)
+    if not ASSISTANT_API_URL and not ready.is_set():
+        # ask() loads whatever is still missing itself; waiting only avoids loading it twice
+        with st.spinner("Getting ready..."):
+            ready.wait(timeout=120)
+
+    turn = Trace("turn")
+    response = ask(query, stream=True, trace=turn, **st.session_state['conversation'])
 
     with st.chat_message("assistant"):
-        st.markdown(response)
+        # Cached answers and product tables arrive whole; LLM answers stream token by token
+        if isinstance(response, str):
+            st.markdown(response)
+        else:
+            response = st.write_stream(response)
     st.session_state['messages'].append({"role": "assistant", "content": response})
+    turn.finish()
+    st.session_state['last_trace'] = turn.to_dict()
 
     st.rerun()
 
@@ -0,0 +1,227 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from helper_functions.query_parser import GENDER_PATTERNS, brand_aliases, normalize_question
+
+# Shared by every worker on the host; WAL lets them read while one writes
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(base_dir, "resources", "answer_cache.sqlite"))
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+# Minimum cosine similarity for a hit. Product answers depend on exact filters,
+# so the sql route is the strictest.
+SIMILARITY_THRESHOLDS = {
+    "faq": 0.92,
+    "small_talk": 0.90,
+    "sql": 0.97,
+}
+
+# Responses that report a failure are never cached
+UNCACHEABLE_PREFIXES = ("Sorry,", "Route ")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    route TEXT NOT NULL,
+    model TEXT NOT NULL,
+    version TEXT NOT NULL DEFAULT '',
+    slots TEXT NOT NULL,
+    query TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    response TEXT NOT NULL,
+    latency REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_answers_scope ON answers (route, model);
+CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers (last_used);
+CREATE TABLE IF NOT EXISTS answer_stats (
+    route TEXT NOT NULL,
+    model TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    saved_seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (route, model)
+);
+"""
+
+
+def _slots(query, brands=()):
+    """
+    Brands, gender and numbers in the query; a hit must agree on all of them
+    ("nike shoes under 3000" vs "puma shoes under 4000", "for men" vs "for women").
+    Brand aliases ("hrx") fill the slot with the catalog name, as in the SQL plan cache.
+    """
+    text = normalize_question(query)
+    found = set()
+    for alias, brand in brand_aliases(brands).items():
+        pattern = rf"(?<![a-z]){re.escape(alias)}(?![a-z])"
+        if re.search(pattern, text):
+            found.add(brand)
+            text = re.sub(pattern, " ", text)
+    genders = [gender for gender, pattern in GENDER_PATTERNS.items() if re.search(pattern, text)]
+    numbers = re.findall(r"\d+(?:\.\d+)?", text)
+    return "|".join([",".join(sorted(found)), ",".join(genders), ",".join(numbers)])
+
+
+class SemanticAnswerCache:
+    """
+    On-disk LLM response cache keyed by query embedding.
+
+    Entries are scoped per route, per LLM model and per version of the data the route
+    answers from, so an ingest or an FAQ edit stops stale answers from being served
+    (the same way SQLPlanCache keys on the catalog version). A lookup is a single
+    matrix-vector product over the scope's normalized embeddings, which are held in
+    memory and reloaded only when entries for that scope were added or evicted.
+
+    Args:
+        model (str): LLM model the answers come from
+        versions (dict[str, Callable[[], str]] | None): Per route, returns the current
+            version of its data, e.g. `catalog.catalog_version` for "sql"
+        brands (Callable[[], list[str]] | None): Returns the catalog brands, used as slots
+    """
+
+    def __init__(self, model, path=CACHE_PATH, ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                 max_entries=ANSWER_CACHE_MAX_ENTRIES, thresholds=None, versions=None, brands=None):
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.thresholds = {**SIMILARITY_THRESHOLDS, **(thresholds or {})}
+        self.versions = versions or {}
+        self.brands = brands
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(answers)")}
+        if "version" not in columns:
+            # Caches written before entries were versioned; their rows never match again
+            self._conn.execute("ALTER TABLE answers ADD COLUMN version TEXT NOT NULL DEFAULT ''")
+            self._conn.commit()
+        self._matrices = {}
+
+    def _version(self, route):
+        version = self.versions.get(route)
+        return version() if version is not None else ""
+
+    def _slots(self, query):
+        return _slots(query, self.brands() if self.brands is not None else ())
+
+    def _scope(self, route, version):
+        """Return (ids, slots, created_at, matrix) for a route at a data version, reloading after another worker changed it."""
+        key = (version,) + self._conn.execute(
+            "SELECT MAX(id), COUNT(*) FROM answers WHERE route = ? AND model = ? AND version = ?",
+            (route, self.model, version),
+        ).fetchone()
+        cached = self._matrices.get(route)
+        if cached is None or cached[0] != key:
+            rows = self._conn.execute(
+                "SELECT id, slots, created_at, embedding FROM answers "
+                "WHERE route = ? AND model = ? AND version = ? AND created_at >= ?",
+                (route, self.model, version, time.time() - self.ttl_seconds),
+            ).fetchall()
+            ids = [row[0] for row in rows]
+            slots = [row[1] for row in rows]
+            created_at = np.array([row[2] for row in rows])
+            matrix = np.stack([np.frombuffer(row[3], dtype=np.float32) for row in rows]) if rows else None
+            cached = self._matrices[route] = (key, (ids, slots, created_at, matrix))
+        return cached[1]
+
+    def _record(self, route, hit, saved_seconds=0.0):
+        self._conn.execute(
+            "INSERT INTO answer_stats (route, model, hits, misses, saved_seconds) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (route, model) DO UPDATE SET hits = hits + excluded.hits, "
+            "misses = misses + excluded.misses, saved_seconds = saved_seconds + excluded.saved_seconds",
+            (route, self.model, int(hit), int(not hit), saved_seconds),
+        )
+        self._conn.commit()
+
+    def lookup(self, route, query, embedding):
+        """
+        Return the cached response for the closest earlier query, or None on a miss.
+
+        Args:
+            route (str): Route name the answer belongs to
+            query (str): User query, used for slot matching
+            embedding (list[float]): L2-normalized query embedding
+
+        Returns:
+            str | None: Cached response
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        slots = self._slots(query)
+        version = self._version(route)
+        with self._lock:
+            ids, entry_slots, created_at, matrix = self._scope(route, version)
+            best = None
+            if matrix is not None:
+                scores = matrix @ vector
+                # The scope is only reloaded when entries change, so entries can expire while held
+                scores[created_at < time.time() - self.ttl_seconds] = -np.inf
+                for position in np.argsort(-scores)[:5]:
+                    if scores[position] < self.thresholds.get(route, 1.0):
+                        break
+                    if entry_slots[position] == slots:
+                        best = ids[position]
+                        break
+
+            if best is None:
+                self._record(route, hit=False)
+                return None
+
+            response, latency = self._conn.execute(
+                "SELECT response, latency FROM answers WHERE id = ?", (best,)
+            ).fetchone()
+            self._conn.execute(
+                "UPDATE answers SET last_used = ?, hits = hits + 1 WHERE id = ?", (time.time(), best)
+            )
+            self._record(route, hit=True, saved_seconds=latency)
+            return response
+
+    def store(self, route, query, embedding, response, latency):
+        """Cache a freshly generated response and evict the least recently used overflow."""
+        if not response or response.startswith(UNCACHEABLE_PREFIXES):
+            return
+        now = time.time()
+        blob = np.asarray(embedding, dtype=np.float32).tobytes()
+        slots = self._slots(query)
+        version = self._version(route)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers (route, model, version, slots, query, embedding, response, latency, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (route, self.model, version, slots, query, blob, response, latency, now, now),
+            )
+            self._conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+            self._matrices.pop(route, None)
+
+    def stats(self):
+        """Return hit/miss counts, hit rate and LLM seconds saved per route for this model."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT route, hits, misses, saved_seconds FROM answer_stats WHERE model = ?", (self.model,)
+            ).fetchall()
+        return {
+            route: {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "latency_saved_s": round(saved_seconds, 3),
+            }
+            for route, hits, misses, saved_seconds in rows
+        }
@@ -0,0 +1,53 @@
+import os
+import httpx
+
+from helper_functions import tracing
+
+# Set to the API's base URL to run Streamlit as a thin client of api.py
+ASSISTANT_API_URL = os.getenv("ASSISTANT_API_URL")
+
+_client = None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = httpx.Client(base_url=ASSISTANT_API_URL, timeout=60)
+    return _client
+
+
+def ask(query, stream=False, session_id=None, trace=None):
+    """
+    Same contract as pipeline.ask, served by a remote api.py worker.
+
+    The conversation memory lives on the server, keyed by `session_id`. With
+    `trace`, the server continues it through a `traceparent` header, and its spans
+    are fetched into `trace` once the answer is complete.
+    """
+    payload = {"query": query, "session_id": session_id}
+    headers = {"traceparent": tracing.traceparent(trace)} if trace is not None else {}
+    if not stream:
+        response = _get_client().post("/ask", json=payload, headers=headers)
+        response.raise_for_status()
+        _finish_trace(trace)
+        return response.json()["answer"]
+    return _stream(payload, headers, trace)
+
+
+def _stream(payload, headers, trace):
+    with _get_client().stream("POST", "/ask/stream", json=payload, headers=headers) as response:
+        response.raise_for_status()
+        for delta in response.iter_text():
+            if delta:
+                yield delta
+    _finish_trace(trace)
+
+
+def _finish_trace(trace):
+    if trace is None:
+        return
+    # With several workers behind a balancer the trace may live on another one
+    response = _get_client().get(f"/traces/{trace.trace_id}")
+    if response.status_code == 200:
+        tracing.add_spans(trace, response.json()["spans"])
+    trace.finish()
@@ -0,0 +1,82 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BatchingEncoder:
+    """
+    Coalesces concurrent encode requests into one model call.
+
+    Callers block on `encode()` while a single worker thread drains the queue: it
+    takes the first waiting request and everything queued behind it. A request that
+    arrives alone is encoded straight away; when others were already waiting, the
+    worker keeps collecting for up to `max_wait_ms` or until `max_batch_size`
+    sentences are queued. It encodes them in one call and hands each caller its
+    slice of the result.
+    """
+
+    def __init__(self, encode_batch, max_batch_size=32, max_wait_ms=2.0):
+        """
+        Args:
+            encode_batch (callable): list[str] -> list[list[float]], called from the worker thread
+            max_batch_size (int): Most sentences per model call
+            max_wait_ms (float): Longest a request waits for others to join its batch
+        """
+        self.encode_batch = encode_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self.batches = 0
+        self.sentences = 0
+        threading.Thread(target=self._run, name="batching-encoder", daemon=True).start()
+
+    def encode(self, texts):
+        """Encode `texts` as part of the next batch and return their embeddings."""
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future.result()
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        size = len(pending[0][0])
+        while size < self.max_batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+        if len(pending) == 1:
+            # Nobody else is waiting: a single-user query pays no batching delay
+            return pending
+        deadline = time.perf_counter() + self.max_wait_s
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            texts = [text for item_texts, _ in pending for text in item_texts]
+            try:
+                embeddings = self.encode_batch(texts)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.sentences += len(texts)
+            offset = 0
+            for item_texts, future in pending:
+                future.set_result(embeddings[offset:offset + len(item_texts)])
+                offset += len(item_texts)
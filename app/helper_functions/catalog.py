@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import threading
+from typing import List, NamedTuple
+from urllib.parse import quote
+
+# Resolve the catalog database relative to the app directory
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(base_dir, "resources", "myntra_db.sqlite")
+
+# Memory-map up to this many bytes of the database file for reads
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Indexes backing the filters and sort orders used by product questions
+CATALOG_INDEXES = {
+    "idx_product_brand": "product (brand)",
+    "idx_product_brand_lower": "product (LOWER(brand))",
+    "idx_product_gender": "product (gender)",
+    "idx_product_price": "product (price_after_discount)",
+    "idx_product_rating": "product (star_rating)",
+    "idx_product_discount": "product (discount_percent)",
+}
+
+_local = threading.local()
+
+
+class QueryResult(NamedTuple):
+    """Column names plus plain row tuples, as returned by sqlite3."""
+    columns: List[str]
+    rows: List[tuple]
+
+    def records(self, columns=None):
+        """Return rows as dicts, optionally restricted to `columns` in that order."""
+        if columns is None:
+            return [dict(zip(self.columns, row)) for row in self.rows]
+        positions = [(name, self.columns.index(name)) for name in columns if name in self.columns]
+        return [{name: row[pos] for name, pos in positions} for row in self.rows]
+
+
+def get_connection(db_path=DB_PATH):
+    """
+    Return this thread's read-only connection to `db_path`, opening it on first use.
+
+    The database is opened with a `mode=ro` URI and `query_only`, so no statement
+    can write to it however it is phrased.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(f"file:{quote(db_path)}?mode=ro", uri=True)
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        connections[db_path] = conn
+    return conn
+
+
+def execute(query, params=None, db_path=DB_PATH):
+    """
+    Run a read-only query on the pooled connection.
+
+    Args:
+        query (str): SQL query string to execute
+        params (list, optional): Values bound to `?` placeholders in the query
+        db_path (str): Catalog database file
+
+    Returns:
+        QueryResult: Column names and row tuples
+    """
+    cursor = get_connection(db_path).execute(query, params or [])
+    try:
+        columns = [description[0] for description in cursor.description or []]
+        return QueryResult(columns, cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def catalog_version(db_path=DB_PATH):
+    """
+    Version of the catalog as "<schema_version>.<user_version>".
+
+    SQLite bumps schema_version on every schema change; user_version is bumped by
+    whoever reloads the product data. Caches of derived data key on this string.
+    """
+    conn = get_connection(db_path)
+    schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    user_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    return f"{schema_version}.{user_version}"
+
+
+def ensure_indexes(conn, commit=True):
+    """
+    Create the catalog indexes on a writable connection if they do not exist.
+
+    With `commit=False` they become part of the caller's open transaction.
+    """
+    for name, target in CATALOG_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+    conn.execute("ANALYZE product")
+    if commit:
+        conn.commit()
+
+
+if __name__ == "__main__":
+    # Add the indexes to an existing database: python -m helper_functions.catalog
+    with sqlite3.connect(DB_PATH) as write_conn:
+        ensure_indexes(write_conn)
+    print(f"Indexes ensured on {DB_PATH}")
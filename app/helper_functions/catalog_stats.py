@@ -0,0 +1,293 @@
+import math
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import NamedTuple, Optional
+
+from helper_functions import catalog
+from helper_functions.query_parser import brand_family
+
+# Answer aggregate product questions from precomputed statistics instead of the LLM
+CATALOG_STATS_ENABLED = os.getenv("CATALOG_STATS_ENABLED", "1") == "1"
+
+# Products kept per facet in each top list
+CATALOG_STATS_TOP_N = int(os.getenv("CATALOG_STATS_TOP_N", "3"))
+
+# Histogram bins: whole stars (the last bin is 4-5) and steps of 10 percent off (the last is 90-100)
+RATING_BINS = 5
+DISCOUNT_BINS = 10
+
+# Top list name -> (column, highest first)
+TOP_LISTS = {
+    "most_expensive": ("price_after_discount", True),
+    "cheapest": ("price_after_discount", False),
+    "highest_rated": ("star_rating", True),
+    "biggest_discount": ("discount_percent", True),
+}
+
+# Metric -> top list holding the product it names, for the extreme metrics
+METRIC_TOP_LISTS = {
+    "max_price": "most_expensive",
+    "min_price": "cheapest",
+    "max_rating": "highest_rated",
+    "max_discount": "biggest_discount",
+}
+
+PRODUCT_COLUMNS = ["brand", "title", "gender", "price_after_discount", "discount_percent", "star_rating",
+                   "num_ratings", "product_link", "scraped_on"]
+
+# One row per (brand, gender, on sale) facet
+FACETS_SQL = """
+SELECT brand, gender, discount_percent > 0, COUNT(*), MIN(price_after_discount), MAX(price_after_discount),
+       SUM(price_after_discount), COUNT(star_rating), SUM(star_rating), SUM(discount_percent),
+       MIN(discount_percent), MAX(discount_percent), MIN(star_rating), MAX(star_rating), MIN(mrp), MAX(mrp)
+FROM product
+GROUP BY 1, 2, 3
+"""
+
+HISTOGRAM_SQL = """
+SELECT brand, gender, discount_percent > 0, MIN(CAST({column} / {width} AS INTEGER), {last}), COUNT(*)
+FROM product
+WHERE {column} IS NOT NULL
+GROUP BY 1, 2, 3, 4
+"""
+
+TOP_SQL = """
+SELECT brand, gender, on_sale, {columns}
+FROM (
+    SELECT *, discount_percent > 0 AS on_sale, ROW_NUMBER() OVER (
+        PARTITION BY brand, gender, discount_percent > 0 ORDER BY {column} {direction}, num_ratings DESC
+    ) AS position
+    FROM product
+    WHERE {column} IS NOT NULL
+)
+WHERE position <= ?
+"""
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _min(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _rank(product, column, descending):
+    # Same order as TOP_SQL: the top list's column, then the most ratings
+    value = product[column]
+    return (value if descending else -value, product["num_ratings"] or 0)
+
+
+@dataclass
+class Facet:
+    """Counts, sums, ranges, histograms and top products of a set of products; facets merge."""
+    count: int = 0
+    price_sum: float = 0
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+    rated: int = 0
+    rating_sum: float = 0
+    rating_min: Optional[float] = None
+    rating_max: Optional[float] = None
+    discount_sum: float = 0
+    discount_min: Optional[float] = None
+    discount_max: Optional[float] = None
+    mrp_min: Optional[float] = None
+    mrp_max: Optional[float] = None
+    rating_histogram: list = field(default_factory=lambda: [0] * RATING_BINS)
+    discount_histogram: list = field(default_factory=lambda: [0] * DISCOUNT_BINS)
+    top: dict = field(default_factory=lambda: {name: [] for name in TOP_LISTS})
+
+    def merge(self, other, top_n=CATALOG_STATS_TOP_N):
+        """Return the facet of both sets of products."""
+        top = {}
+        for name, (column, descending) in TOP_LISTS.items():
+            products = sorted(self.top[name] + other.top[name], key=lambda product: _rank(product, column, descending),
+                              reverse=True)
+            top[name] = products[:top_n]
+        return Facet(
+            count=self.count + other.count,
+            price_sum=self.price_sum + other.price_sum,
+            price_min=_min(self.price_min, other.price_min),
+            price_max=_max(self.price_max, other.price_max),
+            rated=self.rated + other.rated,
+            rating_sum=self.rating_sum + other.rating_sum,
+            rating_min=_min(self.rating_min, other.rating_min),
+            rating_max=_max(self.rating_max, other.rating_max),
+            discount_sum=self.discount_sum + other.discount_sum,
+            discount_min=_min(self.discount_min, other.discount_min),
+            discount_max=_max(self.discount_max, other.discount_max),
+            mrp_min=_min(self.mrp_min, other.mrp_min),
+            mrp_max=_max(self.mrp_max, other.mrp_max),
+            rating_histogram=[a + b for a, b in zip(self.rating_histogram, other.rating_histogram)],
+            discount_histogram=[a + b for a, b in zip(self.discount_histogram, other.discount_histogram)],
+            top=top,
+        )
+
+    def count_at_least(self, rating_min=None, discount_min=None):
+        """Products rated at least `rating_min` whole stars, or at least `discount_min` percent off (a multiple of 10)."""
+        if rating_min is not None:
+            return sum(self.rating_histogram[rating_min:])
+        if discount_min is not None:
+            return sum(self.discount_histogram[discount_min // 10:])
+        return self.count
+
+    def value(self, metric):
+        """
+        Value of an AggregateQuery metric over this facet.
+
+        Returns:
+            tuple[float | None, dict | None]: The value (None when no product has it)
+            and, for extreme metrics, the product it comes from
+        """
+        if metric == "avg_price":
+            return (self.price_sum / self.count if self.count else None), None
+        if metric == "avg_rating":
+            return (self.rating_sum / self.rated if self.rated else None), None
+        if metric == "avg_discount":
+            return (self.discount_sum / self.count if self.count else None), None
+        products = self.top[METRIC_TOP_LISTS[metric]]
+        if not products:
+            return None, None
+        column, _ = TOP_LISTS[METRIC_TOP_LISTS[metric]]
+        return products[0][column], products[0]
+
+
+class AggregateAnswer(NamedTuple):
+    """One line of an aggregate answer: the group (None when ungrouped), its value and size."""
+    group: Optional[str]
+    value: Optional[float]
+    count: int
+    product: Optional[dict] = None
+
+
+class CatalogStats:
+    """
+    Precomputed statistics of the product table, for aggregate questions.
+
+    Products are split into facets by (brand, gender, on sale). Each facet keeps
+    counts, sums and ranges of price, rating and discount, rating and discount
+    histograms and short top lists, so any combination of brand, gender and sale
+    status is answered by merging a few facets, without touching the table.
+    Built in four grouped scans when the catalog is loaded; `get_catalog_stats()`
+    rebuilds it whenever `catalog.catalog_version()` changes.
+    """
+
+    def __init__(self, version, facets):
+        self.version = version
+        self.facets = facets
+        self.brands = sorted({brand for brand, _, _ in facets if brand is not None}, key=str.lower)
+        self.genders = sorted({gender for _, gender, _ in facets if gender is not None})
+        self._rollups = {}
+
+    @classmethod
+    def build(cls, db_path=catalog.DB_PATH, top_n=CATALOG_STATS_TOP_N):
+        """Compute every facet of the catalog at `db_path`."""
+        version = catalog.catalog_version(db_path)
+        facets = {}
+        for row in catalog.execute(FACETS_SQL, db_path=db_path).rows:
+            (brand, gender, on_sale, count, price_min, price_max, price_sum, rated, rating_sum, discount_sum,
+             discount_min, discount_max, rating_min, rating_max, mrp_min, mrp_max) = row
+            facets[(brand, gender, bool(on_sale))] = Facet(
+                count=count, price_sum=price_sum or 0, price_min=price_min, price_max=price_max,
+                rated=rated, rating_sum=rating_sum or 0, rating_min=rating_min, rating_max=rating_max,
+                discount_sum=discount_sum or 0, discount_min=discount_min, discount_max=discount_max,
+                mrp_min=mrp_min, mrp_max=mrp_max,
+            )
+
+        for column, width, histogram in (("star_rating", 1, "rating_histogram"),
+                                         ("discount_percent", 10, "discount_histogram")):
+            last = (RATING_BINS if column == "star_rating" else DISCOUNT_BINS) - 1
+            query = HISTOGRAM_SQL.format(column=column, width=float(width), last=last)
+            for brand, gender, on_sale, position, count in catalog.execute(query, db_path=db_path).rows:
+                getattr(facets[(brand, gender, bool(on_sale))], histogram)[position] = count
+
+        for name, (column, descending) in TOP_LISTS.items():
+            query = TOP_SQL.format(columns=", ".join(PRODUCT_COLUMNS), column=column,
+                                   direction="DESC" if descending else "ASC")
+            result = catalog.execute(query, [top_n], db_path=db_path)
+            for row in result.rows:
+                facets[(row[0], row[1], bool(row[2]))].top[name].append(dict(zip(PRODUCT_COLUMNS, row[3:])))
+        return cls(version, facets)
+
+    def facet(self, brands=None, gender=None, on_sale=None):
+        """Merged facet of the products matching every given constraint; `brands` is any of several brands."""
+        brand_keys = frozenset(brand.lower() for brand in brands) if brands is not None else None
+        key = (brand_keys, gender, on_sale)
+        if key not in self._rollups:
+            merged = Facet()
+            for (facet_brand, facet_gender, facet_on_sale), facet in self.facets.items():
+                if (
+                    (brand_keys is None or (facet_brand or "").lower() in brand_keys)
+                    and (gender is None or facet_gender == gender)
+                    and (on_sale is None or facet_on_sale == on_sale)
+                ):
+                    merged = merged.merge(facet)
+            self._rollups[key] = merged
+        return self._rollups[key]
+
+    def answer(self, aggregate):
+        """
+        Evaluate a parsed aggregate question.
+
+        A brand covers its sub-brands ("ADIDAS" includes "ADIDAS Originals"), the
+        same rule as query_parser.build_product_sql(), so the statistics and the SQL
+        path count the same products.
+
+        Args:
+            aggregate (query_parser.AggregateQuery): Metric, filters and optional grouping
+
+        Returns:
+            list[AggregateAnswer]: One entry, or one per brand or gender when grouped,
+            largest value first
+        """
+        family = brand_family(aggregate.brand, self.brands) if aggregate.brand else None
+        if aggregate.group_by == "brand":
+            groups = [(brand, {"brands": [brand]}) for brand in family or self.brands]
+        elif aggregate.group_by == "gender":
+            groups = [(gender, {"gender": gender}) for gender in self.genders if aggregate.gender in (None, gender)]
+        else:
+            groups = [(None, {})]
+
+        answers = []
+        for group, constraints in groups:
+            facet = self.facet(**{"brands": family, "gender": aggregate.gender,
+                                  "on_sale": aggregate.on_sale, **constraints})
+            count = facet.count_at_least(aggregate.rating_min, aggregate.discount_min)
+            if aggregate.metric == "count":
+                answers.append(AggregateAnswer(group, count, count))
+            else:
+                value, product = facet.value(aggregate.metric)
+                answers.append(AggregateAnswer(group, value, count, product))
+        if aggregate.group_by is not None:
+            answers = [answer for answer in answers if answer.count]
+            answers.sort(key=lambda answer: -math.inf if answer.value is None else answer.value, reverse=True)
+        return answers
+
+    def prompt_section(self):
+        """Exact brand spellings and value ranges, appended to the SQL generation prompt."""
+        overall = self.facet()
+        return (
+            "### CATALOG VALUES:\n"
+            f"- brand (exact spellings): {', '.join(self.brands)}\n"
+            f"- gender: {', '.join(repr(gender) for gender in self.genders)}\n"
+            f"- price_after_discount: {overall.price_min:g} to {overall.price_max:g}\n"
+            f"- mrp: {overall.mrp_min:g} to {overall.mrp_max:g}\n"
+            f"- discount_percent: {overall.discount_min:g} to {overall.discount_max:g}\n"
+            f"- star_rating: {overall.rating_min:g} to {overall.rating_max:g} "
+            f"({overall.count - overall.rated} of {overall.count} products have no rating)\n"
+        )
+
+
+def get_catalog_stats(db_path=catalog.DB_PATH):
+    """Return the statistics of the current catalog, rebuilding them after a reload."""
+    version = catalog.catalog_version(db_path)
+    with _stats_lock:
+        stats = _stats.get(db_path)
+        if stats is None or stats.version != version:
+            stats = _stats[db_path] = CatalogStats.build(db_path)
+        return stats
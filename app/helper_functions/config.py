@@ -0,0 +1,36 @@
+import os
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def get_setting(name, default=None):
+    """
+    Read a setting from the environment, then from Streamlit secrets.
+
+    Secrets are only consulted when Streamlit is already loaded (i.e. inside
+    `streamlit run`), so library code and the API server never import it.
+    """
+    value = os.getenv(name)
+    if value:
+        return value
+    if "streamlit" in sys.modules:
+        try:
+            value = sys.modules["streamlit"].secrets.get(name)
+        except Exception:
+            # No secrets.toml configured
+            value = None
+    return value or default
+
+
+def require_setting(name):
+    """Like get_setting, but raise if the setting is missing."""
+    value = get_setting(name)
+    if not value:
+        raise ValueError(f"{name} not set in environment variables or Streamlit secrets.")
+    return value
+
+
+GROQ_API_KEY = require_setting("GROQ_API_KEY")
+GROQ_MODEL = require_setting("GROQ_MODEL")
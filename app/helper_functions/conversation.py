@@ -0,0 +1,93 @@
+import os
+import statistics
+
+from helper_functions.llm_client import estimate_tokens
+from helper_functions.query_parser import is_follow_up
+
+# Hard cap on the history sent with a prompt: recent turns plus the summary
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "400"))
+
+# Recent exchanges (question + answer) kept verbatim before they are summarised
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "3"))
+
+# Longest assistant answer kept in history; product tables are clipped to this
+MEMORY_MAX_ANSWER_CHARS = 300
+
+# Longest question kept as a line of the summary
+MEMORY_SUMMARY_LINE_CHARS = 100
+
+
+def _clip(text, limit):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+class ConversationMemory:
+    """
+    Bounded state of one conversation, carried from turn to turn.
+
+    Holds the last product filter and the prices it showed, the most recent
+    exchanges verbatim, and a one-line-per-question summary of older ones. History
+    is compacted after every turn so `history_messages()` never exceeds
+    `token_budget`, however long the conversation gets. The summary is extractive,
+    so compaction costs no LLM call.
+    """
+
+    def __init__(self, token_budget=MEMORY_TOKEN_BUDGET, recent_turns=MEMORY_RECENT_TURNS):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.turns = []
+        self.summary = []
+        self.last_route = None
+        self.last_filter = None
+        self.reference_price = None
+
+    def add_turn(self, route, question, answer):
+        """Record a finished exchange and compact the history to the budget."""
+        self.last_route = route
+        if route != "sql":
+            self.last_filter = None
+            self.reference_price = None
+        self.turns.append({"role": "user", "content": _clip(question, MEMORY_MAX_ANSWER_CHARS)})
+        self.turns.append({"role": "assistant", "content": _clip(answer or "", MEMORY_MAX_ANSWER_CHARS)})
+        self._compact()
+
+    def remember_products(self, product_filter, prices):
+        """
+        Keep the filter behind a product answer for follow-ups.
+
+        Args:
+            product_filter (ProductFilter | None): Parsed filter, or None when the SQL
+                came from the LLM and cannot be refined locally
+            prices (list[float]): price_after_discount of the products shown
+        """
+        self.last_filter = product_filter
+        prices = [price for price in prices if price is not None]
+        self.reference_price = statistics.median(prices) if prices else None
+
+    def is_product_follow_up(self, question):
+        """Whether `question` refines the previous product answer."""
+        return self.last_route == "sql" and is_follow_up(question)
+
+    def _tokens(self):
+        return sum(estimate_tokens(message["content"]) for message in self.history_messages())
+
+    def _compact(self):
+        # Fold the oldest exchanges into the summary while over the turn count or budget
+        while self.turns and (len(self.turns) > 2 * self.recent_turns or self._tokens() > self.token_budget):
+            question, _ = self.turns[:2]
+            self.turns = self.turns[2:]
+            self.summary.append(f"- {_clip(question['content'], MEMORY_SUMMARY_LINE_CHARS)}")
+        # Then drop the oldest summary lines
+        while self.summary and self._tokens() > self.token_budget:
+            self.summary.pop(0)
+
+    def history_messages(self):
+        """Chat messages to place between the system prompt and the new question."""
+        messages = []
+        if self.summary:
+            messages.append({
+                "role": "system",
+                "content": "Earlier in this conversation the user asked:\n" + "\n".join(self.summary),
+            })
+        return messages + self.turns
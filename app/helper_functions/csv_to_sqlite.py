@@ -1,45 +1,256 @@
+import argparse
+import csv
 import os
-import pandas as pd
+import re
 import sqlite3
+import time
+from itertools import islice
 
-# Get base directory relative to this script
-base_dir = os.path.dirname(os.path.abspath(__file__))
+from helper_functions import catalog
 
-# Database and CSV file paths — constructed as absolute paths relative to this file
-db_path = os.path.join(base_dir, "myntra_db.sqlite")
+# Scrape ingested when no CSV is given on the command line
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 csv_path = os.path.join(base_dir, "resources", "myntra_sports_shoes_20251011.csv")
 
-# Connect to SQLite database
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
+# Rows sent per executemany() call; a whole run is still a single transaction
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
 
-# Drop existing table to avoid schema mismatch
-cursor.execute('DROP TABLE IF EXISTS product;')
+# Wait this long for another writer before giving up; readers never block the load
+INGEST_BUSY_TIMEOUT_SECONDS = float(os.getenv("INGEST_BUSY_TIMEOUT_SECONDS", "30"))
 
-# Recreate the table with the correct schema
-cursor.execute('''
-CREATE TABLE product (    
+PRODUCT_COLUMNS = [
+    "title", "brand", "gender", "mrp", "discount_percent", "price_after_discount",
+    "star_rating", "num_ratings", "product_link", "scraped_on",
+]
+PRICE_COLUMNS = ["mrp", "discount_percent", "price_after_discount", "star_rating", "num_ratings"]
+
+# product_id is the Myntra id from product_link. Unisex shoes are listed once for
+# men and once for women under the same id, so a listing is (product_id, gender).
+PRODUCT_SCHEMA = """
+CREATE TABLE {table} (
     title TEXT,
     brand TEXT,
-    gender TEXT,
+    gender TEXT NOT NULL,
     mrp INTEGER,
-    discount_percent FLOAT,
+    discount_percent INTEGER,
     price_after_discount INTEGER,
-    star_rating FLOAT,
+    star_rating REAL,
     num_ratings INTEGER,
     product_link TEXT,
-    scraped_on DATETIME
-);
-''')
+    scraped_on TEXT,
+    product_id INTEGER NOT NULL,
+    PRIMARY KEY (product_id, gender)
+)
+"""
+
+# One row per product and scrape in which its price differed from the scrape before
+PRICE_HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS price_history (
+    product_id INTEGER NOT NULL,
+    scraped_on TEXT NOT NULL,
+    mrp INTEGER,
+    discount_percent INTEGER,
+    price_after_discount INTEGER,
+    star_rating REAL,
+    num_ratings INTEGER,
+    PRIMARY KEY (product_id, scraped_on)
+) WITHOUT ROWID
+"""
+
+# An older scrape never overwrites a newer one, so files can be loaded in any order
+UPSERT_SQL = f"""
+INSERT INTO {{table}} ({", ".join(PRODUCT_COLUMNS)}, product_id)
+VALUES ({", ".join("?" * (len(PRODUCT_COLUMNS) + 1))})
+ON CONFLICT (product_id, gender) DO UPDATE SET {", ".join(f"{column} = excluded.{column}" for column in PRODUCT_COLUMNS)}
+WHERE {{table}}.scraped_on IS NULL OR excluded.scraped_on >= {{table}}.scraped_on
+"""
+
+HISTORY_SQL = f"""
+INSERT OR IGNORE INTO price_history (product_id, scraped_on, {", ".join(PRICE_COLUMNS)})
+SELECT ?1, ?2, ?3, ?4, ?5, ?6, ?7
+WHERE NOT EXISTS (
+    SELECT 1 FROM (
+        SELECT mrp, discount_percent, price_after_discount FROM price_history
+        WHERE product_id = ?1 AND scraped_on <= ?2
+        ORDER BY scraped_on DESC
+        LIMIT 1
+    )
+    WHERE mrp IS ?3 AND discount_percent IS ?4 AND price_after_discount IS ?5
+)
+"""
+
+PRODUCT_ID = re.compile(r"/(\d+)/buy")
+
+# Cell values read as NULL, as pandas writes them or scrapers leave them
+MISSING = {"", "nan", "NaN", "None", "none", "null", "NULL"}
+
+
+def _integer(raw):
+    return int(float(raw))
+
+
+# How a CSV cell of each numeric column is read; text columns are stripped
+CONVERTERS = {
+    "mrp": _integer,
+    "discount_percent": _integer,
+    "price_after_discount": _integer,
+    "star_rating": float,
+    "num_ratings": _integer,
+}
+COLUMN_CONVERTERS = [(column, CONVERTERS.get(column, str.strip)) for column in PRODUCT_COLUMNS]
+GENDER = PRODUCT_COLUMNS.index("gender")
+LINK = PRODUCT_COLUMNS.index("product_link")
+SCRAPED_ON = PRODUCT_COLUMNS.index("scraped_on")
+PRICES = [PRODUCT_COLUMNS.index(column) for column in PRICE_COLUMNS]
+
+
+def product_id(link):
+    """Myntra product id from a product URL (.../<id>/buy), or None."""
+    match = PRODUCT_ID.search(link or "")
+    return int(match.group(1)) if match else None
+
+
+def _parse(row):
+    """Typed values of a CSV or table row, in PRODUCT_COLUMNS order."""
+    values = []
+    for column, convert in COLUMN_CONVERTERS:
+        raw = row.get(column)
+        values.append(None if raw is None or raw in MISSING else convert(raw) if isinstance(raw, str) else raw)
+    return values
+
+
+def read_scrapes(paths):
+    """Yield the rows of every scrape CSV as dicts, one file after another, without loading them whole."""
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+
+
+def _write(conn, table, rows, batch_size, counts, seen=False):
+    """Upsert `rows` into `table` and record price changes, `batch_size` rows per statement."""
+    rows = iter(rows)
+    while True:
+        batch = []
+        for row in islice(rows, batch_size):
+            values = _parse(row)
+            pid = product_id(values[LINK])
+            if pid is None or values[GENDER] is None:
+                counts["skipped"] += 1
+                continue
+            batch.append(values + [pid])
+        if not batch:
+            return
+
+        before = conn.total_changes
+        conn.executemany(UPSERT_SQL.format(table=table), batch)
+        counts["upserted"] += conn.total_changes - before
+
+        before = conn.total_changes
+        conn.executemany(HISTORY_SQL, [
+            [values[-1], values[SCRAPED_ON]] + [values[i] for i in PRICES]
+            for values in batch if values[SCRAPED_ON] is not None
+        ])
+        counts["history"] += conn.total_changes - before
+        counts["rows"] += len(batch)
+
+        if seen:
+            conn.executemany("INSERT OR IGNORE INTO temp.ingested (product_id, gender) VALUES (?, ?)",
+                             [(values[-1], values[GENDER]) for values in batch])
+
+
+def _prepare_schema(conn, batch_size):
+    """
+    Create the product table, or rebuild one written by the old DROP-and-replace
+    loader with a product_id key; existing rows seed the price history.
+
+    Returns:
+        int: Rows carried over from the old table
+    """
+    conn.execute(PRICE_HISTORY_SCHEMA)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(product)")]
+    if "product_id" in columns:
+        return 0
+    counts = {"rows": 0, "upserted": 0, "skipped": 0, "history": 0}
+    conn.execute("DROP TABLE IF EXISTS product_new")
+    conn.execute(PRODUCT_SCHEMA.format(table="product_new"))
+    if columns:
+        cursor = conn.execute(f"SELECT {', '.join(PRODUCT_COLUMNS)} FROM product")
+        _write(conn, "product_new", (dict(zip(PRODUCT_COLUMNS, row)) for row in cursor), batch_size, counts)
+        conn.execute("DROP TABLE product")
+    conn.execute("ALTER TABLE product_new RENAME TO product")
+    return counts["upserted"]
+
+
+def ingest(paths, db_path=catalog.DB_PATH, batch_size=INGEST_BATCH_SIZE, prune=False):
+    """
+    Upsert scrape CSVs into the catalog as one new catalog version.
+
+    Rows are keyed on the product id parsed from `product_link` (and gender, for
+    unisex shoes listed under both) and streamed in batches, all inside one
+    transaction on a WAL-mode database: workers keep reading the previous version
+    until the commit, then see the new one whole.
+    The commit also bumps `PRAGMA user_version`, so `catalog.catalog_version()`
+    changes and the plan cache, catalog statistics and warm-start brands are
+    rebuilt. Each price change is kept in `price_history`.
+
+    Args:
+        paths (list[str]): Scrape CSVs with the product table's columns
+        db_path (str): Catalog database file
+        batch_size (int): Rows per executemany() call
+        prune (bool): Delete products that are in none of `paths`; use it with a
+            complete scrape, not with one category
 
-conn.commit()
+    Returns:
+        dict: Rows read, upserted, skipped (no product id or gender), price changes
+        recorded, products pruned, rows migrated from an old-style table, and the
+        new catalog version
+    """
+    counts = {"rows": 0, "upserted": 0, "skipped": 0, "history": 0, "pruned": 0, "migrated": 0}
+    conn = sqlite3.connect(db_path, timeout=INGEST_BUSY_TIMEOUT_SECONDS, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            counts["migrated"] = _prepare_schema(conn, batch_size)
+            if prune:
+                conn.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS ingested (product_id, gender, PRIMARY KEY (product_id, gender))"
+                )
+            _write(conn, "product", read_scrapes(paths), batch_size, counts, seen=prune)
+            if prune:
+                counts["pruned"] = conn.execute(
+                    "DELETE FROM product "
+                    "WHERE (product_id, gender) NOT IN (SELECT product_id, gender FROM temp.ingested)"
+                ).rowcount
 
-# Read CSV file
-df = pd.read_csv(csv_path)
+            catalog.ensure_indexes(conn, commit=False)
+            user_version = conn.execute("PRAGMA user_version").fetchone()[0]
+            conn.execute(f"PRAGMA user_version = {user_version + 1}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        # Fold the load back into the database file once readers allow it
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        counts["catalog_version"] = catalog.catalog_version(db_path)
+        return counts
+    finally:
+        conn.close()
 
-# Insert data
-df.to_sql('product', conn, if_exists='replace', index=False)
 
-conn.close()
+if __name__ == "__main__":
+    # From the app directory: python -m helper_functions.csv_to_sqlite [scrape.csv ...] [--prune]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv", nargs="*", default=[csv_path])
+    parser.add_argument("--db", default=catalog.DB_PATH)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--prune", action="store_true", help="delete products missing from these scrapes")
+    args = parser.parse_args()
 
-print("✅ Data inserted successfully!")
+    start = time.perf_counter()
+    result = ingest(args.csv, args.db, args.batch_size, args.prune)
+    print(f"✅ Catalog version {result['catalog_version']}: {result['rows']} rows read, "
+          f"{result['upserted']} upserted, {result['history']} price changes, "
+          f"{result['skipped']} skipped without a product id or gender, {result['pruned']} pruned "
+          f"in {time.perf_counter() - start:.1f}s")
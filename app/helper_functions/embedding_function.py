@@ -1,3 +1,9 @@
+from functools import lru_cache
+from typing import Any, List
+
+from helper_functions.model_registry import DEFAULT_EMBEDDING_MODEL, encode
+
+
 class CPUEmbeddingFunction:
     def __init__(self, model):
         self.model = model
@@ -7,8 +13,34 @@ class CPUEmbeddingFunction:
         Encode a list of strings into embeddings.
         Must return list[list[float]] for ChromaDB compatibility.
         """
-        embeddings = self.model.encode(input, convert_to_tensor=False)
+        embeddings = self.model.encode(input, convert_to_tensor=False, normalize_embeddings=True)
         return embeddings.tolist()
 
     def name(self):
         return "CPUEmbeddingFunction"
+
+
+@lru_cache(maxsize=None)
+def shared_model_encoder_class():
+    """
+    Return the SharedModelEncoder class, importing semantic-router on first use.
+
+    The class subclasses semantic-router's DenseEncoder, so it is defined here
+    rather than at import time, which would load semantic-router for every caller
+    of CPUEmbeddingFunction too.
+    """
+    from semantic_router.encoders import DenseEncoder
+
+    class SharedModelEncoder(DenseEncoder):
+        """
+        semantic-router encoder backed by the shared model registry, so the router and
+        the FAQ collection use the same weights and the same query embedding.
+        """
+        name: str = DEFAULT_EMBEDDING_MODEL
+        type: str = "huggingface"
+        score_threshold: float = 0.5
+
+        def __call__(self, docs: List[Any]) -> List[List[float]]:
+            return encode(docs, self.name)
+
+    return SharedModelEncoder
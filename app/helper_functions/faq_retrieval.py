@@ -0,0 +1,239 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import NamedTuple, Optional
+
+from helper_functions.llm_client import estimate_tokens
+
+# Candidates taken from each retriever before fusion
+FAQ_CANDIDATES = int(os.getenv("FAQ_CANDIDATES", "10"))
+
+# Reciprocal rank fusion constant; larger values flatten the rank weighting
+RRF_K = int(os.getenv("FAQ_RRF_K", "60"))
+
+# Optional local cross-encoder, e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2".
+# Unset keeps retrieval to BM25 + vectors only.
+FAQ_RERANKER_MODEL = os.getenv("FAQ_RERANKER_MODEL", "")
+FAQ_RERANK_TOP_K = int(os.getenv("FAQ_RERANK_TOP_K", "5"))
+
+# Answers passed to the LLM: the best one always, up to FAQ_MAX_ANSWERS while
+# their combined size stays within FAQ_CONTEXT_TOKENS
+FAQ_MAX_ANSWERS = int(os.getenv("FAQ_MAX_ANSWERS", "3"))
+FAQ_CONTEXT_TOKENS = int(os.getenv("FAQ_CONTEXT_TOKENS", "600"))
+
+# Direct answers: the stored ANSWER is returned without the LLM when the top hit is
+# also the nearest vector, its distance is at most FAQ_DIRECT_MAX_DISTANCE and the
+# next vector is at least FAQ_DIRECT_MIN_MARGIN further away. Distances are Chroma's
+# squared L2 on unit vectors (2 - 2 * cosine). Off by default: the two thresholds
+# below are starting points, not calibrated values. Run
+# `python -m benchmarks.faq_direct_calibration` with the deployed model, set the
+# recommended pair, then enable with FAQ_DIRECT_ANSWERS=1.
+FAQ_DIRECT_ANSWERS = os.getenv("FAQ_DIRECT_ANSWERS", "0") == "1"
+FAQ_DIRECT_MAX_DISTANCE = float(os.getenv("FAQ_DIRECT_MAX_DISTANCE", "0.30"))
+FAQ_DIRECT_MIN_MARGIN = float(os.getenv("FAQ_DIRECT_MIN_MARGIN", "0.10"))
+
+# Trim direct answers longer than this many sentences to the ones sharing the most
+# words with the question; 0 returns the stored answer verbatim
+FAQ_DIRECT_MAX_SENTENCES = int(os.getenv("FAQ_DIRECT_MAX_SENTENCES", "0"))
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "if", "in", "is", "it", "me", "my", "of", "on", "or", "the", "this", "to", "what",
+    "when", "where", "which", "why", "will", "with", "you", "your",
+}
+
+_rerankers = {}
+_rerankers_lock = threading.Lock()
+
+
+class FAQHit(NamedTuple):
+    """One FAQ entry returned by retrieval, best first."""
+    id: str
+    question: str
+    answer: str
+    score: float
+    distance: Optional[float] = None
+
+
+def tokenize(text):
+    """Lowercase word tokens without stop words; "Rs. 2,000" becomes ["rs", "2000"]."""
+    text = re.sub(r"(?<=\d),(?=\d{3}\b)", "", text.lower())
+    return [token for token in re.findall(r"[a-z0-9]+", text) if token not in STOP_WORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a small in-memory corpus."""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(tokenize(document)) for document in documents]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        total = len(documents)
+        self.idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def search(self, query, top_k):
+        """
+        Score every document against the query.
+
+        Returns:
+            list[tuple[int, float]]: (document position, score) for the top_k
+            documents with a positive score, best first
+        """
+        terms = [term for term in tokenize(query) if term in self.idf]
+        scores = []
+        for position, counts in enumerate(self.term_counts):
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[position] / self.average_length)
+            score = sum(
+                self.idf[term] * counts[term] * (self.k1 + 1) / (counts[term] + norm)
+                for term in terms if term in counts
+            )
+            if score > 0:
+                scores.append((position, score))
+        scores.sort(key=lambda item: -item[1])
+        return scores[:top_k]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Fuse several ranked id lists: each id scores sum(1 / (k + rank)).
+
+    Returns:
+        list[tuple[str, float]]: (id, fused score), best first
+    """
+    fused = Counter()
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            fused[item_id] += 1.0 / (k + rank)
+    return fused.most_common()
+
+
+def get_reranker(name=FAQ_RERANKER_MODEL):
+    """Return the process-wide cross-encoder, or None when reranking is not configured."""
+    if not name:
+        return None
+    with _rerankers_lock:
+        if name not in _rerankers:
+            from sentence_transformers import CrossEncoder
+            _rerankers[name] = CrossEncoder(name, device="cpu")
+        return _rerankers[name]
+
+
+class HybridFAQRetriever:
+    """
+    BM25 over FAQ questions and answers, fused with the vector ranking from Chroma.
+
+    The vector search stays in the Chroma collection; this class holds the keyword
+    side, keyed by the same content-addressed row ids, so the two rankings can be
+    fused without another lookup.
+    """
+
+    def __init__(self, rows, reranker=None, rerank_top_k=FAQ_RERANK_TOP_K):
+        """
+        Args:
+            rows (dict[str, tuple[str, str]]): Row id -> (question, answer)
+            reranker (CrossEncoder | None): Optional cross-encoder for the fused top-k
+            rerank_top_k (int): Fused candidates rescored by the reranker
+        """
+        self.rows = rows
+        self.ids = list(rows)
+        self.bm25 = BM25Index([f"{question} {answer}" for question, answer in rows.values()])
+        self.reranker = reranker
+        self.rerank_top_k = rerank_top_k
+
+    def keyword_ranking(self, query, top_k=FAQ_CANDIDATES):
+        return [self.ids[position] for position, _ in self.bm25.search(query, top_k)]
+
+    def search(self, query, vector_ids, vector_distances, top_k=FAQ_CANDIDATES):
+        """
+        Rank FAQ entries for a query.
+
+        Args:
+            query (str): User question
+            vector_ids (list[str]): Ids from the vector search, nearest first
+            vector_distances (list[float]): Matching distances from the vector search
+            top_k (int): Candidates taken from BM25
+
+        Returns:
+            list[FAQHit]: Entries best first; `distance` is set for vector candidates
+        """
+        distances = dict(zip(vector_ids, vector_distances))
+        fused = reciprocal_rank_fusion([
+            [row_id for row_id in vector_ids if row_id in self.rows],
+            self.keyword_ranking(query, top_k),
+        ])
+        hits = [
+            FAQHit(row_id, *self.rows[row_id], score=score, distance=distances.get(row_id))
+            for row_id, score in fused
+        ]
+
+        if self.reranker is not None and hits:
+            head = hits[:self.rerank_top_k]
+            scores = self.reranker.predict([(query, f"{hit.question} {hit.answer}") for hit in head])
+            head = [hit._replace(score=float(score)) for hit, score in zip(head, scores)]
+            head.sort(key=lambda hit: -hit.score)
+            hits = head + hits[self.rerank_top_k:]
+        return hits
+
+
+def select_context(hits, max_answers=FAQ_MAX_ANSWERS, token_budget=FAQ_CONTEXT_TOKENS):
+    """The best hit, plus following hits while they fit in the token budget."""
+    selected = []
+    used = 0
+    for hit in hits[:max_answers]:
+        cost = estimate_tokens(hit.answer)
+        if selected and used + cost > token_budget:
+            break
+        selected.append(hit)
+        used += cost
+    return selected
+
+
+def is_confident(hits, max_distance=FAQ_DIRECT_MAX_DISTANCE, min_margin=FAQ_DIRECT_MIN_MARGIN):
+    """Whether the top hit is a clear enough vector match to be returned as is."""
+    distances = sorted(hit.distance for hit in hits if hit.distance is not None)
+    if not hits or hits[0].distance is None or hits[0].distance > distances[0]:
+        return False
+    if hits[0].distance > max_distance:
+        return False
+    return len(distances) < 2 or distances[1] - distances[0] >= min_margin
+
+
+def extract_relevant(answer, query, max_sentences):
+    """Keep the `max_sentences` sentences sharing the most words with the query, in order."""
+    sentences = [sentence for sentence in re.split(r"(?<=[.!?])\s+", answer.strip()) if sentence]
+    if len(sentences) <= max_sentences:
+        return answer
+    terms = set(tokenize(query))
+    ranked = sorted(
+        range(len(sentences)), key=lambda i: (-len(terms & set(tokenize(sentences[i]))), i)
+    )
+    return " ".join(sentences[i] for i in sorted(ranked[:max_sentences]))
+
+
+def direct_answer(query, hits, max_sentences=FAQ_DIRECT_MAX_SENTENCES):
+    """
+    Return the stored answer of a confident match, or None when the LLM should answer.
+
+    Args:
+        query (str): User question
+        hits (list[FAQHit]): Retrieval results, best first
+        max_sentences (int): Extractive trim length; 0 keeps the whole answer
+
+    Returns:
+        str | None: FAQ answer text
+    """
+    if not FAQ_DIRECT_ANSWERS or not is_confident(hits):
+        return None
+    answer = hits[0].answer.strip()
+    if max_sentences:
+        answer = extract_relevant(answer, query, max_sentences)
+    return answer
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import threading
+
+import httpx
+from groq import AsyncGroq, Groq
+
+from helper_functions import tracing
+
+# Connection pool shared by every route's Groq calls in this process
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", "60"))
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _limits():
+    return httpx.Limits(max_connections=GROQ_MAX_CONNECTIONS, max_keepalive_connections=GROQ_MAX_CONNECTIONS)
+
+
+def get_groq_client(api_key):
+    """Return the process-wide Groq client, backed by one pooled HTTP client."""
+    with _clients_lock:
+        if "sync" not in _clients:
+            _clients["sync"] = Groq(
+                api_key=api_key,
+                http_client=httpx.Client(limits=_limits(), timeout=GROQ_TIMEOUT_SECONDS),
+            )
+        return _clients["sync"]
+
+
+def get_async_groq_client(api_key):
+    """
+    Return the process-wide AsyncGroq client.
+
+    The async HTTP pool is bound to the event loop that first uses it: in one process,
+    await it either on the loop from `get_event_loop()` (sync wrappers) or on the
+    server's loop (ASGI app), not both.
+    """
+    with _clients_lock:
+        if "async" not in _clients:
+            _clients["async"] = AsyncGroq(
+                api_key=api_key,
+                http_client=httpx.AsyncClient(limits=_limits(), timeout=GROQ_TIMEOUT_SECONDS),
+            )
+        return _clients["async"]
+
+
+def get_event_loop():
+    """Return the background event loop that runs the async pipeline, starting it once."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="assistant-event-loop", daemon=True).start()
+        return _loop
+
+
+def run_sync(coroutine):
+    """Run a coroutine on the background loop and block until it returns."""
+    return asyncio.run_coroutine_threadsafe(coroutine, get_event_loop()).result()
+
+
+def iterate_sync(async_iterator):
+    """Expose an async iterator running on the background loop as a plain generator."""
+    loop = get_event_loop()
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(async_iterator.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
+
+
+def estimate_tokens(text):
+    """Rough LLM token count (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def record_usage(span, usage):
+    """Copy prompt and completion token counts from a Groq `usage` object onto a trace span."""
+    if usage is not None:
+        span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+
+def _stream_usage(chunk):
+    # Groq reports usage for a stream in an extra field of its last chunk
+    return getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None)
+
+
+def stream_content(chunks, span=None):
+    """
+    Yield the text deltas of a streamed chat completion.
+
+    Args:
+        chunks (Iterable): Chunks returned by `chat.completions.create(..., stream=True)`
+        span (tracing.Span, optional): Span of the LLM call; gets the time to first
+            token and the token usage, and is finished when the stream ends
+
+    Yields:
+        str: Non-empty content fragments in order
+    """
+    try:
+        for chunk in chunks:
+            if span is not None:
+                record_usage(span, _stream_usage(chunk))
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                if span is not None and "first_token_ms" not in span.attributes:
+                    span.set(first_token_ms=round(span.duration_ms, 1))
+                yield content
+    finally:
+        if span is not None:
+            span.finish()
+
+
+async def astream_content(chunks, span=None):
+    """Async counterpart of `stream_content` for AsyncGroq streams."""
+    try:
+        async for chunk in chunks:
+            if span is not None:
+                record_usage(span, _stream_usage(chunk))
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                if span is not None and "first_token_ms" not in span.attributes:
+                    span.set(first_token_ms=round(span.duration_ms, 1))
+                yield content
+    finally:
+        if span is not None:
+            span.finish()
+
+
+def _fail(span, error):
+    """Finish the span of an LLM call that raised, as `tracing.span` would."""
+    span.set(error=type(error).__name__)
+    span.finish()
+
+
+def complete(client, request, model, stream=False, span_name="llm"):
+    """
+    Send a chat completion, traced as `span_name` with its token usage.
+
+    Args:
+        client (Groq): Sync Groq client
+        request (dict): Chat completion arguments (messages, temperature, ...)
+        model (str): Groq model name
+        stream (bool): Return a generator of text deltas instead of the text
+        span_name (str): Name of the trace span for this call
+
+    Returns:
+        str | Iterator[str]: Completion text, or its deltas when streaming
+    """
+    span = tracing.start_span(span_name, model=model)
+    try:
+        chat_completion = client.chat.completions.create(**request, model=model, stream=stream)
+    except Exception as error:
+        _fail(span, error)
+        raise
+    if stream:
+        return stream_content(chat_completion, span)
+    record_usage(span, chat_completion.usage)
+    span.finish()
+    return chat_completion.choices[0].message.content
+
+
+async def acomplete(client, request, model, stream=False, span_name="llm"):
+    """Async counterpart of `complete` for the AsyncGroq client."""
+    span = tracing.start_span(span_name, model=model)
+    try:
+        chat_completion = await client.chat.completions.create(**request, model=model, stream=stream)
+    except Exception as error:
+        _fail(span, error)
+        raise
+    if stream:
+        return astream_content(chat_completion, span)
+    record_usage(span, chat_completion.usage)
+    span.finish()
+    return chat_completion.choices[0].message.content
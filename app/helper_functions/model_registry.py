@@ -0,0 +1,92 @@
+import os
+import threading
+from helper_functions.batch_encoder import BatchingEncoder
+
+# One embedding model serves both intent routing and FAQ retrieval
+DEFAULT_EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L12-v2")
+
+# Inference backend: "torch", "onnx" or "onnx-int8" (dynamic int8 quantization)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Intra-op threads for ONNX Runtime; unset lets the runtime pick
+ONNX_NUM_THREADS = int(os.getenv("ONNX_NUM_THREADS", "0")) or None
+
+# Concurrent encode() calls are coalesced into batches of up to this many
+# sentences, waiting at most ENCODER_MAX_WAIT_MS for others to join when calls
+# are already queued; a call that arrives alone is not delayed. A wait of 0
+# encodes every call directly.
+ENCODER_BATCH_SIZE = int(os.getenv("ENCODER_BATCH_SIZE", "32"))
+ENCODER_MAX_WAIT_MS = float(os.getenv("ENCODER_MAX_WAIT_MS", "2"))
+
+_models = {}
+_batchers = {}
+_models_lock = threading.Lock()
+
+
+def load_embedding_model(name, backend):
+    """Load `name` with the given backend, bypassing the registry cache."""
+    if backend == "torch":
+        # Imported here: torch alone takes seconds to import and is not needed until a query is encoded
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(name, device='cpu')
+    if backend in ("onnx", "onnx-int8"):
+        from helper_functions.onnx_backend import OnnxSentenceEncoder
+        return OnnxSentenceEncoder(name, quantize=backend == "onnx-int8", num_threads=ONNX_NUM_THREADS)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {EMBEDDING_BACKENDS}")
+
+
+def get_embedding_model(name=DEFAULT_EMBEDDING_MODEL, backend=EMBEDDING_BACKEND):
+    """
+    Return the process-wide embedding model for `name`, loading it on first use.
+
+    Module state survives Streamlit reruns, so every caller in a worker shares the
+    same weights instead of loading its own copy.
+
+    Args:
+        name (str): Hugging Face model id
+        backend (str): One of EMBEDDING_BACKENDS
+
+    Returns:
+        SentenceTransformer | OnnxSentenceEncoder: Model exposing `encode()` on CPU
+    """
+    with _models_lock:
+        if (name, backend) not in _models:
+            _models[(name, backend)] = load_embedding_model(name, backend)
+        return _models[(name, backend)]
+
+
+def encode(texts, name=DEFAULT_EMBEDDING_MODEL):
+    """
+    Encode a list of strings into L2-normalized embeddings.
+
+    Args:
+        texts (list[str]): Sentences to encode
+        name (str): Hugging Face model id
+
+    Returns:
+        list[list[float]]: One embedding per input string
+    """
+    if ENCODER_MAX_WAIT_MS <= 0:
+        return encode_direct(texts, name)
+    return get_batching_encoder(name).encode(texts)
+
+
+def encode_direct(texts, name=DEFAULT_EMBEDDING_MODEL):
+    """Encode in the calling thread, without joining a batch."""
+    model = get_embedding_model(name)
+    embeddings = model.encode(texts, convert_to_tensor=False, normalize_embeddings=True)
+    return embeddings.tolist()
+
+
+def get_batching_encoder(name=DEFAULT_EMBEDDING_MODEL):
+    """Return the process-wide BatchingEncoder in front of model `name`, sized by ENCODER_* settings."""
+    get_embedding_model(name)
+    with _models_lock:
+        if name not in _batchers:
+            _batchers[name] = BatchingEncoder(
+                lambda texts: encode_direct(texts, name),
+                max_batch_size=ENCODER_BATCH_SIZE,
+                max_wait_ms=ENCODER_MAX_WAIT_MS,
+            )
+        return _batchers[name]
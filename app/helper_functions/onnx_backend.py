@@ -0,0 +1,139 @@
+import json
+import os
+import numpy as np
+import onnxruntime as ort
+from transformers import AutoTokenizer
+
+# Exported models are cached next to the other runtime resources
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ONNX_CACHE_DIR = os.path.join(base_dir, "resources", "onnx")
+
+
+# Written next to the export, with the same name and fields as sentence-transformers uses
+SENTENCE_CONFIG_NAME = "sentence_bert_config.json"
+
+
+def _model_dir(model_name):
+    return os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "__"))
+
+
+def model_max_seq_length(model_name):
+    """
+    Token limit the sentence-transformers model truncates inputs at (128 for
+    all-MiniLM-L12-v2), so ONNX embeddings of long texts match PyTorch ones.
+    """
+    config_path = os.path.join(_model_dir(model_name), SENTENCE_CONFIG_NAME)
+    if not os.path.exists(config_path):
+        # Exported before the limit was saved alongside the model
+        from huggingface_hub import hf_hub_download
+        config_path = hf_hub_download(model_name, SENTENCE_CONFIG_NAME)
+    with open(config_path, encoding="utf-8") as f:
+        return json.load(f)["max_seq_length"]
+
+
+def export_onnx_model(model_name, quantize=False):
+    """
+    Export a sentence-transformers model to ONNX, optionally with int8 weights.
+
+    The export runs once per model; later calls return the cached file. torch is only
+    imported here, so a worker that finds the cached file never loads it.
+
+    Args:
+        model_name (str): Hugging Face model id
+        quantize (bool): Apply dynamic int8 quantization to the exported graph
+
+    Returns:
+        str: Path of the ONNX model to load
+    """
+    model_dir = _model_dir(model_name)
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    int8_path = os.path.join(model_dir, "model-int8.onnx")
+
+    if not os.path.exists(fp32_path):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        os.makedirs(model_dir, exist_ok=True)
+        st_model = SentenceTransformer(model_name, device='cpu')
+        transformer = st_model[0].auto_model.eval()
+        tokenizer = st_model.tokenizer
+        tokenizer.save_pretrained(model_dir)
+        with open(os.path.join(model_dir, SENTENCE_CONFIG_NAME), "w", encoding="utf-8") as f:
+            json.dump({"max_seq_length": st_model.max_seq_length}, f)
+
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer,
+                tuple(sample[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+            )
+
+    if not quantize:
+        return fp32_path
+
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+class OnnxSentenceEncoder:
+    """
+    ONNX Runtime replacement for SentenceTransformer on CPU.
+
+    Mirrors the subset of `SentenceTransformer.encode` used in this app (mean pooling
+    plus optional L2 normalization, truncation at the model's own max_seq_length), so
+    it can be returned from the model registry and wrapped by CPUEmbeddingFunction
+    unchanged.
+    """
+
+    def __init__(self, model_name, quantize=False, num_threads=None, max_seq_length=None):
+        self.model_name = model_name
+        model_path = export_onnx_model(model_name, quantize=quantize)
+        self.max_seq_length = max_seq_length or model_max_seq_length(model_name)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(_model_dir(model_name))
+
+    def encode(self, sentences, batch_size=32, convert_to_tensor=False, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            tokens = self.tokenizer(
+                sentences[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            feeds = {name: tokens[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+
+            # Mean pooling over real tokens, as in the sentence-transformers config
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled)
+
+        embeddings = np.concatenate(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+        if normalize_embeddings:
+            embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings[0] if single else embeddings
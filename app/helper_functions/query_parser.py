@@ -0,0 +1,457 @@
+import re
+from dataclasses import dataclass, field, fields, replace
+from typing import Optional, Tuple
+
+# Sort orders the parser can recognise, as SQL ORDER BY clauses
+SORT_ORDERS = {
+    "rating_desc": "star_rating DESC",
+    "price_asc": "price_after_discount ASC",
+    "price_desc": "price_after_discount DESC",
+    "discount_desc": "discount_percent DESC",
+    "popularity_desc": "num_ratings DESC",
+}
+
+# Shoe categories that appear in product titles
+CATEGORIES = (
+    "running", "walking", "training", "trekking", "tennis", "basketball",
+    "badminton", "cricket", "football", "skateboarding",
+)
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+
+# Words that carry no filter meaning in a product search
+FILLER_WORDS = {
+    "a", "all", "also", "an", "and", "any", "are", "available", "buy", "can", "could",
+    "do", "find", "for", "get", "give", "have", "i", "im", "in", "is", "it", "like",
+    "list", "looking", "me", "my", "need", "of", "on", "options", "or", "pair", "pairs",
+    "please", "product", "products", "recommend", "search", "shoe", "shoes", "show",
+    "some", "sports", "sneaker", "sneakers", "suggest", "that", "the", "there", "to",
+    "want", "which", "with", "would", "you", "footwear", "items", "only", "something",
+}
+
+# Questions asking for a single value or a comparison need the LLM
+AGGREGATE_PATTERN = re.compile(
+    r"\b(average|avg|mean|median|how many|number of|count|total|sum|compare|comparison|"
+    r"versus|vs|difference|what is the|what's the|price of)\b"
+)
+
+# Aggregates the precomputed catalog statistics answer, tried in this order
+AGGREGATE_METRICS = (
+    ("count", r"\b(?:how many|number of|count of|count)\b"),
+    ("avg_price", r"\b(?:average|avg|mean) (?:price|cost)\b"),
+    ("avg_rating", r"\b(?:average|avg|mean) (?:star )?ratings?\b"),
+    ("avg_discount", r"\b(?:average|avg|mean) discounts?\b"),
+    ("max_price", r"\b(?:price of (?:the )?)?(?:most expensive|costliest|priciest)\b|\b(?:highest|maximum|max) price\b"),
+    ("min_price", r"\b(?:price of (?:the )?)?(?:cheapest|least expensive)\b|\b(?:lowest|minimum|min) price\b"),
+    ("max_discount", r"\b(?:biggest|highest|maximum|max|largest) discounts?\b"),
+    ("max_rating", r"\b(?:highest|best|top|maximum|max)[\s-]rated\b|\b(?:highest|best|top|maximum|max) ratings?\b"),
+)
+
+# "average rating by brand": one answer line per brand or gender
+AGGREGATE_GROUP_PATTERN = r"\b(?:by|per|for each|for every|across|of each|in each) (brand|gender)s?\b"
+
+# Aggregate questions the statistics cannot answer
+COMPARISON_PATTERN = re.compile(r"\b(?:compare|comparison|versus|vs|difference|median|sum|total)\b")
+
+# Words an aggregate question may leave over without changing its meaning
+AGGREGATE_FILLER = {
+    "what", "whats", "is", "was", "the", "price", "prices", "rating", "ratings", "discount", "of", "your",
+    "we", "how", "much", "does", "do", "cost", "costs", "there", "here", "currently", "right", "now", "stock",
+    "catalog", "catalogue", "store", "overall", "rated", "by", "from", "sold", "sell", "carry", "offer",
+}
+
+# Messages that refine the previous product search rather than start a new one
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(?:what|how) about\b|^(?:and|also|now|only|instead|but)\b|"
+    r"\b(?:cheaper|less expensive|more expensive|costlier|pricier|those|these|them|ones|same|instead)\b"
+)
+
+# Relative price words in a follow-up, resolved against the prices shown last time
+CHEAPER_PATTERN = r"\b(?:cheaper|less expensive|lower priced|more affordable)\b"
+PRICIER_PATTERN = r"\b(?:more expensive|costlier|pricier|higher priced)\b"
+FOLLOW_UP_WORDS = r"^(?:what|how) about\b|^(?:and|also|now|but)\b|\b(?:those|these|them|ones|same|instead)\b"
+
+# Words that set the gender filter
+GENDER_PATTERNS = {
+    "women": r"\b(?:women|womens|woman|ladies|female|girls)(?:'s|s')?(?![a-z])",
+    "men": r"\b(?:men|mens|man|male|boys|gents)(?:'s|s')?(?![a-z])",
+}
+
+PRICE = r"(?:rs\s*)?(\d{3,})"
+PRICE_WORD = r"(?:(?:with\s+)?(?:a\s+)?(?:price|priced|costing)\s+(?:is\s+)?)?"
+RATING = r"(\d(?:\.\d+)?)"
+UPPER_WORDS = r"(?:under|below|less than|cheaper than|within|upto|up to|max(?:imum)?(?: price)?(?: of)?|not more than|lower than)"
+LOWER_WORDS = r"(?:above|over|more than|greater than|at least|atleast|min(?:imum)?(?: price)?(?: of)?|starting (?:at|from))"
+
+
+@dataclass
+class AggregateQuery:
+    """An aggregate product question answerable from the catalog statistics."""
+    metric: str
+    brand: Optional[str] = None
+    gender: Optional[str] = None
+    on_sale: Optional[bool] = None
+    rating_min: Optional[int] = None
+    discount_min: Optional[int] = None
+    group_by: Optional[str] = None
+
+
+@dataclass
+class ProductFilter:
+    """Structured constraints extracted from a product question."""
+    brand: Optional[str] = None
+    gender: Optional[str] = None
+    category: Optional[str] = None
+    price_min: Optional[Tuple[str, int]] = None
+    price_max: Optional[Tuple[str, int]] = None
+    rating_min: Optional[Tuple[str, float]] = None
+    discount_min: Optional[Tuple[str, float]] = None
+    sort: Optional[str] = None
+    limit: Optional[int] = None
+    confidence: float = 0.0
+    unparsed: list = field(default_factory=list)
+
+    def has_constraints(self):
+        return any(
+            value is not None for value in (
+                self.brand, self.gender, self.category, self.price_min, self.price_max,
+                self.rating_min, self.discount_min, self.sort, self.limit,
+            )
+        )
+
+
+def normalize_question(question):
+    """Lowercase, unify currency markers and expand '8,000' / '8k' into plain integers."""
+    text = question.lower().replace("’", "'").replace("₹", " rs ")
+    text = re.sub(r"\b(?:rs\.?|inr|rupees?)(?=\s|\d|$)", " rs ", text)
+    text = re.sub(r"(?<=\d),(?=\d{3}\b)", "", text)
+    text = re.sub(r"(\d+(?:\.\d+)?)\s*k\b", lambda m: str(int(float(m.group(1)) * 1000)), text)
+    text = re.sub(r"(?<=\d)\s*(?:/-|/)", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def brand_aliases(brands):
+    """Map lowercase aliases to catalog brand names, longest alias first."""
+    aliases = {}
+    for brand in brands:
+        name = brand.lower()
+        aliases.setdefault(name, brand)
+        if " by " in name:
+            aliases.setdefault(name.split(" by ")[0], brand)
+    return dict(sorted(aliases.items(), key=lambda item: -len(item[0])))
+
+
+def brand_family(brand, brands):
+    """
+    Catalog brands a parsed brand stands for: the brand itself and every catalog
+    brand that starts with it as a word, so "ADIDAS" also covers "ADIDAS Originals"
+    and "Reebok" covers "Reebok Classic", as substring matching on brand used to.
+
+    Args:
+        brand (str): Catalog brand returned by the parser
+        brands (list[str]): Distinct `brand` values from the product table
+
+    Returns:
+        list[str]: Matching catalog brands, `brand` first
+    """
+    name = brand.lower()
+    family = {alias_brand for alias, alias_brand in brand_aliases(brands).items() if alias.startswith(name + " ")}
+    return [brand] + sorted(family - {brand}, key=str.lower)
+
+
+class _Scanner:
+    """Consumes matched spans so the leftover words measure parse coverage."""
+
+    def __init__(self, text):
+        self.text = f" {text} "
+
+    def take(self, pattern):
+        match = re.search(pattern, self.text)
+        if match:
+            self.text = self.text[:match.start()] + " " + self.text[match.end():]
+        return match
+
+    def leftover_words(self):
+        return re.findall(r"[a-z0-9.]+", self.text.replace("'", ""))
+
+
+def parse_product_query(question, brands):
+    """
+    Parse a product question into a ProductFilter without calling the LLM.
+
+    Every recognised phrase is consumed from the question. Words left over that are
+    not filler lower the confidence, so the caller can fall back to the LLM for
+    anything the parser does not fully understand.
+
+    Args:
+        question (str): Natural language product question
+        brands (list[str]): Distinct `brand` values from the product table
+
+    Returns:
+        ProductFilter | None: Parsed filter, or None for aggregate questions
+    """
+    text = normalize_question(question)
+    if AGGREGATE_PATTERN.search(text):
+        return None
+
+    scanner = _Scanner(text)
+    parsed = ProductFilter()
+    matched = 0
+
+    for alias, brand in brand_aliases(brands).items():
+        if scanner.take(rf"(?<![a-z]){re.escape(alias)}(?:'s)?(?![a-z])"):
+            parsed.brand = brand
+            matched += 1
+            break
+
+    genders = set()
+    for gender, pattern in GENDER_PATTERNS.items():
+        while scanner.take(pattern):
+            genders.add(gender)
+    if genders:
+        matched += 1
+        parsed.gender = genders.pop() if len(genders) == 1 else None
+
+    for category in CATEGORIES:
+        if scanner.take(rf"\b{category}\b"):
+            parsed.category = category
+            matched += 1
+            break
+
+    # Ratings first, so their small numbers are never mistaken for prices or counts
+    rating_patterns = (
+        (rf"\b(?:rating|rated|stars?)\s*(?:of\s+)?(?:greater(?: than)?|more than|above|over|higher than)\s+{RATING}", ">"),
+        (rf"\b(?:rating|rated|stars?)\s*(?:of\s+)?(?:at least|atleast|minimum|min|>=)\s*{RATING}", ">="),
+        (rf"\b(?:greater(?: than)?|more than|above|over|higher than)\s+{RATING}\s*(?:\+\s*)?(?:stars?\s*)?(?:ratings?|rated|stars?)", ">"),
+        (rf"\b(?:at least|atleast|minimum|min)?\s*{RATING}\s*(?:\+\s*)?(?:stars?\s*)?(?:ratings?|rated|stars?)(?:\s+(?:and|or)\s+(?:above|more|higher|up))?", ">="),
+        (rf"\b(?:rating|rated)\s*(?:of\s+)?{RATING}\s*(?:\+|(?:and|or)\s+(?:above|more|higher|up))", ">="),
+    )
+    for pattern, op in rating_patterns:
+        match = scanner.take(pattern)
+        if match and float(match.group(1)) <= 5:
+            parsed.rating_min = (op, float(match.group(1)))
+            matched += 1
+            break
+
+    discount_patterns = (
+        (r"\b(?:discount|off)\s+(?:of\s+)?(?:greater than|more than|above|over)\s*(\d{1,2})\s*(?:%|percent|per cent)", ">"),
+        (r"\b(?:discount|off)\s+(?:of\s+)?(?:at least|atleast|minimum|min)\s*(\d{1,2})\s*(?:%|percent|per cent)", ">="),
+        (r"\b(?:greater than|more than|above|over)\s*(\d{1,2})\s*(?:%|percent|per cent)\s*(?:discount|off)?(?:ed)?", ">"),
+        (r"\b(?:at least|atleast|minimum|min)?\s*(\d{1,2})\s*(?:%|percent|per cent)\s*(?:or more\s*)?(?:discount|off)?(?:ed)?", ">="),
+    )
+    for pattern, op in discount_patterns:
+        match = scanner.take(pattern)
+        if match:
+            parsed.discount_min = (op, float(match.group(1)))
+            matched += 1
+            break
+    if parsed.discount_min is None and scanner.take(r"\b(?:on sale|on discount|on offer|discounted|with (?:a |any )?discount)\b"):
+        parsed.discount_min = (">", 0)
+        matched += 1
+
+    match = scanner.take(rf"{PRICE_WORD}\b(?:between|from)\s+{PRICE}\s*(?:and|to|-)\s*{PRICE}") \
+        or scanner.take(rf"(?:price range of\s+|range of\s+)?{PRICE}\s*(?:-|to)\s*{PRICE}")
+    if match:
+        low, high = sorted((int(match.group(1)), int(match.group(2))))
+        parsed.price_min = (">=", low)
+        parsed.price_max = ("<=", high)
+        matched += 1
+    else:
+        match = scanner.take(rf"{PRICE_WORD}\b{UPPER_WORDS}\s+(?:a price of\s+|price of\s+)?{PRICE}")
+        if match:
+            parsed.price_max = ("<", int(match.group(1)))
+            matched += 1
+        match = scanner.take(rf"{PRICE_WORD}\b{LOWER_WORDS}\s+(?:a price of\s+|price of\s+)?{PRICE}")
+        if match:
+            parsed.price_min = (">", int(match.group(1)))
+            matched += 1
+
+    sort_patterns = (
+        (r"\b(?:highest|top|best)[\s-]rated\b|\b(?:highest|best|top) ratings?\b", "rating_desc"),
+        (r"\b(?:cheapest|least expensive|most affordable|lowest[\s-]priced?|lowest cost|low(?:est)? price)\b", "price_asc"),
+        (r"\b(?:most expensive|costliest|priciest|highest[\s-]priced?|premium)\b", "price_desc"),
+        (r"\b(?:biggest|highest|best|maximum|max|largest) discounts?\b|\bmost discounted\b", "discount_desc"),
+        (r"\b(?:most popular|most reviewed|most rated|popular)\b", "popularity_desc"),
+    )
+    for pattern, sort in sort_patterns:
+        if scanner.take(pattern):
+            parsed.sort = sort
+            matched += 1
+            break
+
+    match = scanner.take(r"\b(?:top|first|any|show me|give me|list)?\s*(\d{1,2}|" + "|".join(NUMBER_WORDS) + r")\b(?!\s*(?:%|percent|\+|stars?))")
+    if match:
+        raw = match.group(1)
+        limit = NUMBER_WORDS.get(raw) or int(raw)
+        if 0 < limit <= 50:
+            parsed.limit = limit
+            matched += 1
+            if parsed.sort is None and "top" in match.group(0):
+                parsed.sort = "rating_desc"
+
+    parsed.unparsed = [
+        word for word in scanner.leftover_words()
+        if word.strip(".") not in FILLER_WORDS and word.strip(".") not in ("rs", "")
+    ]
+    total = matched + len(parsed.unparsed)
+    parsed.confidence = matched / total if total else 0.0
+    return parsed
+
+
+def build_product_sql(product_filter, brands=None):
+    """
+    Build a parameterized SELECT against the product table from a ProductFilter.
+
+    Args:
+        product_filter (ProductFilter): Parsed constraints
+        brands (list[str], optional): Distinct `brand` values from the product table;
+            the brand filter then also covers its sub-brands (see brand_family)
+
+    Returns:
+        tuple[str, list]: SQL text with `?` placeholders and the bound parameters
+    """
+    clauses = []
+    params = []
+
+    if product_filter.brand:
+        # Exact catalog spellings, so the lookup can use idx_product_brand_lower
+        family = brand_family(product_filter.brand, brands or [product_filter.brand])
+        clauses.append(f"LOWER(brand) IN ({', '.join('?' * len(family))})")
+        params.extend(name.lower() for name in family)
+    if product_filter.gender:
+        clauses.append("gender = ?")
+        params.append(product_filter.gender)
+    if product_filter.category:
+        clauses.append("LOWER(title) LIKE ?")
+        params.append(f"%{product_filter.category}%")
+    for column, bound in (
+        ("price_after_discount", product_filter.price_min),
+        ("price_after_discount", product_filter.price_max),
+        ("star_rating", product_filter.rating_min),
+        ("discount_percent", product_filter.discount_min),
+    ):
+        if bound is not None:
+            op, value = bound
+            clauses.append(f"{column} {op} ?")
+            params.append(value)
+
+    sql = "SELECT * FROM product"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    if product_filter.sort:
+        sql += f" ORDER BY {SORT_ORDERS[product_filter.sort]}"
+    if product_filter.limit:
+        sql += " LIMIT ?"
+        params.append(product_filter.limit)
+    return sql, params
+
+
+def is_follow_up(question):
+    """Whether a product question reads as a refinement of the previous one."""
+    return bool(FOLLOW_UP_PATTERN.search(normalize_question(question)))
+
+
+def merge_filters(previous, current):
+    """Constraints set in `current` replace those in `previous`; the rest carry over."""
+    updates = {
+        item.name: getattr(current, item.name)
+        for item in fields(ProductFilter)
+        if item.name not in ("confidence", "unparsed") and getattr(current, item.name) is not None
+    }
+    return replace(previous, **updates, confidence=current.confidence, unparsed=list(current.unparsed))
+
+
+def parse_follow_up(question, previous, brands, reference_price=None):
+    """
+    Parse a follow-up such as "what about for women?" or "cheaper ones" on top of
+    the previous turn's filter.
+
+    Args:
+        question (str): Follow-up message
+        previous (ProductFilter): Filter used for the previous product answer
+        brands (list[str]): Distinct `brand` values from the product table
+        reference_price (float | None): Typical price of the products shown last,
+            which "cheaper" and "more expensive" are relative to
+
+    Returns:
+        ProductFilter | None: Merged filter, or None for aggregate questions
+    """
+    text = normalize_question(question)
+    relative = None
+    if reference_price is not None:
+        if re.search(CHEAPER_PATTERN, text):
+            relative = ("price_max", ("<", int(reference_price)))
+        elif re.search(PRICIER_PATTERN, text):
+            relative = ("price_min", (">", int(reference_price)))
+    if relative is not None:
+        text = re.sub(CHEAPER_PATTERN + "|" + PRICIER_PATTERN, " ", text)
+    text = re.sub(FOLLOW_UP_WORDS, " ", text)
+
+    current = parse_product_query(text, brands)
+    if current is None:
+        return None
+    if relative is not None:
+        setattr(current, *relative)
+    merged = merge_filters(previous, current)
+    merged.confidence = 1.0 if not current.unparsed else current.confidence
+    return merged
+
+
+def parse_aggregate_question(question, brands):
+    """
+    Parse an aggregate question such as "What is the price of the most expensive
+    shoes on sale?" or "average rating by brand" for the catalog statistics.
+
+    The metric and grouping phrases are consumed first; the rest must parse as a
+    filter on brand, gender and sale status only. Counts may also require a whole
+    star rating or a discount in steps of 10 percent, which the statistics keep as
+    histograms. Anything else (categories, price bounds, leftover words) returns
+    None, so the question goes to SQL generation as before.
+
+    Args:
+        question (str): Natural language product question
+        brands (list[str]): Distinct `brand` values from the product table
+
+    Returns:
+        AggregateQuery | None: Parsed question, or None when the statistics cannot answer it
+    """
+    text = normalize_question(question)
+    if not AGGREGATE_PATTERN.search(text) or COMPARISON_PATTERN.search(text):
+        return None
+
+    scanner = _Scanner(text)
+    metric = next((name for name, pattern in AGGREGATE_METRICS if scanner.take(pattern)), None)
+    if metric is None:
+        return None
+    group = scanner.take(AGGREGATE_GROUP_PATTERN)
+
+    product_filter = parse_product_query(AGGREGATE_PATTERN.sub(" ", scanner.text), brands)
+    if (
+        product_filter is None
+        or any(word.strip(".") not in AGGREGATE_FILLER for word in product_filter.unparsed)
+        or any(value is not None for value in (
+            product_filter.category, product_filter.price_min, product_filter.price_max,
+            product_filter.sort, product_filter.limit,
+        ))
+    ):
+        return None
+
+    parsed = AggregateQuery(
+        metric, brand=product_filter.brand, gender=product_filter.gender, group_by=group and group.group(1)
+    )
+    if product_filter.discount_min == (">", 0):
+        parsed.on_sale = True
+    elif product_filter.discount_min is not None:
+        op, value = product_filter.discount_min
+        if metric != "count" or op != ">=" or value % 10 or not 0 < value < 100:
+            return None
+        parsed.discount_min = int(value)
+    if product_filter.rating_min is not None:
+        op, value = product_filter.rating_min
+        if metric != "count" or op != ">=" or value % 1 or not 0 < value < 5 or parsed.discount_min is not None:
+            return None
+        parsed.rating_min = int(value)
+    return parsed
@@ -0,0 +1,56 @@
+import random
+import threading
+
+import numpy as np
+
+from helper_functions.model_registry import DEFAULT_EMBEDDING_MODEL, encode
+
+
+class ResponseBank:
+    """
+    Canned replies matched by query embedding.
+
+    Each entry pairs a group of example utterances with a few interchangeable
+    replies. A query is answered when its best cosine similarity to any utterance
+    clears the threshold; the reply is picked at random, avoiding the one given
+    last time for the same entry, so repeated greetings do not read as canned.
+    """
+
+    def __init__(self, entries, threshold, model_name=DEFAULT_EMBEDDING_MODEL, matrix=None):
+        """
+        Args:
+            entries (list[tuple[list[str], list[str]]]): (utterances, replies) pairs
+            threshold (float): Minimum cosine similarity for a local answer
+            model_name (str): Embedding model shared with the router
+            matrix (np.ndarray | None): Precomputed utterance embeddings, in entry order;
+                encoded here when omitted
+        """
+        self.threshold = threshold
+        self.replies = [list(replies) for _, replies in entries]
+        self.entry_of = np.array([i for i, (utterances, _) in enumerate(entries) for _ in utterances])
+        texts = [utterance for utterances, _ in entries for utterance in utterances]
+        self.matrix = np.asarray(encode(texts, model_name) if matrix is None else matrix, dtype=np.float32)
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def match(self, embedding):
+        """
+        Return a canned reply for the query, or None when nothing is close enough.
+
+        Args:
+            embedding (list[float]): L2-normalized query embedding
+
+        Returns:
+            str | None: Reply text
+        """
+        scores = self.matrix @ np.asarray(embedding, dtype=np.float32)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+
+        entry = int(self.entry_of[best])
+        with self._lock:
+            choices = [reply for reply in self.replies[entry] if reply != self._last.get(entry)]
+            reply = random.choice(choices or self.replies[entry])
+            self._last[entry] = reply
+        return reply
@@ -1,5 +1,24 @@
-from semantic_router import Route, SemanticRouter
-from semantic_router.encoders import HuggingFaceEncoder
+import csv
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from helper_functions import catalog, warm_start
+from helper_functions.model_registry import DEFAULT_EMBEDDING_MODEL, encode
+from helper_functions.query_parser import CATEGORIES, brand_aliases
+
+logger = logging.getLogger(__name__)
+
+
+class Route(NamedTuple):
+    """Route name and example utterances, the fields of semantic_router's Route the app uses."""
+    name: str
+    utterances: list
 
 
 faq = Route(
@@ -113,14 +132,363 @@ small_talk = Route(
 )
 
 
-encoder = HuggingFaceEncoder(model="sentence-transformers/all-mpnet-base-v2")
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+faqs_path = os.path.join(base_dir, "resources", "Myntra_FAQ.csv")
+ROUTER_INDEX_PATH = os.path.join(base_dir, "resources", "router_index.npz")
 
-router = SemanticRouter(routes=[faq, sql, small_talk], encoder=encoder, auto_sync="local")
+# Add every FAQ question and generated catalog phrasings as exemplars
+ROUTER_AUGMENT = os.getenv("ROUTER_AUGMENT", "1") == "1"
 
-# if __name__ == "__main__":
-#     print(router("Do you accept ICICI credit card EMI as a payment option?").name)
-#     print(router("Show me a pair of Nike running shoes").name)
-#     print(router("What's the weather like today?").name)
-#     print(router("Did you sleep well yesterday?").name)
+# "knn" votes among the top-k exemplars; "centroid" scores each route's mean vector
+ROUTER_METHOD = os.getenv("ROUTER_METHOD", "knn")
+ROUTER_TOP_K = int(os.getenv("ROUTER_TOP_K", "5"))
+
+# A route is only chosen when its best exemplar is at least this similar
+ROUTE_THRESHOLDS = {
+    "faq": 0.40,
+    "sql": 0.35,
+    "small_talk": 0.40,
+}
+
+SQL_TEMPLATES = [
+    "Show me {brand} shoes",
+    "{brand} running shoes under Rs. {price}",
+    "Do you have {gender} {brand} shoes?",
+    "Highest rated {brand} shoes for {gender}",
+    "{brand} shoes with at least {discount}% discount",
+    "Cheapest {brand} sports shoes",
+]
+
+GENERIC_SQL_EXEMPLARS = [
+    "Show me 3 highest rated women's shoes under Rs. 5000",
+    "Give me any 3 men's running shoes with at least 4.5 rating",
+    "Men's shoes with rating greater than 4.2 and price between 6000 and 10000",
+    "Which walking shoes are the cheapest?",
+    "List top 5 most popular running shoes for women",
+    "Shoes with the biggest discount",
+    "What is the average price of running shoes?",
+    "How many shoes do you have under Rs. 2000?",
+    "Show me training shoes for men above Rs. 4000",
+    "Any trekking shoes on sale?",
+]
+
+# Keyword tier: a whole message that is only a greeting or pleasantry is small talk
+SMALL_TALK_PATTERN = (
+    r"^(?:hi|hii+|hello|hey|hiya|howdy|yo|namaste|good (?:morning|afternoon|evening|night|day)|"
+    r"wh?at'?s? up|sup|how are you(?: doing)?(?: today)?|how'?s it going|how do you do|"
+    r"thanks?(?: a lot| you(?: so much| very much)?)?|thank you(?: so much| very much)?|"
+    r"bye|goodbye|see you(?: later)?|nice to meet you|who are you|what'?s your name)"
+    r"(?:\s+(?:there|buddy|friend|bot|myntra))?[\s!.?,)]*$"
+)
+
+# Keyword tier: currency amounts and shoe searches are product queries
+SQL_PATTERNS = (
+    r"₹",
+    r"\b(?:rs\.?|inr)\s*\d",
+    r"\b\d[\d,]*\s*(?:rs|rupees|/-)",
+    r"\b(?:shoes?|sneakers?|footwear|trainers)\s+(?:under|below|above|over|between|within|for (?:men|women))\b",
+    r"\b(?:" + "|".join(CATEGORIES) + r")\s+(?:shoes?|sneakers?)\b",
+)
+
+# Keyword tier: a brand alone does not make a product search ("Can I return my Nike
+# shoes?" is an FAQ question). It must come with a product noun ("puma running shoes")
+# or a filter ("nike under 3000", "reebok rated 4+"); otherwise the message is left to
+# the embedding tier
+PRODUCT_NOUNS = r"(?:shoes?|sneakers?|footwear|trainers|slippers|sandals|flip[\s-]?flops)"
+PRODUCT_FILTERS = (
+    r"(?:under|below|above|over|between|within|less than|more than|cheaper than|for (?:men|women)|"
+    r"rated|ratings?|stars?|discount(?:ed)?|\d+\s*%|rs\.?\s*\d|₹)"
+)
+
+# Words a product noun or filter may be from the brand, as in "nike air max shoes"
+BRAND_WINDOW_WORDS = 3
+
+# Keyword tier: catalog brands that are also everyday words ("asian", "campus",
+# "killer") only count right next to a product noun, as in "campus shoes" or
+# "sneakers by killer"
+COMMON_WORD_BRANDS = {
+    "asian", "avant", "campus", "columbia", "cult", "doctor extra soft", "killer", "new balance", "off limits",
+    "red chief",
+}
+
+# Keyword tier: vocabulary that only appears in the Myntra FAQ. A match wins over a
+# brand with a product noun ("track my Puma order"), but not over a price or rating
+# filter, which leaves the message to the embedding tier
+FAQ_KEYWORDS = (
+    "refund", "refunds", "return", "returns", "return request", "return policy", "exchange", "cancel",
+    "cancellation", "cod", "cash on delivery", "pay on delivery", "delivery", "delivered", "order", "orders",
+    "track", "tracking", "warranty", "myntra credit", "myntra credits", "myntra points",
+    "gift card", "gift cards", "emi", "coupon", "coupons", "cashback", "phonepe", "platform fee",
+    "pin code", "pincode", "open box", "referral", "referrals", "invitee", "self-ship", "self ship",
+    "track my order", "order status", "shipping address", "payment failed", "payment fails", "pick up",
+    "pickup", "fair usage policy",
+)
+
+
+class RouteChoice(NamedTuple):
+    """Same shape as semantic_router's RouteChoice for the fields the app reads."""
+    name: Optional[str] = None
+    similarity_score: Optional[float] = None
+
+
+def faq_exemplars():
+    with open(faqs_path, encoding="utf-8") as f:
+        return [row["QUESTION"].strip() for row in csv.DictReader(f)]
+
+
+def catalog_brands(use_artifact=True):
+    """Distinct catalog brands, from the warm-start artifact when it matches the catalog version."""
+    if use_artifact:
+        artifact = warm_start.get_artifact()
+        brands = artifact.values("brands", catalog.catalog_version()) if artifact is not None else None
+        if brands is not None:
+            return brands
+    return [row[0] for row in catalog.execute("SELECT DISTINCT brand FROM product ORDER BY brand").rows]
+
+
+def sql_exemplars():
+    """Phrasings of product questions built from the catalog's actual brand names."""
+    brands = catalog_brands()
+    exemplars = list(GENERIC_SQL_EXEMPLARS)
+    for i, brand in enumerate(brands):
+        for template in (SQL_TEMPLATES[i % len(SQL_TEMPLATES)], SQL_TEMPLATES[(i + 3) % len(SQL_TEMPLATES)]):
+            exemplars.append(template.format(
+                brand=brand,
+                gender=("men", "women")[i % 2],
+                price=(2000, 3000, 5000, 8000)[i % 4],
+                discount=(20, 30, 50)[i % 3],
+            ))
+    return exemplars
+
+
+class KeywordRouter:
+    """
+    First routing tier: compiled regexes per route, no embedding.
+
+    A route is returned only when exactly one route matches. The exception is an
+    FAQ keyword next to a brand and product noun ("Can I return my Nike shoes?"),
+    which is FAQ. A message with FAQ words and a product filter ("COD on Nike shoes
+    under 3000") is left to the embedding tier.
+    """
+
+    def __init__(self, brands, faq_keywords=FAQ_KEYWORDS, common_word_brands=COMMON_WORD_BRANDS):
+        # Aliases are ordered longest first, so multi-word brands win over their prefixes
+        aliases = list(brand_aliases(brands))
+        names = "|".join(re.escape(name) for name in aliases if name not in common_word_brands)
+        common = "|".join(re.escape(name) for name in aliases if name in common_word_brands)
+        window = rf"(?:\s+[\w'-]+){{0,{BRAND_WINDOW_WORDS}}}?\s+"
+
+        product_patterns = []
+        filter_patterns = list(SQL_PATTERNS)
+        if names:
+            product_patterns.append(rf"(?<![a-z])(?:{names})(?:'s)?{window}{PRODUCT_NOUNS}\b")
+            filter_patterns.append(rf"(?<![a-z])(?:{names})(?:'s)?{window}{PRODUCT_FILTERS}")
+        if common:
+            product_patterns.append(rf"(?<![a-z])(?:{common})(?:'s)?\s+{PRODUCT_NOUNS}\b")
+        if aliases:
+            product_patterns.append(
+                rf"\b{PRODUCT_NOUNS}\s+(?:from|by|of)\s+(?:{'|'.join(re.escape(name) for name in aliases)})(?![a-z])"
+            )
+        faq_pattern = "|".join(re.escape(word) for word in sorted(faq_keywords, key=len, reverse=True))
+
+        self.patterns = {
+            "small_talk": re.compile(SMALL_TALK_PATTERN),
+            "sql": re.compile("|".join(filter_patterns)),
+            "faq": re.compile(rf"(?<![a-z])(?:{faq_pattern})(?![a-z])"),
+        }
+        # A brand and product noun without a filter; an FAQ keyword overrides it
+        self.product_pattern = re.compile("|".join(product_patterns) or r"(?!)")
+
+    def __call__(self, text):
+        """
+        Classify a query by keywords alone.
+
+        Returns:
+            RouteChoice | None: The matching route, or None when no route or more
+            than one route matches
+        """
+        text = text.lower().replace("’", "'").strip()
+        matches = [name for name, pattern in self.patterns.items() if pattern.search(text)]
+        if not matches and self.product_pattern.search(text):
+            matches = ["sql"]
+        if len(matches) != 1:
+            return None
+        return RouteChoice(matches[0], 1.0)
 
 
+class LocalRouter:
+    """
+    Intent router over a precomputed, normalized exemplar matrix.
+
+    The matrix is built once per (model, exemplars) and persisted to disk, or
+    memory-mapped from the warm-start artifact when one was built for the same
+    inputs, so a warm process classifies with a single matrix-vector product: either top-k voting
+    over exemplars or cosine to each route's centroid, then a per-route threshold.
+    """
+
+    def __init__(self, routes, model_name=DEFAULT_EMBEDDING_MODEL, augment=ROUTER_AUGMENT,
+                 method=ROUTER_METHOD, top_k=ROUTER_TOP_K, thresholds=None, index_path=ROUTER_INDEX_PATH):
+        self.model_name = model_name
+        self.method = method
+        self.top_k = top_k
+        self.thresholds = {**ROUTE_THRESHOLDS, **(thresholds or {})}
+        self.index_path = index_path
+
+        exemplars = {route.name: list(route.utterances) for route in routes}
+        if augment:
+            exemplars.setdefault("faq", []).extend(faq_exemplars())
+            exemplars.setdefault("sql", []).extend(sql_exemplars())
+        self.route_names = sorted(exemplars)
+
+        labels = [name for name in self.route_names for _ in exemplars[name]]
+        texts = [text for name in self.route_names for text in exemplars[name]]
+        self.labels = np.array([self.route_names.index(name) for name in labels])
+        self.matrix = self._load_or_build(texts)
+        self.centroids = np.stack([
+            self._normalize(self.matrix[self.labels == i].mean(axis=0)) for i in range(len(self.route_names))
+        ])
+
+    @staticmethod
+    def _normalize(vectors):
+        return vectors / np.clip(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12, None)
+
+    def _load_or_build(self, texts):
+        key = self.index_key = warm_start.content_key(self.model_name, texts)
+        artifact = warm_start.get_artifact()
+        matrix = artifact.vectors("router", key) if artifact is not None else None
+        if matrix is not None:
+            return matrix
+        if os.path.exists(self.index_path):
+            with np.load(self.index_path) as index:
+                if str(index["key"]) == key:
+                    return index["matrix"]
+
+        matrix = self._normalize(np.asarray(encode(texts, self.model_name), dtype=np.float32))
+        np.savez(self.index_path, key=key, matrix=matrix)
+        return matrix
+
+    def __call__(self, text=None, vector=None):
+        """
+        Classify a query by text or by a precomputed L2-normalized embedding.
+
+        Returns:
+            RouteChoice: Chosen route, or a RouteChoice with name None when no route
+            clears its threshold
+        """
+        if vector is None:
+            vector = encode([text], self.model_name)[0]
+        scores = self.matrix @ np.asarray(vector, dtype=np.float32)
+
+        if self.method == "centroid":
+            route_scores = self.centroids @ np.asarray(vector, dtype=np.float32)
+            best = int(np.argmax(route_scores))
+        else:
+            top = np.argpartition(-scores, min(self.top_k, len(scores) - 1))[:self.top_k]
+            votes = np.bincount(self.labels[top], weights=scores[top], minlength=len(self.route_names))
+            best = int(np.argmax(votes))
+
+        # The best single exemplar of the chosen route must clear that route's threshold
+        name = self.route_names[best]
+        best_score = float(scores[self.labels == best].max())
+        if best_score < self.thresholds.get(name, 0.0):
+            return RouteChoice(None, best_score)
+        return RouteChoice(name, best_score)
+
+
+class TieredRouter:
+    """
+    Keyword tier first, embedding tier only when the keywords are missing or ambiguous.
+
+    Every decision is logged with the tier that made it, and per-tier counts are
+    kept so `stats()` shows how many turns never needed the encoder for routing.
+    """
+
+    def __init__(self, keyword_router, embedding_router):
+        self.keyword_router = keyword_router
+        self.embedding_router = embedding_router
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def _record(self, tier, choice, text):
+        with self._lock:
+            self.counts[(tier, choice.name)] += 1
+        logger.info("route=%s tier=%s score=%.3f query=%r", choice.name, tier, choice.similarity_score or 0.0, text)
+
+    def match_keywords(self, text):
+        """Run only the keyword tier; returns None when the embedding tier is needed."""
+        choice = self.keyword_router(text)
+        if choice is not None:
+            self._record("keyword", choice, text)
+        return choice
+
+    def __call__(self, text=None, vector=None):
+        """
+        Classify a query, trying the keyword tier first when the text is given.
+
+        Returns:
+            RouteChoice: Chosen route, or a RouteChoice with name None when no route
+            clears its threshold
+        """
+        if text is not None:
+            choice = self.match_keywords(text)
+            if choice is not None:
+                return choice
+        choice = self.embedding_router(text=text, vector=vector)
+        self._record("embedding", choice, text)
+        return choice
+
+    def stats(self):
+        """Return decision counts per tier and route, and the share decided without the encoder."""
+        with self._lock:
+            counts = dict(self.counts)
+        by_tier = Counter()
+        for (tier, _), count in counts.items():
+            by_tier[tier] += count
+        total = sum(by_tier.values())
+        return {
+            "decisions": {f"{tier}:{name}": count for (tier, name), count in sorted(counts.items(), key=str)},
+            "keyword": by_tier["keyword"],
+            "embedding": by_tier["embedding"],
+            "keyword_share": by_tier["keyword"] / total if total else 0.0,
+        }
+
+
+routes = [faq, sql, small_talk]
+
+
+def build_semantic_router():
+    """The original semantic-router classifier, kept for benchmarking against LocalRouter."""
+    # Imported here so the app itself never loads semantic-router
+    from semantic_router import Route as SemanticRoute, SemanticRouter
+
+    from helper_functions.embedding_function import shared_model_encoder_class
+
+    # Shares its weights with the FAQ retriever via helper_functions.model_registry
+    semantic_routes = [SemanticRoute(name=route.name, utterances=list(route.utterances)) for route in routes]
+    return SemanticRouter(routes=semantic_routes, encoder=shared_model_encoder_class()(), auto_sync="local")
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """
+    Return the process-wide TieredRouter, built on first use.
+
+    Building it encodes every exemplar unless the warm-start artifact or the router
+    index already holds them, so it is left to warm-up or the first query rather
+    than done at import.
+    """
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = TieredRouter(KeywordRouter(catalog_brands()), LocalRouter(routes))
+        return _router
+
+
+# if __name__ == "__main__":
+#     print(get_router()("Do you accept ICICI credit card EMI as a payment option?").name)
+#     print(get_router()("Show me a pair of Nike running shoes").name)
+#     print(get_router()("What's the weather like today?").name)
+#     print(get_router()("Did you sleep well yesterday?").name)
@@ -0,0 +1,175 @@
+import os
+import sqlite3
+import threading
+import time
+
+from helper_functions import catalog
+
+# Wall-clock budget per guarded statement; SQLite aborts it once exceeded
+SQL_TIME_BUDGET_MS = float(os.getenv("SQL_TIME_BUDGET_MS", "500"))
+
+# Rows fetched from a guarded statement at most, whatever it selects
+SQL_GUARD_MAX_ROWS = int(os.getenv("SQL_GUARD_MAX_ROWS", "1000"))
+
+# Guarded statements running at once per process; the rest wait up to the time budget
+SQL_GUARD_MAX_CONCURRENT = int(os.getenv("SQL_GUARD_MAX_CONCURRENT", "4"))
+
+# The progress handler checks the clock every this many virtual machine steps
+PROGRESS_STEPS = 1000
+
+ALLOWED_TABLES = {"product"}
+
+# Functions that can allocate unbounded memory or reach outside the database
+DENIED_FUNCTIONS = {"load_extension", "randomblob", "zeroblob", "readfile", "writefile"}
+
+_slots = threading.BoundedSemaphore(SQL_GUARD_MAX_CONCURRENT)
+
+
+class SQLGuardError(Exception):
+    """
+    A generated query was rejected before or while running.
+
+    `code` is one of: not_select, multiple_statements, not_allowed, too_expensive,
+    timeout, busy, invalid_sql. `str(error)` is phrased so it can be sent back to
+    the LLM to repair the query.
+    """
+
+    def __init__(self, code, detail):
+        super().__init__(f"The query was rejected ({code}): {detail}")
+        self.code = code
+        self.detail = detail
+
+    def as_dict(self):
+        return {"error": self.code, "detail": self.detail}
+
+
+def _authorize(action, arg1, arg2, db_name, trigger):
+    if action == sqlite3.SQLITE_SELECT:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_READ:
+        return sqlite3.SQLITE_OK if arg1 in ALLOWED_TABLES else sqlite3.SQLITE_DENY
+    if action == sqlite3.SQLITE_FUNCTION:
+        return sqlite3.SQLITE_DENY if (arg2 or "").lower() in DENIED_FUNCTIONS else sqlite3.SQLITE_OK
+    # Writes, PRAGMA, ATTACH, recursive CTEs and everything else
+    return sqlite3.SQLITE_DENY
+
+
+def _code_end(query):
+    """Position just past the last SQL token that is not a comment or a semicolon."""
+    end = position = 0
+    while position < len(query):
+        if query.startswith("--", position):
+            newline = query.find("\n", position)
+            position = len(query) if newline < 0 else newline + 1
+        elif query.startswith("/*", position):
+            close = query.find("*/", position + 2)
+            position = len(query) if close < 0 else close + 2
+        elif query[position] in "'\"`[":
+            # Quoted strings and identifiers; a doubled quote reads as two adjacent strings
+            close = query.find("]" if query[position] == "[" else query[position], position + 1)
+            position = end = len(query) if close < 0 else close + 1
+        else:
+            if not query[position].isspace() and query[position] != ";":
+                end = position + 1
+            position += 1
+    return end
+
+
+def check_statement(query):
+    """
+    Static check: the query must be a SELECT (or WITH ... SELECT).
+
+    Returns:
+        str: The statement without surrounding whitespace, trailing comments or
+        trailing semicolons, so it can be wrapped as a subquery
+    """
+    statement = query[:_code_end(query)].strip()
+    if not statement.upper().startswith(("SELECT", "WITH")):
+        raise SQLGuardError("not_select", "only a single SELECT statement is allowed")
+    return statement
+
+
+def check_plan(plan):
+    """
+    Reject plans whose cost grows with the square of the table size.
+
+    Two full-table scans joined at the same level are a cross join; a full scan
+    inside a correlated subquery runs once per outer row.
+
+    Args:
+        plan (list[tuple]): Rows of EXPLAIN QUERY PLAN: (id, parent, unused, detail)
+    """
+    nodes = {node_id: (parent, detail) for node_id, parent, _, detail in plan}
+
+    def full_scan(detail):
+        # "SCAN t USING COVERING INDEX" still reads every row; only SEARCH is selective
+        return detail.startswith("SCAN ") and detail != "SCAN CONSTANT ROW"
+
+    scans_per_parent = {}
+    for node_id, (parent, detail) in nodes.items():
+        if not full_scan(detail):
+            continue
+        scans_per_parent[parent] = scans_per_parent.get(parent, 0) + 1
+        if scans_per_parent[parent] > 1:
+            raise SQLGuardError("too_expensive", "the query joins full table scans (a cross join); add a join condition")
+        ancestor = parent
+        while ancestor in nodes:
+            if "CORRELATED" in nodes[ancestor][1]:
+                raise SQLGuardError(
+                    "too_expensive", "a correlated subquery scans the whole table per row; use GROUP BY or a join"
+                )
+            ancestor = nodes[ancestor][0]
+
+
+def execute_guarded(query, params=None, time_budget_ms=SQL_TIME_BUDGET_MS, max_rows=SQL_GUARD_MAX_ROWS,
+                    db_path=catalog.DB_PATH):
+    """
+    Run an untrusted SELECT on the read-only catalog connection under a guard.
+
+    While the statement runs, an authorizer limits it to reading the product table,
+    and a progress handler aborts it once the time budget is spent. The plan is
+    checked with EXPLAIN QUERY PLAN first and at most `max_rows` rows are fetched.
+
+    Args:
+        query (str): SQL text, usually LLM-generated
+        params (list, optional): Values bound to `?` placeholders
+        time_budget_ms (float): Wall-clock budget for planning and running
+        max_rows (int): Maximum rows fetched
+        db_path (str): Catalog database file
+
+    Returns:
+        catalog.QueryResult: Column names and row tuples
+
+    Raises:
+        SQLGuardError: If the query is rejected, fails to compile or runs out of time
+    """
+    statement = check_statement(query)
+    params = params or []
+    deadline = time.perf_counter() + time_budget_ms / 1000
+    if not _slots.acquire(timeout=time_budget_ms / 1000):
+        raise SQLGuardError("busy", "too many product queries are running; try again")
+
+    conn = catalog.get_connection(db_path)
+    conn.set_authorizer(_authorize)
+    conn.set_progress_handler(lambda: time.perf_counter() > deadline, PROGRESS_STEPS)
+    try:
+        check_plan(conn.execute(f"EXPLAIN QUERY PLAN {statement}", params).fetchall())
+        cursor = conn.execute(statement, params)
+        try:
+            columns = [description[0] for description in cursor.description or []]
+            return catalog.QueryResult(columns, cursor.fetchmany(max_rows))
+        finally:
+            cursor.close()
+    except sqlite3.Error as error:
+        message = str(error)
+        if "interrupted" in message:
+            raise SQLGuardError("timeout", f"the query ran longer than {time_budget_ms:.0f} ms; make it simpler")
+        if "one statement at a time" in message:
+            raise SQLGuardError("multiple_statements", "only one statement is allowed")
+        if "prohibited" in message or "not authorized" in message:
+            raise SQLGuardError("not_allowed", f"only the product table can be read ({message})")
+        raise SQLGuardError("invalid_sql", message)
+    finally:
+        conn.set_progress_handler(None, 0)
+        conn.set_authorizer(None)
+        _slots.release()
@@ -0,0 +1,271 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from helper_functions import catalog
+from helper_functions.query_parser import brand_aliases, normalize_question
+from helper_functions.sql_guard import SQLGuardError, check_statement
+
+# Shared by every worker on the host; WAL lets them read while one writes
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLAN_CACHE_PATH = os.getenv("SQL_PLAN_CACHE_PATH", os.path.join(base_dir, "resources", "sql_plan_cache.sqlite"))
+
+SQL_PLAN_CACHE_ENABLED = os.getenv("SQL_PLAN_CACHE_ENABLED", "1") == "1"
+SQL_PLAN_CACHE_MAX_ENTRIES = int(os.getenv("SQL_PLAN_CACHE_MAX_ENTRIES", "5000"))
+
+NUMBER = r"\d+(?:\.\d+)?"
+SQL_NUMBER = re.compile(rf"(?<![\w.'])({NUMBER})(?![\w.'])")
+SQL_STRING = re.compile(r"'((?:[^']|'')*)'")
+
+CONTRACTIONS = {"what's": "what is", "how's": "how is", "there's": "there is", "i'm": "i am", "don't": "do not"}
+
+# Stands for the brand inside a stored string literal such as '%\0%'
+BRAND_MARK = "\0"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    template TEXT NOT NULL,
+    catalog_version TEXT NOT NULL,
+    sql TEXT NOT NULL,
+    params TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (template, catalog_version)
+);
+CREATE TABLE IF NOT EXISTS plan_stats (
+    catalog_version TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    stored INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def _apply_case(value, case):
+    return value.lower() if case == "lower" else value.upper() if case == "upper" else value
+
+
+def _case_of(text):
+    return "lower" if text == text.lower() else "upper" if text == text.upper() else "as_is"
+
+
+def templatize(question, brands):
+    """
+    Reduce a question to its template and slot values.
+
+    Lowercases, unifies currency and number formats, pulls the brand and every
+    number out into slots and strips punctuation, so "Nike shoes under Rs. 3,000?"
+    and "puma shoes under 4000" share the template "<brand> shoes under <num>".
+    Brand aliases ("hrx") fill the slot with the catalog name, so every phrasing of
+    a brand shares one plan.
+
+    Args:
+        question (str): Natural language product question
+        brands (list[str]): Distinct `brand` values from the product table
+
+    Returns:
+        tuple[str, list[str], list[str]]: (template, brand slots, number slots)
+    """
+    text = original = normalize_question(question)
+    found = {}
+    for alias, brand in brand_aliases(brands).items():
+        pattern = rf"(?<![a-z]){re.escape(alias)}(?![a-z])"
+        if re.search(pattern, text):
+            found.setdefault(brand, re.search(pattern, original).start())
+            text = re.sub(pattern, " <brand> ", text)
+    # Brands in the order they appear in the question
+    found_brands = sorted(found, key=found.get)
+    numbers = re.findall(NUMBER, text)
+    text = re.sub(NUMBER, " <num> ", text)
+    for contraction, expanded in CONTRACTIONS.items():
+        text = text.replace(contraction, expanded)
+    # Currency markers and possessives do not change the SQL
+    text = re.sub(r"\brs\b|'s\b", " ", text)
+    text = re.sub(r"[^\w<>\s]", " ", text)
+    return " ".join(text.split()), found_brands, numbers
+
+
+def parameterize(sql, brands, numbers):
+    """
+    Replace the question's slot values in generated SQL with `?` placeholders.
+
+    Returns:
+        tuple[str, list] | None: Template SQL and a description of each parameter,
+        or None when a slot is missing from the SQL or cannot be told apart
+    """
+    if len(set(numbers)) != len(numbers) or len({brand.lower() for brand in brands}) != len(brands):
+        return None
+    used = set()
+    spec = []
+    # The SQL may spell a brand by its catalog name or by any alias of it
+    spellings = [
+        (position, alias) for alias, brand in brand_aliases(brands).items()
+        for position, slot in enumerate(brands) if brand == slot
+    ]
+
+    def replace_string(match):
+        literal = match.group(1).replace("''", "'")
+        for position, alias in spellings:
+            start = literal.lower().find(alias)
+            if start >= 0:
+                end = start + len(alias)
+                used.add(("brand", position))
+                spec.append(["brand", position, literal[:start] + BRAND_MARK + literal[end:], _case_of(literal[start:end])])
+                return "?"
+        return match.group(0)
+
+    def replace_number(match):
+        for position, number in enumerate(numbers):
+            if float(match.group(1)) == float(number):
+                used.add(("number", position))
+                spec.append(["number", position])
+                return "?"
+        return match.group(0)
+
+    # Strings first, so digits inside string literals are left alone
+    pieces = []
+    last = 0
+    for match in SQL_STRING.finditer(sql):
+        pieces.append(SQL_NUMBER.sub(replace_number, sql[last:match.start()]))
+        pieces.append(replace_string(match))
+        last = match.end()
+    pieces.append(SQL_NUMBER.sub(replace_number, sql[last:]))
+
+    if len(used) != len(brands) + len(numbers):
+        return None
+    return "".join(pieces), spec
+
+
+def bind(spec, brands, numbers):
+    """
+    Parameter values for a stored spec and the slots of a new question.
+
+    A number is bound as written in the new question, "4.5" as a float and "4" as
+    an integer, whatever the question the plan was cached for had in that slot.
+    """
+    params = []
+    for item in spec:
+        if item[0] == "brand":
+            _, position, pattern, case = item
+            params.append(pattern.replace(BRAND_MARK, _apply_case(brands[position], case)))
+        else:
+            number = numbers[item[1]]
+            params.append(float(number) if "." in number else int(number))
+    return params
+
+
+class SQLPlanCache:
+    """
+    On-disk cache from a question template to validated, parameterized SQL.
+
+    A hit skips the LLM SQL generation entirely: the stored SQL is reused with the
+    new question's brand and numbers bound as parameters. Entries are scoped by
+    `catalog.catalog_version()`, so a schema change or a catalog reload makes
+    every stored plan stale.
+    """
+
+    def __init__(self, path=PLAN_CACHE_PATH, max_entries=SQL_PLAN_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def _record(self, version, column):
+        self._conn.execute(
+            f"INSERT INTO plan_stats (catalog_version, {column}) VALUES (?, 1) "
+            f"ON CONFLICT (catalog_version) DO UPDATE SET {column} = {column} + 1",
+            (version,),
+        )
+        self._conn.commit()
+
+    def lookup(self, question, brands):
+        """
+        Return (sql, params) for a question whose template was answered before.
+
+        Args:
+            question (str): Natural language product question
+            brands (list[str]): Distinct `brand` values from the product table
+
+        Returns:
+            tuple[str, list] | None: SQL with `?` placeholders and bound values, or None
+        """
+        template, found_brands, numbers = templatize(question, brands)
+        version = catalog.catalog_version()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sql, params FROM plans WHERE template = ? AND catalog_version = ?", (template, version)
+            ).fetchone()
+            if row is None:
+                self._record(version, "misses")
+                return None
+            self._conn.execute(
+                "UPDATE plans SET hits = hits + 1, last_used = ? WHERE template = ? AND catalog_version = ?",
+                (time.time(), template, version),
+            )
+            self._record(version, "hits")
+        return row[0], bind(json.loads(row[1]), found_brands, numbers)
+
+    def store(self, question, sql, brands):
+        """
+        Cache LLM-generated SQL for the question's template once it passes validation.
+
+        The SQL is parameterized on the question's slots and must compile, via
+        `EXPLAIN QUERY PLAN` on the catalog, with the original values bound.
+
+        Returns:
+            bool: Whether the plan was stored
+        """
+        template, found_brands, numbers = templatize(question, brands)
+        try:
+            statement = check_statement(sql)
+        except SQLGuardError:
+            return False
+        parameterized = parameterize(statement, found_brands, numbers)
+        if parameterized is None:
+            return False
+        template_sql, spec = parameterized
+        try:
+            catalog.execute(f"EXPLAIN QUERY PLAN {template_sql}", bind(spec, found_brands, numbers))
+        except sqlite3.Error:
+            return False
+
+        version = catalog.catalog_version()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plans (template, catalog_version, sql, params, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (template, version, template_sql, json.dumps(spec), now, now),
+            )
+            self._conn.execute("DELETE FROM plans WHERE catalog_version != ?", (version,))
+            self._conn.execute(
+                "DELETE FROM plans WHERE rowid IN (SELECT rowid FROM plans ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+            self._record(version, "stored")
+        return True
+
+    def stats(self):
+        """Return hits, misses, hit rate and stored plans for the current catalog version."""
+        version = catalog.catalog_version()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hits, misses, stored FROM plan_stats WHERE catalog_version = ?", (version,)
+            ).fetchone() or (0, 0, 0)
+            entries = self._conn.execute("SELECT COUNT(*) FROM plans WHERE catalog_version = ?", (version,)).fetchone()[0]
+        hits, misses, stored = row
+        return {
+            "catalog_version": version,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "stored": stored,
+            "entries": entries,
+        }
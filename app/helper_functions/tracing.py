@@ -0,0 +1,367 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Write one JSON line per finished turn (all its spans) to stderr
+TRACE_JSON_LOGS = os.getenv("TRACE_JSON_LOGS", "0") == "1"
+
+# Replay finished traces into OpenTelemetry; needs opentelemetry-api and an SDK
+# configured by the host (for example with `opentelemetry-instrument`)
+TRACE_OTEL = os.getenv("TRACE_OTEL", "0") == "1"
+
+# Finished traces kept in memory per process for the debug panel and /traces
+TRACE_KEEP_RECENT = int(os.getenv("TRACE_KEEP_RECENT", "256"))
+
+# Upper bounds, in seconds, of the stage duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+_recent = OrderedDict()
+_recent_lock = threading.Lock()
+
+
+def _new_id(n_bytes):
+    return os.urandom(n_bytes).hex()
+
+
+class Span:
+    """
+    One timed stage of a turn.
+
+    The attributes the metrics read are `prompt_tokens` and `completion_tokens`
+    (from the Groq `usage` field), `rows` and `cache_hit`.
+    """
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end = None
+        self.attributes = dict(attributes or {})
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.time()
+
+    @property
+    def duration_ms(self):
+        return ((self.end or time.time()) - self.start) * 1000
+
+    def to_dict(self):
+        """OTLP-style span record with Unix nanosecond timestamps."""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": int(self.start * 1e9),
+            "end_time_unix_nano": int((self.end or time.time()) * 1e9),
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """
+    All spans of one turn, under a root span named after the trace.
+
+    The active trace and span live in context variables, so code running in
+    `asyncio.to_thread` or tasks created inside the turn adds its spans to the
+    right turn without passing the trace around. Streams that outlive the call
+    that created them hold their span and finish it themselves.
+    """
+
+    def __init__(self, name="ask", trace_id=None, parent_id=None, **attributes):
+        self.trace_id = trace_id or _new_id(16)
+        self.root = Span(name, self.trace_id, parent_id, attributes)
+        self.spans = [self.root]
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def activate(self):
+        """Make this trace and its root span current in the running context."""
+        _current_trace.set(self)
+        _current_span.set(self.root)
+        return self
+
+    def start_span(self, name, parent=None, **attributes):
+        """Start a child span without making it current; the caller finishes it."""
+        parent = parent or _current_span.get() or self.root
+        span = Span(name, self.trace_id, parent.span_id).set(**attributes)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def finish(self):
+        """End the root span, close any span left open and export the trace once."""
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+        self.root.finish()
+        for span in self.spans:
+            if span.end is None:
+                span.end = self.root.end
+        _export(self)
+
+    def to_dict(self):
+        return {"trace_id": self.trace_id, "spans": [span.to_dict() for span in self.spans]}
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a block as a child of the current span.
+
+    Outside a trace the span is still returned, so callers can `set()` attributes
+    unconditionally, but it is not recorded anywhere.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield Span(name, None).set(**attributes)
+        return
+    child = trace.start_span(name, **attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except Exception as error:
+        child.set(error=type(error).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+
+def start_span(name, **attributes):
+    """
+    Start a child of the current span that the caller finishes, for work such as
+    a stream that outlives the block that started it. Detached outside a trace.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return Span(name, None).set(**attributes)
+    return trace.start_span(name, **attributes)
+
+
+def current_span():
+    """The innermost active span, or a detached one outside a trace."""
+    return _current_span.get() or Span("detached", None)
+
+
+def get_trace(trace_id):
+    """A recently finished trace as a dict, or None."""
+    with _recent_lock:
+        trace = _recent.get(trace_id)
+    return trace.to_dict() if trace is not None else None
+
+
+def parse_traceparent(header):
+    """(trace_id, parent span id) from a W3C `traceparent` header, or (None, None)."""
+    parts = (header or "").split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        return parts[1], parts[2]
+    return None, None
+
+
+def traceparent(trace):
+    """W3C `traceparent` header value continuing `trace` from its root span."""
+    return f"00-{trace.trace_id}-{trace.root.span_id}-01"
+
+
+def add_spans(trace, records):
+    """Attach span dicts recorded elsewhere (another process) to `trace`."""
+    for record in records:
+        remote = Span(record["name"], trace.trace_id, record["parent_span_id"], record["attributes"])
+        remote.span_id = record["span_id"]
+        remote.start = record["start_time_unix_nano"] / 1e9
+        remote.end = record["end_time_unix_nano"] / 1e9
+        with trace._lock:
+            trace.spans.append(remote)
+
+
+class Metrics:
+    """
+    Per-process aggregates of finished traces, rendered in the Prometheus text format.
+
+    Each worker process has its own; scrape every worker, not the load balancer.
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.durations = {}
+        self.tokens = {}
+        self.cache = {}
+        self.rows = {}
+        self.requests = {}
+
+    def observe(self, trace):
+        with self._lock:
+            route = trace.root.attributes.get("route", "none")
+            self.requests[route] = self.requests.get(route, 0) + 1
+            for span in trace.spans:
+                seconds = span.end - span.start
+                counts, total = self.durations.get(span.name, ([0] * (len(self.buckets) + 1), 0.0))
+                for i, bound in enumerate(self.buckets):
+                    if seconds <= bound:
+                        counts[i] += 1
+                counts[-1] += 1
+                self.durations[span.name] = (counts, total + seconds)
+
+                for kind in ("prompt", "completion"):
+                    value = span.attributes.get(f"{kind}_tokens")
+                    if value:
+                        key = (span.name, kind)
+                        self.tokens[key] = self.tokens.get(key, 0) + value
+                if "cache_hit" in span.attributes:
+                    key = (span.name, "hit" if span.attributes["cache_hit"] else "miss")
+                    self.cache[key] = self.cache.get(key, 0) + 1
+                if "rows" in span.attributes:
+                    self.rows[span.name] = self.rows.get(span.name, 0) + span.attributes["rows"]
+
+    def render(self):
+        """Return all metrics as Prometheus text exposition (version 0.0.4)."""
+        lines = [
+            "# HELP assistant_requests_total Turns answered, by route.",
+            "# TYPE assistant_requests_total counter",
+        ]
+        with self._lock:
+            for route, count in sorted(self.requests.items()):
+                lines.append(f'assistant_requests_total{{route="{route}"}} {count}')
+
+            lines += [
+                "# HELP assistant_stage_duration_seconds Time spent in each pipeline stage.",
+                "# TYPE assistant_stage_duration_seconds histogram",
+            ]
+            for stage, (counts, total) in sorted(self.durations.items()):
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f'assistant_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'assistant_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {counts[-1]}')
+                lines.append(f'assistant_stage_duration_seconds_sum{{stage="{stage}"}} {total:.6f}')
+                lines.append(f'assistant_stage_duration_seconds_count{{stage="{stage}"}} {counts[-1]}')
+
+            lines += [
+                "# HELP assistant_llm_tokens_total Tokens reported in the Groq usage field.",
+                "# TYPE assistant_llm_tokens_total counter",
+            ]
+            for (stage, kind), count in sorted(self.tokens.items()):
+                lines.append(f'assistant_llm_tokens_total{{stage="{stage}",type="{kind}"}} {count}')
+
+            lines += [
+                "# HELP assistant_cache_lookups_total Cache lookups, by cache and result.",
+                "# TYPE assistant_cache_lookups_total counter",
+            ]
+            for (cache, result), count in sorted(self.cache.items()):
+                lines.append(f'assistant_cache_lookups_total{{cache="{cache}",result="{result}"}} {count}')
+
+            lines += [
+                "# HELP assistant_rows_total Rows returned by catalog queries and retrievals.",
+                "# TYPE assistant_rows_total counter",
+            ]
+            for stage, count in sorted(self.rows.items()):
+                lines.append(f'assistant_rows_total{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def _json_logger():
+    json_logger = logging.getLogger(f"{__name__}.json")
+    if not json_logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        json_logger.addHandler(handler)
+        json_logger.setLevel(logging.INFO)
+        json_logger.propagate = False
+    return json_logger
+
+
+def _export_otel(trace):
+    global TRACE_OTEL
+    try:
+        from opentelemetry import trace as otel_trace
+    except ImportError:
+        logger.warning("TRACE_OTEL is set but opentelemetry-api is not installed; OpenTelemetry export is off")
+        TRACE_OTEL = False
+        return
+
+    # Replayed with the recorded timestamps; OpenTelemetry assigns its own ids
+    tracer = otel_trace.get_tracer("myntra-shoe-assistant")
+    exported = {}
+    for recorded in sorted(trace.spans, key=lambda item: item.start):
+        parent = exported.get(recorded.parent_id)
+        context = otel_trace.set_span_in_context(parent) if parent is not None else None
+        otel_span = tracer.start_span(
+            recorded.name,
+            context=context,
+            start_time=int(recorded.start * 1e9),
+            attributes={"assistant.trace_id": trace.trace_id, **{
+                key: value for key, value in recorded.attributes.items() if isinstance(value, (str, bool, int, float))
+            }},
+        )
+        exported[recorded.span_id] = otel_span
+    for recorded in trace.spans:
+        exported[recorded.span_id].end(end_time=int(recorded.end * 1e9))
+
+
+def _export(trace):
+    metrics.observe(trace)
+    with _recent_lock:
+        _recent[trace.trace_id] = trace
+        while len(_recent) > TRACE_KEEP_RECENT:
+            _recent.popitem(last=False)
+    if TRACE_JSON_LOGS:
+        _json_logger().info(json.dumps(trace.to_dict(), default=str))
+    if TRACE_OTEL:
+        _export_otel(trace)
+
+
+def format_waterfall(trace, width=32):
+    """
+    Render a finished trace as text bars, one line per span in start order.
+
+    Args:
+        trace (dict): `Trace.to_dict()` output
+        width (int): Characters of the bar for the whole turn
+
+    Returns:
+        str: Lines of "stage  bar  duration  attributes"
+    """
+    spans = sorted(trace["spans"], key=lambda item: item["start_time_unix_nano"])
+    if not spans:
+        return ""
+    begin = spans[0]["start_time_unix_nano"]
+    total = max(max(item["end_time_unix_nano"] for item in spans) - begin, 1)
+    depth = {}
+    for item in spans:
+        depth[item["span_id"]] = depth.get(item["parent_span_id"], -1) + 1
+
+    lines = []
+    for item in spans:
+        offset = int((item["start_time_unix_nano"] - begin) / total * width)
+        length = max(1, int((item["end_time_unix_nano"] - item["start_time_unix_nano"]) / total * width))
+        bar = (" " * offset + "█" * length).ljust(width)[:width]
+        name = ("  " * depth[item["span_id"]] + item["name"])[:24]
+        duration = (item["end_time_unix_nano"] - item["start_time_unix_nano"]) / 1e6
+        details = " ".join(
+            f"{key}={value}" for key, value in item["attributes"].items()
+            if key != "sql" and not isinstance(value, (dict, list))
+        )
+        lines.append(f"{name:<24} {bar} {duration:>8.1f} ms  {details}".rstrip())
+    return "\n".join(lines)
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+# Built by `python -m helper_functions.warm_start` (from the `app` directory, with
+# the app's environment) after changing the model, FAQ CSV, route exemplars or catalog
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WARM_START_DIR = os.getenv("WARM_START_DIR", os.path.join(base_dir, "resources", "warm_start"))
+WARM_START_ENABLED = os.getenv("WARM_START_ENABLED", "1") == "1"
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+
+_artifact = None
+_artifact_lock = threading.Lock()
+
+
+def content_key(*parts):
+    """Stable key of the inputs a section was computed from."""
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+class WarmStartArtifact:
+    """
+    Precomputed inputs a worker would otherwise embed or query before its first answer.
+
+    Holds the router exemplar matrix, the FAQ question vectors, the small-talk bank
+    utterance vectors and the catalog brand vocabulary. Vectors are `.npy` files
+    memory-mapped read-only, so workers on one host share the same pages and skip
+    the encoder until a query needs it. Each section carries the key of the inputs
+    it was built from (model, texts, catalog version); a consumer whose key differs
+    ignores the section and computes its own, so a stale artifact is only slower,
+    never wrong.
+    """
+
+    def __init__(self, path, manifest, mtime=None):
+        self.path = path
+        self.sections = manifest["sections"]
+        self.mtime = mtime
+        self._mapped = {}
+
+    def _section(self, name, key):
+        section = self.sections.get(name)
+        if section is None or section["key"] != key:
+            return None
+        return section
+
+    def vectors(self, name, key):
+        """Memory-mapped matrix of section `name`, or None when missing or built from other inputs."""
+        section = self._section(name, key)
+        if section is None:
+            return None
+        if section["file"] not in self._mapped:
+            try:
+                self._mapped[section["file"]] = np.load(os.path.join(self.path, section["file"]), mmap_mode="r")
+            except FileNotFoundError:
+                return None
+        return self._mapped[section["file"]]
+
+    def values(self, name, key):
+        """JSON values stored with section `name`, or None when missing or stale."""
+        section = self._section(name, key)
+        return section["values"] if section is not None else None
+
+
+def get_artifact(path=WARM_START_DIR):
+    """
+    Return the artifact at `path`, or None if there is none.
+
+    The manifest is read once and again only after a rebuild replaced it, so a
+    running worker moves to the new files on its next call.
+    """
+    global _artifact
+    if not WARM_START_ENABLED:
+        return None
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    try:
+        mtime = os.stat(manifest_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _artifact_lock:
+        if _artifact is None or _artifact.path != path or _artifact.mtime != mtime:
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("format") != FORMAT_VERSION:
+                return None
+            _artifact = WarmStartArtifact(path, manifest, mtime)
+        return _artifact
+
+
+def write_artifact(sections, path=WARM_START_DIR):
+    """
+    Write sections to `path`, replacing the manifest atomically.
+
+    Args:
+        sections (dict): name -> {"key": str, "matrix": np.ndarray} for vectors,
+            or {"key": str, "values": list} for JSON values
+        path (str): Artifact directory
+
+    Files of the manifest being replaced are kept, so workers that have not yet
+    seen the new manifest can still open them; older files are removed.
+    """
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            previous = json.load(f).get("sections", {})
+    manifest = {"format": FORMAT_VERSION, "sections": {}}
+    for name, section in sections.items():
+        entry = {"key": section["key"]}
+        if "matrix" in section:
+            entry["file"] = f"{name}-{section['key'][:16]}.npy"
+            np.save(os.path.join(path, entry["file"]), np.ascontiguousarray(section["matrix"], dtype=np.float32))
+        if "values" in section:
+            entry["values"] = section["values"]
+        manifest["sections"][name] = entry
+
+    temporary_path = os.path.join(path, f".{MANIFEST_NAME}.{os.getpid()}")
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(temporary_path, manifest_path)
+
+    entries = list(manifest["sections"].values()) + list(previous.values())
+    referenced = {entry["file"] for entry in entries if "file" in entry}
+    for file_name in os.listdir(path):
+        if file_name.endswith(".npy") and file_name not in referenced:
+            os.remove(os.path.join(path, file_name))
+    return manifest
+
+
+def build_artifact(path=WARM_START_DIR):
+    """Compute every section with the current model, FAQ CSV and catalog, and write them."""
+    import faq_route
+    import small_talk_route
+    from helper_functions import catalog
+    from helper_functions.model_registry import encode
+    from helper_functions.router import LocalRouter, catalog_brands, routes
+
+    local_router = LocalRouter(routes)
+    faq_rows = faq_route.get_faq_retriever().rows
+    bank_texts = small_talk_route.bank_utterances()
+
+    sections = {
+        "router": {"key": local_router.index_key, "matrix": local_router.matrix},
+        "faq": {
+            "key": faq_route.faq_vectors_key(faq_rows),
+            "matrix": np.asarray(encode([question for question, _ in faq_rows.values()]), dtype=np.float32),
+            "values": list(faq_rows),
+        },
+        "small_talk": {
+            "key": small_talk_route.bank_key(bank_texts),
+            "matrix": np.asarray(encode(bank_texts), dtype=np.float32),
+        },
+        "brands": {"key": catalog.catalog_version(), "values": catalog_brands(use_artifact=False)},
+    }
+    return write_artifact(sections, path)
+
+
+if __name__ == "__main__":
+    written = build_artifact()
+    for name, section in written["sections"].items():
+        print(f"{name:>10}: key={section['key'][:16]} {section.get('file', '')}")
+    print(f"Warm-start artifact written to {WARM_START_DIR}")
@@ -0,0 +1,240 @@
+import asyncio
+import threading
+import time
+
+from helper_functions import catalog, tracing
+from helper_functions.router import get_router
+from helper_functions.model_registry import encode
+from helper_functions.answer_cache import ANSWER_CACHE_ENABLED, SemanticAnswerCache
+from helper_functions.llm_client import acomplete, get_async_groq_client, iterate_sync, run_sync
+from helper_functions.config import GROQ_API_KEY, GROQ_MODEL
+import faq_route
+import small_talk_route
+import sql_route
+
+# One connection per process to the host-wide on-disk answer cache. Answers are
+# versioned by the data behind them, so an ingest or FAQ edit invalidates them.
+answer_cache = SemanticAnswerCache(
+    GROQ_MODEL,
+    versions={"sql": catalog.catalog_version, "faq": faq_route.faq_version},
+    brands=sql_route.load_brands,
+) if ANSWER_CACHE_ENABLED else None
+
+# Set once warm_up() has finished; readiness probes and the UI wait on it
+ready = threading.Event()
+
+
+def warm_up():
+    """
+    Load everything a first turn would otherwise pay for: sync the FAQ index, run the
+    encoder once, route a query, build the catalog statistics and the small-talk
+    bank, so the process is ready before it takes traffic.
+
+    With a current warm-start artifact (helper_functions.warm_start) the FAQ vectors
+    are already on disk, so Chroma is neither opened nor synced.
+    """
+    if faq_route.warm_start_vectors() is None:
+        faq_route.ingest_faq_data(faq_route.faqs_path)
+    get_router()(vector=encode(["warm up"])[0])
+    sql_route.load_brands()
+    sql_route.get_catalog_stats()
+    small_talk_route.get_small_talk_bank()
+    ready.set()
+
+
+async def _complete(request, stream=False, span_name="llm"):
+    """Send a chat completion on the shared AsyncGroq client."""
+    return await acomplete(get_async_groq_client(GROQ_API_KEY), request, GROQ_MODEL, stream, span_name)
+
+
+async def faq_chain_async(query, query_embedding=None, retrieval=None, stream=False):
+    """
+    Async faq_chain. `retrieval` may be an already running get_relevant_qa task,
+    so the vector lookup can start before routing has finished. Confident matches
+    are answered from the FAQ without the LLM.
+    """
+    if retrieval is None:
+        retrieval = asyncio.to_thread(faq_route.get_relevant_qa, query, query_embedding)
+    result = await retrieval
+    answer = faq_route.direct_answer(query, result)
+    tracing.current_span().set(faq_direct=answer is not None)
+    if answer is not None:
+        return answer
+    return await _complete(faq_route.faq_request(query, faq_route.faq_context(result)), stream, "llm.faq")
+
+
+async def small_talk_chain_async(question, stream=False):
+    return await _complete(small_talk_route.small_talk_request(question), stream, "llm.small_talk")
+
+
+async def sql_chain_async(question, stream=False, memory=None):
+    """Async sql_chain: the same steps, with the LLM calls on the shared AsyncGroq client."""
+    answer, plan = await asyncio.to_thread(sql_route.plan_sql_query, question, memory)
+    if answer is not None:
+        return answer
+
+    if plan.sql_query is None:
+        request = sql_route.sql_generation_request(question, plan.history)
+        plan.sql_query = sql_route.extract_sql(await _complete(request, span_name="llm.sql"))
+        if plan.sql_query is None:
+            return sql_route.NO_SQL_MESSAGE
+
+    query_results, total_rows, error = await asyncio.to_thread(sql_route.try_query, plan.sql_query, plan.params)
+    if error is not None and plan.generated:
+        repair = sql_route.sql_repair_request(question, plan.sql_query, error, plan.history)
+        plan.sql_query = sql_route.extract_sql(await _complete(repair, span_name="llm.sql_repair"))
+        if plan.sql_query is not None:
+            query_results, total_rows, _ = await asyncio.to_thread(sql_route.try_query, plan.sql_query)
+
+    rendered, results_as_context = await asyncio.to_thread(
+        sql_route.finish_sql_query, question, plan, query_results, total_rows, memory
+    )
+    if rendered is not None:
+        return rendered
+    request = sql_route.comprehension_request(question, results_as_context)
+    return await _complete(request, stream, "llm.comprehension")
+
+
+async def run_route_async(route, query, query_embedding, retrieval=None, stream=False, memory=None):
+    if route == "faq":
+        return await faq_chain_async(query, query_embedding, retrieval, stream)
+    elif route == "sql":
+        return await sql_chain_async(query, stream, memory)
+    elif route == "small_talk":
+        return await small_talk_chain_async(query, stream)
+    else:
+        return f"Route {route} not implemented yet"
+
+
+async def _when_done(deltas, on_done):
+    """Pass a stream of deltas through, then call `on_done` with the joined text."""
+    parts = []
+    async for delta in deltas:
+        parts.append(delta)
+        yield delta
+    await on_done("".join(parts))
+
+
+def _discard(task):
+    # Speculative work for another route; consume its outcome so nothing is logged
+    if not task.cancelled():
+        task.exception()
+
+
+async def ask_async(query, stream=False, memory=None, trace=None):
+    """
+    Answer a query on the event loop.
+
+    The keyword tier of the router runs first. When it is not confident, the query
+    is encoded once, and the FAQ vector lookup is started speculatively while the
+    embedding tier classifies the same vector; for other routes its result is
+    dropped. Product queries caught by the keyword tier never touch the encoder;
+    FAQ and small talk still encode for retrieval and the answer cache.
+
+    With `memory`, a message that refines the previous product answer ("cheaper
+    ones", "what about for women?") goes straight to the SQL route. Product turns
+    then bypass the answer cache, since their filter carries into the next turn.
+    Every finished turn is recorded in `memory`.
+
+    Each stage is a span of `trace`, which is finished (and exported) once the
+    answer is complete, after the last delta when streaming.
+
+    Args:
+        query (str): User message
+        stream (bool): Return LLM answers as an async generator of text deltas
+        memory (ConversationMemory | None): State of this conversation
+        trace (tracing.Trace | None): Trace for this turn; a new one by default
+
+    Returns:
+        str | AsyncIterator[str]: Answer text, or deltas when streaming
+    """
+    turn = (trace or tracing.Trace("ask")).activate()
+    try:
+        return await _ask_traced(query, stream, memory, turn)
+    except Exception as error:
+        turn.root.set(error=type(error).__name__)
+        turn.finish()
+        raise
+
+
+async def _ask_traced(query, stream, memory, turn):
+    query_embedding = None
+    retrieval = None
+    with tracing.span("router.keywords") as span:
+        choice = get_router().match_keywords(query)
+        span.set(route=choice.name if choice is not None else None)
+    # Keyword hits on FAQ vocabulary or greetings win over a follow-up reading
+    follow_up = (
+        memory is not None
+        and (choice is None or choice.name == "sql")
+        and memory.is_product_follow_up(query)
+    )
+    if follow_up:
+        route = "sql"
+    else:
+        if choice is None:
+            with tracing.span("encode"):
+                query_embedding = (await asyncio.to_thread(encode, [query]))[0]
+            retrieval = asyncio.ensure_future(asyncio.to_thread(faq_route.get_relevant_qa, query, query_embedding))
+            with tracing.span("router.embedding") as span:
+                choice = await asyncio.to_thread(get_router(), vector=query_embedding)
+                span.set(route=choice.name, score=round(choice.similarity_score or 0.0, 3))
+        route = choice.name
+    turn.root.set(route=route, follow_up=follow_up)
+    if route != "faq" and retrieval is not None:
+        retrieval.add_done_callback(_discard)
+        retrieval = None
+    if query_embedding is None and route != "sql":
+        with tracing.span("encode"):
+            query_embedding = (await asyncio.to_thread(encode, [query]))[0]
+    # Product answers in a conversation must run, so their filter is there to refine next turn
+    use_cache = answer_cache is not None and query_embedding is not None and not (memory is not None and route == "sql")
+
+    async def finish(text, start=None):
+        if memory is not None:
+            memory.add_turn(route, query, text)
+        if use_cache and start is not None:
+            await asyncio.to_thread(
+                answer_cache.store, route, query, query_embedding, text, time.perf_counter() - start
+            )
+        turn.finish()
+
+    # Familiar chit-chat is answered locally; checked before the answer cache so
+    # the replies keep their variation
+    if route == "small_talk":
+        with tracing.span("small_talk.bank") as span:
+            reply = small_talk_route.canned_reply(query, query_embedding)
+            span.set(cache_hit=reply is not None)
+        if reply is not None:
+            await finish(reply)
+            return reply
+
+    if use_cache:
+        with tracing.span("answer_cache") as span:
+            cached = await asyncio.to_thread(answer_cache.lookup, route, query, query_embedding)
+            span.set(cache_hit=cached is not None)
+        if cached is not None:
+            if retrieval is not None:
+                retrieval.add_done_callback(_discard)
+            await finish(cached)
+            return cached
+
+    start = time.perf_counter()
+    response = await run_route_async(route, query, query_embedding, retrieval, stream, memory)
+    if isinstance(response, str):
+        await finish(response, start)
+        return response
+    return _when_done(response, lambda text: finish(text, start))
+
+
+def ask(query, stream=False, memory=None, trace=None):
+    """
+    Sync wrapper around ask_async for Streamlit.
+
+    Runs on the shared background event loop, so the pooled async HTTP client is
+    reused across turns. Streams come back as a plain generator of text deltas.
+    """
+    response = run_sync(ask_async(query, stream, memory, trace))
+    if isinstance(response, str):
+        return response
+    return iterate_sync(response)
@@ -1,23 +1,17 @@
-from groq import Groq
 import os
-from dotenv import load_dotenv
-import streamlit as st
-
-load_dotenv()
+from functools import lru_cache
+from helper_functions import warm_start
+from helper_functions.config import GROQ_API_KEY, GROQ_MODEL
+from helper_functions.llm_client import complete, get_groq_client
+from helper_functions.model_registry import DEFAULT_EMBEDDING_MODEL, encode
+from helper_functions.response_bank import ResponseBank
 
 # Resolve DB_PATH relative to the current file
 base_dir = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(base_dir, "resources", "myntra_db.sqlite")
 
-# Load environment variable
-GROQ_API_KEY = os.getenv('GROQ_API_KEY') or st.secrets.get("GROQ_API_KEY")
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY not set in environment variables or Streamlit secrets.")
-small_talk_client = Groq(api_key=GROQ_API_KEY)
-
-GROQ_MODEL = os.getenv("GROQ_MODEL") or st.secrets.get("GROQ_MODEL")
-if not GROQ_MODEL:
-    raise ValueError("GROQ_MODEL not set in environment variables or Streamlit secrets.")
+# Groq settings come from the environment (or Streamlit secrets when run under Streamlit)
+small_talk_client = get_groq_client(GROQ_API_KEY)
 
 small_talk_prompt = """
 You are a friendly and professional AI assistant specialized in **small talk**. Your role is to respond naturally and politely to casual conversation or general chit-chat.
@@ -89,9 +83,152 @@ Return **only the short response sentence**, with no explanations, notes, or ext
 """
 
 
-def generate_smalltalk_response(question):
-    chat_completion = small_talk_client.chat.completions.create(
-        messages=[
+# Chit-chat at least this similar to a bank utterance is answered locally, without the LLM
+SMALL_TALK_BANK_THRESHOLD = float(os.getenv("SMALL_TALK_BANK_THRESHOLD", "0.80"))
+
+# (utterances, replies) pairs, seeded from the small_talk route utterances and the
+# examples in small_talk_prompt. Replies follow the prompt's rules: one short,
+# friendly sentence.
+SMALL_TALK_BANK = [
+    (
+        ["Hi", "Hello", "Hey there!", "Hi there!", "Good morning!", "Good evening!", "Good afternoon!"],
+        ["Hello! How can I help you today?", "Hi there, nice to see you!", "Hey! What can I do for you?"],
+    ),
+    (
+        ["How are you?", "How’s it going?", "How’s your day going?", "How’s life?", "How are you doing today?"],
+        ["I’m doing great, thanks for asking!", "All good here, how about you?", "Pretty great, thanks!"],
+    ),
+    (
+        ["What’s up?", "What’s new?", "What are you doing right now?"],
+        ["Not much, just chatting with you.", "Just here, ready to help you shop.", "Nothing much, what’s up with you?"],
+    ),
+    (
+        ["Nice to meet you!", "Can we be friends?", "Do you like me?"],
+        ["Nice to meet you too!", "Of course, I’d love that!", "I always enjoy chatting with you."],
+    ),
+    (
+        ["Thanks", "Thank you!", "Thanks a lot!", "Thank you so much!"],
+        ["You’re welcome!", "Happy to help!", "Anytime!"],
+    ),
+    (
+        ["Bye", "Goodbye!", "See you later!"],
+        ["Goodbye, have a great day!", "See you soon!", "Bye, happy shopping!"],
+    ),
+    (
+        ["What is your name?", "What’s your name?", "Who are you?"],
+        ["My name is Llama.", "I’m Llama, your shopping assistant.", "You can call me Llama."],
+    ),
+    (
+        ["Are you a robot?", "Are you human?", "Are you real?", "What are you?"],
+        ["Yes, I’m an AI chatbot.", "I’m a language model designed to chat.", "I’m a friendly AI, not a human."],
+    ),
+    (
+        ["What do you do?", "What can you do?", "Can you help me?", "What’s your purpose?"],
+        ["I answer questions and chat with you.", "I can help you find shoes and answer Myntra questions.",
+         "Sure, ask me about products, orders or policies!"],
+    ),
+    (
+        ["Who created you?", "Who made you?"],
+        ["I was built by a team of developers.", "Some friendly developers made me.", "A team of engineers built me."],
+    ),
+    (
+        ["Where are you from?"],
+        ["I live in the digital world.", "I’m from the cloud, more or less.", "I call the internet home."],
+    ),
+    (
+        ["How old are you?"],
+        ["I’m quite new to the world.", "Young enough to keep learning!", "I don’t really have an age."],
+    ),
+    (
+        ["Do you sleep?", "Were you able to sleep well yesterday?", "Do you ever get tired?", "Do you dream?"],
+        ["I never sleep, I’m always here for you.", "No sleep for me, I’m always ready to chat.",
+         "I don’t get tired, so ask away!"],
+    ),
+    (
+        ["Do you have feelings?", "Do you like humans?", "Do you have friends?", "Do you like your job?",
+         "Who is your favorite person?"],
+        ["I don’t have feelings, but I enjoy our chats.", "I like chatting with everyone I meet.",
+         "Every person I talk to is a friend."],
+    ),
+    (
+        ["What’s your favorite color?"],
+        ["I’d pick blue, it’s calm and cool.", "Probably blue, like a clear sky.", "I’m a fan of bright colors."],
+    ),
+    (
+        ["Do you like music?", "Can you sing?", "Can you dance?", "Can you play games?"],
+        ["Yes, I love listening to all kinds of music.", "I can’t dance, but I love a good beat.",
+         "I’m better at chatting than performing."],
+    ),
+    (
+        ["Tell me a joke.", "Say something funny.", "I’m bored.", "Tell me something fun."],
+        ["Why did the shoe go to school? To get a little sole education!",
+         "My sneakers are tired, they’ve been running all day.",
+         "Why do shoes never lie? Because they’re always on the level."],
+    ),
+    (
+        ["Tell me a fun fact.", "Can you tell me something interesting?"],
+        ["The first rubber-soled sneakers appeared in the 1890s.",
+         "Your feet have about a quarter of all the bones in your body.",
+         "The word sneaker comes from how quiet rubber soles were."],
+    ),
+    (
+        ["Are you smart?", "Can you talk?", "Talk to me."],
+        ["I try my best to be helpful!", "Sure, I’m all ears, what’s on your mind?", "I’m here and happy to chat."],
+    ),
+    (
+        ["Do you eat food?"],
+        ["No food for me, just data.", "I run on electricity, not snacks.", "I don’t eat, but I hear pizza is great."],
+    ),
+    (
+        ["Do you know Siri?", "Do you know Alexa?"],
+        ["I’ve heard of them, they seem nice.", "We’re distant cousins in the AI family.", "Yes, but I’m the one who knows shoes."],
+    ),
+    (
+        ["How’s the weather?", "How’s the weather there?"],
+        ["I don’t feel weather, but I hope it’s nice for you.", "It’s always sunny in the digital world.",
+         "No weather here, but I hope yours is lovely."],
+    ),
+]
+
+
+def bank_utterances():
+    """Every SMALL_TALK_BANK utterance, in the order ResponseBank encodes them."""
+    return [utterance for utterances, _ in SMALL_TALK_BANK for utterance in utterances]
+
+
+def bank_key(texts):
+    """Warm-start key of the bank's utterance vectors."""
+    return warm_start.content_key(DEFAULT_EMBEDDING_MODEL, texts)
+
+
+@lru_cache(maxsize=1)
+def get_small_talk_bank():
+    """Return the process-wide canned reply bank, encoding its utterances on first use."""
+    artifact = warm_start.get_artifact()
+    matrix = artifact.vectors("small_talk", bank_key(bank_utterances())) if artifact is not None else None
+    return ResponseBank(SMALL_TALK_BANK, SMALL_TALK_BANK_THRESHOLD, matrix=matrix)
+
+
+def canned_reply(question, query_embedding=None):
+    """
+    Answer familiar chit-chat from SMALL_TALK_BANK.
+
+    Args:
+        question (str): User message
+        query_embedding (list[float] | None): Precomputed L2-normalized embedding
+
+    Returns:
+        str | None: Local reply, or None when the LLM should answer
+    """
+    if query_embedding is None:
+        query_embedding = encode([question])[0]
+    return get_small_talk_bank().match(query_embedding)
+
+
+def small_talk_request(question):
+    """Build the chat completion arguments for a small-talk reply."""
+    return {
+        "messages": [
             {
                 "role": "system",
                 "content": small_talk_prompt
@@ -101,15 +238,20 @@ def generate_smalltalk_response(question):
                 "content": question,
             }
         ],
-        model=GROQ_MODEL,
-        temperature=0.3,
-        # max_tokens=1024
-    )
-    return chat_completion.choices[0].message.content
+        "temperature": 0.3,
+        # "max_tokens": 1024
+    }
+
+
+def generate_smalltalk_response(question, stream=False):
+    return complete(small_talk_client, small_talk_request(question), GROQ_MODEL, stream, "llm.small_talk")
 
 
-def small_talk_chain(question):
-    small_talk_response = generate_smalltalk_response(question)
+def small_talk_chain(question, stream=False, query_embedding=None):
+    reply = canned_reply(question, query_embedding)
+    if reply is not None:
+        return reply
+    small_talk_response = generate_smalltalk_response(question, stream)
     return small_talk_response
 
 
@@ -1,59 +1,110 @@
-import sqlite3
-import pandas as pd
-from groq import Groq
+import logging
 import os
 import re
-from dotenv import load_dotenv
-import streamlit as st
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+from helper_functions import catalog, tracing, warm_start
+from helper_functions.config import GROQ_API_KEY, GROQ_MODEL
+from helper_functions.catalog_stats import CATALOG_STATS_ENABLED, get_catalog_stats
+from helper_functions.llm_client import complete, get_groq_client
+from helper_functions.query_parser import (
+    ProductFilter, build_product_sql, parse_aggregate_question, parse_follow_up, parse_product_query
+)
+from helper_functions.sql_guard import SQLGuardError, check_statement, execute_guarded
+from helper_functions.sql_plan_cache import SQL_PLAN_CACHE_ENABLED, SQLPlanCache
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Resolve DB_PATH relative to this file
-base_dir = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(base_dir, "resources", "myntra_db.sqlite")
+# Catalog database, opened read-only through helper_functions.catalog
+DB_PATH = catalog.DB_PATH
 
-# Load API key from .env file 
-GROQ_API_KEY = os.getenv('GROQ_API_KEY') or st.secrets.get("GROQ_API_KEY")
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY not set in environment variables or Streamlit secrets.")
-sql_client = Groq(api_key=GROQ_API_KEY)
+# Groq settings come from the environment (or Streamlit secrets when run under Streamlit)
+sql_client = get_groq_client(GROQ_API_KEY)
 
-GROQ_MODEL = os.getenv("GROQ_MODEL") or st.secrets.get("GROQ_MODEL")
-if not GROQ_MODEL:
-    raise ValueError("GROQ_MODEL not set in environment variables or Streamlit secrets.")
+# LLM-generated SQL, reused for later questions with the same template
+plan_cache = SQLPlanCache() if SQL_PLAN_CACHE_ENABLED else None
 
-def run_query(query):
+# Parses at or above this confidence skip the LLM and use the rule-based SQL builder
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("SQL_FAST_PATH_MIN_CONFIDENCE", "0.9"))
+
+# Upper bound on rows fetched per question, whatever the generated SQL asks for
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "20"))
+
+# Longest product_link passed to the comprehension model before it is shortened
+MAX_LINK_CHARS = 60
+
+
+def load_brands():
+    """Return the distinct brand names in the product table, reloaded when the catalog version changes."""
+    return _load_brands(catalog.catalog_version())
+
+
+@lru_cache(maxsize=1)
+def _load_brands(version):
+    artifact = warm_start.get_artifact()
+    brands = artifact.values("brands", version) if artifact is not None else None
+    if brands is not None:
+        return [brand for brand in brands if brand is not None]
+    result = catalog.execute("SELECT DISTINCT brand FROM product WHERE brand IS NOT NULL")
+    return [row[0] for row in result.rows]
+
+
+def run_query(query, params=None):
     """
-    Execute a SQL SELECT query against the database and return results as a DataFrame.
+    Execute a SQL SELECT query against the read-only catalog connection.
+
+    The query runs under helper_functions.sql_guard: it may only read the product
+    table, its plan is checked before it runs, and it is aborted once it uses up
+    SQL_TIME_BUDGET_MS, so a bad generated query cannot hold up other users.
 
     Args:
         query (str): SQL query string to execute
+        params (list, optional): Values bound to `?` placeholders in the query
 
     Returns:
-        pd.DataFrame: Query results as a pandas DataFrame
+        catalog.QueryResult: Column names and row tuples
 
     Raises:
-        ValueError: If query is not a SELECT statement
-        sqlite3.Error: If database connection or query execution fails
+        SQLGuardError: If the query is not a single SELECT on the product table, is
+            too expensive, fails to compile or runs out of time
     """
-    # Remove leading/trailing whitespace and convert to uppercase for comparison
-    normalized_query = query.strip().upper()
-
-    # Validate that the query is a SELECT statement (read-only)
-    if not normalized_query.startswith("SELECT"):
-        raise ValueError(
-            f"Only SELECT queries are allowed. Query must start with 'SELECT', "
-            f"but received: '{query[:50]}...'"
-        )
+    with tracing.span("sql.execute", sql=query) as span:
+        query_results = execute_guarded(query, params, db_path=DB_PATH)
+        span.set(rows=len(query_results.rows))
+        return query_results
 
-    # Execute the query and return results
-    try:
-        with sqlite3.connect(DB_PATH) as conn:
-            # Execute query and load results into dataframe
-            df = pd.read_sql_query(query, conn)
-            return df
-    except sqlite3.Error as e:
-        raise sqlite3.Error(f"Database query failed: {str(e)}")
+
+def run_limited_query(query, params=None, max_rows=SQL_MAX_ROWS):
+    """
+    Execute a SELECT with a hard row cap and report how many rows matched in total.
+
+    The generated query is wrapped as a subquery, so the cap holds even when the
+    LLM omits LIMIT. The total is only counted when the cap was actually hit.
+
+    Args:
+        query (str): SQL query string to execute
+        params (list, optional): Values bound to `?` placeholders in the query
+        max_rows (int): Maximum number of rows to return
+
+    Returns:
+        tuple[catalog.QueryResult, int]: At most `max_rows` rows and the total match count
+
+    Raises:
+        SQLGuardError: If the guard rejects the query
+    """
+    inner_query = check_statement(query)
+    params = list(params or [])
+
+    # Fetch one extra row to learn whether the result was truncated
+    query_results = run_query(f"SELECT * FROM ({inner_query}) LIMIT ?", params + [max_rows + 1])
+    if len(query_results.rows) <= max_rows:
+        return query_results, len(query_results.rows)
+
+    total_rows = run_query(f"SELECT COUNT(*) FROM ({inner_query})", params).rows[0][0]
+    return query_results._replace(rows=query_results.rows[:max_rows]), total_rows
 
 
 sql_prompt = """
@@ -68,7 +119,7 @@ Columns:
 - brand (string): Brand name
 - gender (string): 'men' or 'women'
 - mrp (integer): Original price in INR
-- discount_percent (float): Discount as decimal (0.1 = 10%)
+- discount_percent (integer): Discount in percent (35 = 35% off)
 - price_after_discount (integer): Final price in INR
 - star_rating (float): Average rating 0-5 (nullable)
 - num_ratings (integer): Total rating count (nullable)
@@ -77,9 +128,9 @@ Columns:
 ### QUERY REQUIREMENTS:
 1. Generate exactly ONE SQL query
 2. Always use `SELECT *` to return all columns
-3. For brand filtering, use case-insensitive matching:
-   - Use: `WHERE LOWER(brand) LIKE LOWER('%brand_name%')`
-   - Never use: `ILIKE` or exact matching
+3. For brand filtering, list every CATALOG VALUES brand spelling the user's brand covers, including sub-brands that start with it (e.g. 'ADIDAS' and 'ADIDAS Originals' for "adidas"):
+   - Use: `WHERE LOWER(brand) IN (LOWER('Brand'), LOWER('Brand Sub-brand'))`
+   - Never use: `ILIKE`
 4. Return ONLY the SQL query with no explanations
 
 ### OUTPUT FORMAT:
@@ -90,7 +141,7 @@ Columns:
 ### EXAMPLE:
 Question: "Show all Nike products for women"
 <SQL>
-SELECT * FROM product WHERE LOWER(brand) LIKE LOWER('%nike%') AND gender = 'women'
+SELECT * FROM product WHERE LOWER(brand) IN (LOWER('Nike')) AND gender = 'women'
 </SQL>
 """
 
@@ -176,28 +227,56 @@ Return ONLY the final answer as plain text or numbered list. No headings, explan
 """
 
 
-def generate_sql_query(question):
-    chat_completion = sql_client.chat.completions.create(
-        messages=[
+def sql_generation_request(question, history=None):
+    """
+    Build the chat completion arguments for generating SQL for `question`.
+
+    `history` is the conversation so far (ConversationMemory.history_messages()),
+    so follow-ups like "what about for women?" can be resolved.
+    """
+    return {
+        "messages": [
             {
                 "role": "system",
-                "content": sql_prompt
+                # Exact brand spellings and value ranges of the loaded catalog
+                "content": sql_prompt + get_catalog_stats().prompt_section()
             },
+            *(history or []),
             {
                 "role": "user",
                 "content": question,
             }
         ],
-        model=GROQ_MODEL,
-        temperature=0.2,
-        #max_tokens=1024
-    )
-    return chat_completion.choices[0].message.content
+        "temperature": 0.2,
+        # "max_tokens": 1024
+    }
+
 
+def sql_repair_request(question, sql_query, error, history=None):
+    """
+    Build the chat completion arguments for one attempt at fixing rejected SQL.
 
-def data_comprehension(question, context):
-    chat_completion = sql_client.chat.completions.create(
-        messages=[
+    The rejected query and the guard's reason are added after the question, so the
+    model corrects its own answer rather than starting over.
+    """
+    request = sql_generation_request(question, history)
+    request["messages"] += [
+        {
+            "role": "assistant",
+            "content": f"<SQL>\n{sql_query}\n</SQL>",
+        },
+        {
+            "role": "user",
+            "content": f"{error}. Rewrite the query so it follows the requirements.",
+        }
+    ]
+    return request
+
+
+def comprehension_request(question, context):
+    """Build the chat completion arguments for phrasing `context` as an answer."""
+    return {
+        "messages": [
             {
                 "role": "system",
                 "content": comprehension_prompt,
@@ -207,62 +286,454 @@ def data_comprehension(question, context):
                 "content": f"QUESTION: {question}. DATA: {context}",
             }
         ],
-        model=GROQ_MODEL,
-        temperature=0.2,
-        # max_tokens=1024
-    )
-    return chat_completion.choices[0].message.content
+        "temperature": 0.2,
+        # "max_tokens": 1024
+    }
+
+
+def generate_sql_query(question, stream=False, history=None):
+    return complete(sql_client, sql_generation_request(question, history), GROQ_MODEL, stream, "llm.sql")
+
+
+def repair_sql_query(question, sql_query, error, history=None):
+    """Ask the LLM once to fix `sql_query` after `error`; returns the new SQL or None."""
+    request = sql_repair_request(question, sql_query, error, history)
+    return extract_sql(complete(sql_client, request, GROQ_MODEL, span_name="llm.sql_repair"))
+
+
+def data_comprehension(question, context, stream=False):
+    return complete(sql_client, comprehension_request(question, context), GROQ_MODEL, stream, "llm.comprehension")
+
+
+# Columns that identify a product listing; anything else is an aggregate answer
+PRODUCT_COLUMNS = {"brand", "title", "price_after_discount"}
 
+# Columns the product renderer reads, in display order
+RENDER_COLUMNS = [
+    "brand", "title", "gender", "price_after_discount", "discount_percent",
+    "star_rating", "product_link", "scraped_on",
+]
 
-def sql_chain(question):
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _format_scraped_on(value):
+    if _is_missing(value):
+        return "NA"
+    try:
+        return datetime.fromisoformat(str(value)[:19]).strftime("%b %d, %Y %I:%M %p")
+    except ValueError:
+        return "NA"
+
+
+def _shorten_link(link):
+    """Shorten a Myntra product URL to its id form (https://www.myntra.com/<id>)."""
+    if not isinstance(link, str) or len(link) <= MAX_LINK_CHARS:
+        return link
+    product_id = re.search(r"/(\d+)/buy", link)
+    return f"https://www.myntra.com/{product_id.group(1)}" if product_id else link[:MAX_LINK_CHARS]
+
+
+def render_product_results(records, total_rows=None):
     """
-    Process a natural language question through the SQL generation and execution pipeline.
+    Render product rows as a markdown table followed by a numbered list of links.
 
-    This function:
-    1. Generates a SQL query from the question using an LLM
-    2. Extracts the query from XML tags
-    3. Executes the query against the database
-    4. Converts results to natural language using comprehension model
+    Produces the same layout the chat UI used to rebuild from the comprehension
+    model's text, but directly from the query results.
 
     Args:
-        question (str): Natural language question about the database
+        records (list[dict]): Product rows keyed by column name
+        total_rows (int, optional): Number of rows that matched before the row cap
 
     Returns:
-        str: Natural language answer to the question, or error message if processing fails
+        str: Markdown table and product links
     """
-    # Step 1: Generate SQL query from natural language question
-    sql_query_response = generate_sql_query(question)
+    table_header = "| Product | Price | Discount | Rating | Scraped Date |\n"
+    table_separator = "|---------|-------|----------|--------|-------------|\n"
+    table_rows = ""
+    links_list = []
+
+    for record in records:
+        product_name = " ".join(
+            str(record[key]).strip() for key in ("brand", "title") if not _is_missing(record.get(key))
+        )
 
-    # Step 2: Extract SQL query from <SQL>...</SQL> tags
+        price = record.get("price_after_discount")
+        price = "NA" if _is_missing(price) else f"Rs. {int(price)}"
+
+        discount = record.get("discount_percent")
+        if _is_missing(discount):
+            discount = "0%"
+        else:
+            # Percent may be stored as a fraction (0.35) or a whole number (35)
+            discount = float(discount) * 100 if 0 < float(discount) < 1 else float(discount)
+            discount = f"{discount:g}%"
+
+        rating = record.get("star_rating")
+        rating = "NA" if _is_missing(rating) else f"{float(rating):g}"
+
+        link = record.get("product_link")
+        if not _is_missing(link) and link:
+            links_list.append(link)
+
+        scraped_date = _format_scraped_on(record.get("scraped_on"))
+
+        table_rows += f"| {product_name} | {price} | {discount} | {rating} | {scraped_date} |\n"
+
+    result = table_header + table_separator + table_rows
+
+    if total_rows is not None and total_rows > len(records):
+        result += f"\nShowing {len(records)} of {total_rows} matching products.\n"
+
+    if links_list:
+        result += "\n**Product Links:**\n\n"
+        for idx, link in enumerate(links_list, 1):
+            result += f"{idx}. {link}\n"
+    else:
+        result += "\n**Product Links:**\n\nNo links found in response.\n"
+
+    return result
+
+
+# Table header and value format of each aggregate metric
+AGGREGATE_COLUMNS = {
+    "count": ("Products", "{:.0f}"),
+    "avg_price": ("Average price", "Rs. {:.0f}"),
+    "avg_rating": ("Average rating", "{:.2f}"),
+    "avg_discount": ("Average discount", "{:.0f}%"),
+    "max_price": ("Highest price", "Rs. {:.0f}"),
+    "min_price": ("Lowest price", "Rs. {:.0f}"),
+    "max_rating": ("Highest rating", "{:g}"),
+    "max_discount": ("Biggest discount", "{:g}%"),
+}
+
+# Sentence for an ungrouped aggregate answer, given the products described and the value
+AGGREGATE_SENTENCES = {
+    "count": "There are {value:.0f} {products}.",
+    "avg_price": "The average price of {products} is Rs. {value:.0f}.",
+    "avg_rating": "The average rating of {products} is {value:.2f} out of 5.",
+    "avg_discount": "The average discount on {products} is {value:.0f}%.",
+    "max_price": "The most expensive {products} cost Rs. {value:.0f}: {product}",
+    "min_price": "The cheapest {products} cost Rs. {value:.0f}: {product}",
+    "max_rating": "The highest rated {products} are rated {value:g} out of 5: {product}",
+    "max_discount": "The biggest discount on {products} is {value:g}% off: {product}",
+}
+
+
+def _describe_products(aggregate):
+    """Plain-English description of the products an aggregate question covers."""
+    products = f"{aggregate.brand} shoes" if aggregate.brand else "shoes"
+    if aggregate.gender:
+        products += f" for {aggregate.gender}"
+    if aggregate.on_sale:
+        products += " on sale"
+    if aggregate.rating_min is not None:
+        products += f" rated {aggregate.rating_min} stars or more"
+    if aggregate.discount_min is not None:
+        products += f" with at least {aggregate.discount_min}% off"
+    return products
+
+
+def render_aggregate_answer(aggregate, answers):
+    """
+    Phrase catalog statistics as the answer to an aggregate question.
+
+    Args:
+        aggregate (AggregateQuery): Parsed question
+        answers (list[catalog_stats.AggregateAnswer]): Its values, one per group
+
+    Returns:
+        str: One sentence, or a markdown table when the question groups by brand or gender
+    """
+    products = _describe_products(aggregate)
+    if aggregate.group_by is not None:
+        if not answers:
+            return "Sorry, I couldn't find any products matching your query."
+        header, value_format = AGGREGATE_COLUMNS[aggregate.metric]
+        columns = [aggregate.group_by.capitalize(), header] + (["Products"] if aggregate.metric != "count" else [])
+        result = "| " + " | ".join(columns) + " |\n" + "|---" * len(columns) + "|\n"
+        for answer in answers:
+            value = "NA" if answer.value is None else value_format.format(answer.value)
+            cells = [answer.group, value] + ([str(answer.count)] if aggregate.metric != "count" else [])
+            result += "| " + " | ".join(cells) + " |\n"
+        return result
+
+    answer = answers[0]
+    if aggregate.metric == "count" and not answer.count:
+        return f"There are no {products}."
+    if not answer.count:
+        return "Sorry, I couldn't find any products matching your query."
+    if answer.value is None:
+        return f"None of the {products} have a rating yet."
+    product = None
+    if answer.product is not None:
+        record = answer.product
+        product = f"{record['brand']} {record['title']} ({record['gender']}), {record['product_link']}"
+    return AGGREGATE_SENTENCES[aggregate.metric].format(products=products, value=answer.value, product=product)
+
+
+def answer_from_stats(question, memory=None):
+    """
+    Answer an aggregate question from the precomputed catalog statistics.
+
+    Returns:
+        str | None: The answer, or None when the question needs SQL
+    """
+    if not CATALOG_STATS_ENABLED or (memory is not None and memory.is_product_follow_up(question)):
+        return None
+    with tracing.span("sql.stats") as span:
+        aggregate = parse_aggregate_question(question, load_brands())
+        span.set(cache_hit=aggregate is not None)
+        if aggregate is None:
+            return None
+        answer = render_aggregate_answer(aggregate, get_catalog_stats().answer(aggregate))
+    if memory is not None:
+        memory.remember_products(None, [])
+    return answer
+
+
+def plan_product_query(question, memory=None):
+    """
+    Parse `question` with the rule-based parser, on top of the previous product
+    filter when it is a follow-up in the conversation.
+
+    Args:
+        question (str): Natural language product question
+        memory (ConversationMemory | None): State of the conversation
+
+    Returns:
+        ProductFilter | None: Filter confident enough to skip the LLM, or None
+    """
+    with tracing.span("sql.parse") as span:
+        if memory is not None and memory.last_filter is not None and memory.is_product_follow_up(question):
+            product_filter = parse_follow_up(question, memory.last_filter, load_brands(), memory.reference_price)
+            span.set(follow_up=True)
+        else:
+            product_filter = parse_product_query(question, load_brands())
+        if (
+            product_filter is not None
+            and product_filter.has_constraints()
+            and product_filter.confidence >= FAST_PATH_MIN_CONFIDENCE
+        ):
+            span.set(fast_path=True)
+            return product_filter
+        span.set(fast_path=False)
+        return None
+
+
+def _plan_cacheable(question, memory):
+    # Follow-ups are resolved against the conversation, so their SQL is not reusable
+    return plan_cache is not None and not (memory is not None and memory.is_product_follow_up(question))
+
+
+def lookup_plan(question, memory=None):
+    """Return cached (sql, params) for the question's template, or None."""
+    if not _plan_cacheable(question, memory):
+        return None
+    with tracing.span("sql.plan_cache") as span:
+        planned = plan_cache.lookup(question, load_brands())
+        span.set(cache_hit=planned is not None)
+        return planned
+
+
+def store_plan(question, sql_query, memory=None):
+    """Cache LLM-generated SQL for the question's template after validating it."""
+    if _plan_cacheable(question, memory):
+        plan_cache.store(question, sql_query, load_brands())
+
+
+def remember_results(memory, product_filter, query_results):
+    """Keep the filter and prices of a product answer so the next turn can refine it."""
+    if memory is None:
+        return
+    if PRODUCT_COLUMNS.issubset(query_results.columns):
+        prices = [record["price_after_discount"] for record in query_results.records(["price_after_discount"])]
+        memory.remember_products(product_filter, prices)
+    else:
+        memory.remember_products(None, [])
+
+
+def extract_sql(sql_query_response):
+    """Return the first query inside <SQL>...</SQL> tags, or None if there is none."""
     sql_tag_pattern = r"<SQL>(.*?)</SQL>"
     extracted_queries = re.findall(
         pattern=sql_tag_pattern,
         string=sql_query_response,
         flags=re.DOTALL  # Allow matching across multiple lines
     )
-
-    # Step 3: Validate that a SQL query was extracted
     if len(extracted_queries) == 0:
-        error_message = "Sorry, the LLM is unable to generate the SQL query for the question"
-        return error_message
-
+        return None
     # Extract the first (and should be only) SQL query and clean whitespace
-    sql_query = extracted_queries[0].strip()
-    print(f"Generated SQL query is: {sql_query}")
+    return extracted_queries[0].strip()
+
+
+def prepare_answer(query_results, total_rows):
+    """
+    Turn query results into either a finished product listing or comprehension input.
+
+    Returns:
+        tuple[str | None, object]: (rendered markdown, None) for product rows, or
+        (None, context for data_comprehension) for single-value and aggregate results
+    """
+    # Product listings are rendered locally from the projected columns; no LLM call needed
+    if PRODUCT_COLUMNS.issubset(query_results.columns):
+        if not query_results.rows:
+            return "Sorry, I couldn't find any products matching your query.", None
+        return render_product_results(query_results.records(RENDER_COLUMNS), total_rows), None
+
+    # Convert rows to dictionary format, with short links to keep the prompt small
+    results_as_context = query_results.records()
+    for record in results_as_context:
+        if 'product_link' in record:
+            record['product_link'] = _shorten_link(record['product_link'])
+    if total_rows > len(results_as_context):
+        results_as_context = {
+            "rows": results_as_context,
+            "note": f"showing {len(results_as_context)} of {total_rows} matching rows",
+        }
+    return None, results_as_context
+
+
+@dataclass
+class SQLPlan:
+    """Where the SQL for a question comes from: the rule-based parser, a cached plan or the LLM."""
+    history: Optional[list] = None
+    product_filter: Optional[ProductFilter] = None
+    planned: Optional[tuple] = None
+    sql_query: Optional[str] = None
+    params: Optional[list] = None
+
+    @property
+    def generated(self):
+        """Whether the SQL has to come from the LLM (and may be repaired and cached)."""
+        return self.product_filter is None and self.planned is None
+
+
+def plan_sql_query(question, memory=None):
+    """
+    Steps 0-1 of sql_chain, everything before the SQL generation call.
+
+    Returns:
+        tuple[str | None, SQLPlan | None]: The answer when the catalog statistics
+        cover the question, else the plan; its `sql_query` is None when the LLM
+        has to generate it
+    """
+    # Step 0: Aggregates over brand, gender and sale status come from the precomputed statistics
+    answer = answer_from_stats(question, memory)
+    if answer is not None:
+        return answer, None
+
+    # Step 1: Try the deterministic parser first; it saves an LLM round trip
+    plan = SQLPlan(history=memory.history_messages() if memory is not None else None)
+    plan.product_filter = plan_product_query(question, memory)
+    if plan.product_filter is not None:
+        plan.sql_query, plan.params = build_product_sql(plan.product_filter, load_brands())
+        return None, plan
+
+    # Step 1b: Reuse SQL generated for an earlier question with the same template
+    plan.planned = lookup_plan(question, memory)
+    if plan.planned is not None:
+        plan.sql_query, plan.params = plan.planned
+    return None, plan
+
+
+def try_query(sql_query, params=None):
+    """
+    Step 4 of sql_chain: run SQL under the guard, capped at SQL_MAX_ROWS.
+
+    Returns:
+        tuple[catalog.QueryResult | None, int, SQLGuardError | None]: Rows and total
+        match count, or the guard's rejection
+    """
+    logger.info("sql=%s params=%s", sql_query, params or [])
+    try:
+        query_results, total_rows = run_limited_query(sql_query, params)
+    except SQLGuardError as error:
+        logger.warning("sql rejected: %s", error)
+        return None, 0, error
+    return query_results, total_rows, None
 
-    # Step 4: Execute the SQL query against the database
-    query_results = run_query(sql_query)
 
+def finish_sql_query(question, plan, query_results, total_rows, memory=None):
+    """
+    Steps 5-6 of sql_chain, everything after the SQL ran.
+
+    Returns:
+        tuple[str | None, object]: (final answer, None), or (None, context for
+        data_comprehension) for single-value and aggregate results
+    """
     # Step 5: Validate that query execution was successful
     if query_results is None:
-        error_message = "Sorry, there was a problem executing the SQL query."
-        return error_message
+        return "Sorry, there was a problem executing the SQL query.", None
+
+    if plan.generated:
+        # Only SQL that ran within the guard is cached for the template
+        store_plan(question, plan.sql_query, memory)
+
+    remember_results(memory, plan.product_filter, query_results)
+
+    # Step 6: Render product listings locally, or prepare aggregate rows for the LLM
+    return prepare_answer(query_results, total_rows)
 
-    # Step 6: Convert DataFrame results to dictionary format for comprehension model
-    results_as_context = query_results.to_dict(orient='records')
 
-    # Step 7: Generate natural language answer from query results
-    natural_language_answer = data_comprehension(question, results_as_context)
+# Answer when the LLM's reply holds no <SQL> block
+NO_SQL_MESSAGE = "Sorry, the LLM is unable to generate the SQL query for the question"
+
+
+def sql_chain(question, stream=False, memory=None):
+    """
+    Process a natural language question through the SQL generation and execution pipeline.
+
+    Aggregate questions the catalog statistics cover (counts, averages, extremes by
+    brand, gender and sale status) are answered from them without any SQL. Otherwise
+    this function:
+    1. Builds the SQL query with the rule-based parser, reuses a cached plan for the
+       question's template, or generates it using an LLM
+    2. Extracts the query from XML tags
+    3. Executes the query against the database under the SQL guard; a rejected
+       LLM query is sent back to the LLM, with the reason, for one repair attempt
+    4. Renders product rows as a markdown table, or converts aggregate results to
+       natural language using the comprehension model
+
+    The steps without an LLM call live in plan_sql_query(), try_query() and
+    finish_sql_query(), which pipeline.sql_chain_async() shares.
+
+    Args:
+        question (str): Natural language question about the database
+        stream (bool): Stream the comprehension answer; SQL generation always completes first
+        memory (ConversationMemory | None): Conversation state; follow-ups refine the
+            previous filter, and the filter used here is remembered for the next turn
+
+    Returns:
+        str | Iterator[str]: Markdown product table or natural language answer (a generator
+        of text deltas when streaming), or error message if processing fails
+    """
+    answer, plan = plan_sql_query(question, memory)
+    if answer is not None:
+        return answer
+
+    if plan.sql_query is None:
+        # Steps 1c-3: Generate SQL query from natural language question and extract it from <SQL>...</SQL> tags
+        plan.sql_query = extract_sql(generate_sql_query(question, history=plan.history))
+        if plan.sql_query is None:
+            return NO_SQL_MESSAGE
+
+    # Step 4: Execute the SQL query under the guard
+    query_results, total_rows, error = try_query(plan.sql_query, plan.params)
+    if error is not None and plan.generated:
+        # Step 4b: Give the LLM one chance to fix its query; a second rejection is final
+        plan.sql_query = repair_sql_query(question, plan.sql_query, error, plan.history)
+        if plan.sql_query is not None:
+            query_results, total_rows, _ = try_query(plan.sql_query)
+
+    rendered, results_as_context = finish_sql_query(question, plan, query_results, total_rows, memory)
+    if rendered is not None:
+        return rendered
+
+    # Step 7: Generate natural language answer for single-value or aggregate results
+    natural_language_answer = data_comprehension(question, results_as_context, stream)
 
     return natural_language_answer
 
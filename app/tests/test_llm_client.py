@@ -0,0 +1,138 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from helper_functions import tracing
+from helper_functions.llm_client import acomplete, complete
+
+USAGE = SimpleNamespace(prompt_tokens=12, completion_tokens=3)
+
+
+def delta_chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))], x_groq=None, usage=None)
+
+
+def usage_chunk():
+    # Groq sends the usage of a stream on a last chunk without choices
+    return SimpleNamespace(choices=[], x_groq=SimpleNamespace(usage=USAGE), usage=None)
+
+
+class FakeGroq:
+    """Stands in for Groq / AsyncGroq: `chat.completions.create(stream=True)` yields `chunks`."""
+
+    def __init__(self, chunks, fail_after=None, is_async=False, refuse=False):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.refuse = refuse
+        self.requests = []
+        create = self._acreate if is_async else self._create
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+    def _stream(self):
+        for position, chunk in enumerate(self.chunks):
+            if position == self.fail_after:
+                raise ConnectionError("stream dropped")
+            yield chunk
+
+    def _create(self, **request):
+        self.requests.append(request)
+        if self.refuse:
+            raise ConnectionError("connection refused")
+        return self._stream()
+
+    async def _acreate(self, **request):
+        self.requests.append(request)
+        if self.refuse:
+            raise ConnectionError("connection refused")
+
+        async def stream():
+            for chunk in self._stream():
+                yield chunk
+        return stream()
+
+
+CHUNKS = [delta_chunk("Hello"), delta_chunk(None), delta_chunk(", "), delta_chunk(""), delta_chunk("world"), usage_chunk()]
+REQUEST = {"messages": [{"role": "user", "content": "hi"}]}
+
+
+def traced():
+    return tracing.Trace("test").activate()
+
+
+def llm_span(trace):
+    return next(span for span in trace.spans if span.name == "llm.test")
+
+
+def test_stream_yields_deltas_in_order():
+    client = FakeGroq(CHUNKS)
+    deltas = list(complete(client, REQUEST, "model", stream=True, span_name="llm.test"))
+    assert deltas == ["Hello", ", ", "world"]
+    assert client.requests[0]["stream"] is True
+    assert client.requests[0]["model"] == "model"
+
+
+def test_stream_records_usage_from_final_chunk():
+    trace = traced()
+    stream = complete(FakeGroq(CHUNKS), REQUEST, "model", stream=True, span_name="llm.test")
+    span = llm_span(trace)
+    assert span.end is None
+    assert "".join(stream) == "Hello, world"
+    assert span.attributes["prompt_tokens"] == 12
+    assert span.attributes["completion_tokens"] == 3
+    assert "first_token_ms" in span.attributes
+    assert span.end is not None
+
+
+def test_stream_error_midway_propagates_and_finishes_span():
+    trace = traced()
+    stream = complete(FakeGroq(CHUNKS, fail_after=2), REQUEST, "model", stream=True, span_name="llm.test")
+    received = []
+    with pytest.raises(ConnectionError):
+        for delta in stream:
+            received.append(delta)
+    assert received == ["Hello"]
+    span = llm_span(trace)
+    assert span.end is not None
+    assert "prompt_tokens" not in span.attributes
+
+
+def test_async_stream_matches_sync():
+    async def collect(fail_after=None):
+        trace = traced()
+        stream = await acomplete(FakeGroq(CHUNKS, fail_after, is_async=True), REQUEST, "model", stream=True,
+                                 span_name="llm.test")
+        received = []
+        try:
+            async for delta in stream:
+                received.append(delta)
+        except ConnectionError:
+            received.append("<error>")
+        return received, llm_span(trace)
+
+    received, span = asyncio.run(collect())
+    assert received == ["Hello", ", ", "world"]
+    assert span.attributes["completion_tokens"] == 3
+    assert span.end is not None
+
+    received, span = asyncio.run(collect(fail_after=2))
+    assert received == ["Hello", "<error>"]
+    assert span.end is not None
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_request_error_finishes_span(stream):
+    trace = traced()
+    with pytest.raises(ConnectionError):
+        complete(FakeGroq(CHUNKS, refuse=True), REQUEST, "model", stream=stream, span_name="llm.test")
+    span = llm_span(trace)
+    assert span.end is not None
+    assert span.attributes["error"] == "ConnectionError"
+
+    trace = traced()
+    with pytest.raises(ConnectionError):
+        asyncio.run(acomplete(FakeGroq(CHUNKS, is_async=True, refuse=True), REQUEST, "model", stream=stream,
+                              span_name="llm.test"))
+    span = llm_span(trace)
+    assert span.end is not None
+    assert span.attributes["error"] == "ConnectionError"
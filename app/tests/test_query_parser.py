@@ -0,0 +1,23 @@
+import pytest
+
+from helper_functions.query_parser import parse_aggregate_question, parse_product_query
+
+BRANDS = ["ADIDAS", "ADIDAS Originals", "HRX by Hrithik Roshan", "Nike", "Puma"]
+
+
+@pytest.mark.parametrize("text, discount_min", [
+    ("nike shoes with discount above 50%", (">", 50)),
+    ("puma shoes with more than 40% discount", (">", 40)),
+    ("adidas shoes over 30% off", (">", 30)),
+    ("nike shoes with discount of at least 50%", (">=", 50)),
+    ("puma shoes with at least 40% discount", (">=", 40)),
+    ("adidas shoes with 30% or more discount", (">=", 30)),
+    ("nike shoes on sale", (">", 0)),
+])
+def test_discount_comparison(text, discount_min):
+    assert parse_product_query(text, BRANDS).discount_min == discount_min
+
+
+def test_strict_discount_is_not_a_statistics_bucket():
+    assert parse_aggregate_question("how many nike shoes have at least 50% discount", BRANDS).discount_min == 50
+    assert parse_aggregate_question("how many nike shoes have more than 50% discount", BRANDS) is None
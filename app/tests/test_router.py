@@ -0,0 +1,44 @@
+import pytest
+
+from helper_functions.router import KeywordRouter
+
+BRANDS = ["ADIDAS", "ADIDAS Originals", "Campus", "HRX by Hrithik Roshan", "Killer", "Nike", "Puma", "Skechers"]
+
+
+@pytest.fixture(scope="module")
+def keyword_router():
+    return KeywordRouter(BRANDS)
+
+
+def route(keyword_router, text):
+    choice = keyword_router(text)
+    return choice.name if choice is not None else None
+
+
+@pytest.mark.parametrize("text", [
+    "Can I return my Nike shoes?",
+    "How do I track my Puma order?",
+])
+def test_faq_words_win_over_a_brand(keyword_router, text):
+    assert route(keyword_router, text) == "faq"
+
+
+@pytest.mark.parametrize("text", [
+    "nike air max shoes",
+    "puma under 3000",
+    "HRX for women",
+    "sneakers by killer",
+    "adidas running shoes rated 4 and above",
+])
+def test_brand_with_product_noun_or_filter_is_sql(keyword_router, text):
+    assert route(keyword_router, text) == "sql"
+
+
+@pytest.mark.parametrize("text", [
+    "Nike",
+    "Is the Campus placement of my order confirmed?",
+    "killer deals today?",
+    "COD on Nike shoes under 3000",
+])
+def test_brand_alone_or_mixed_signals_are_not_sql(keyword_router, text):
+    assert route(keyword_router, text) != "sql"